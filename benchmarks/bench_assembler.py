@@ -0,0 +1,165 @@
+# Lines-per-second and peak traced memory of the single-pass assembler against the old two-pass one,
+# a parallel build of the same file, then cold, warm and one-file-edited builds of the same lines
+# split across files with an object cache.
+# Usage: python benchmarks/bench_assembler.py [lines] [files] [jobs]
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from assembler.assembler import Assembler  # noqa: E402
+from assembler.b_type import convert_b_type  # noqa: E402
+from assembler.encoding import CACHE_SALT  # noqa: E402
+from assembler.i_type import convert_i_type  # noqa: E402
+from assembler.j_type import convert_j_type  # noqa: E402
+from assembler.objects import ObjectCache  # noqa: E402
+from assembler.r_type import convert_r_type  # noqa: E402
+from assembler.s_type import convert_s_type  # noqa: E402
+from assembler.tables import func3  # noqa: E402
+
+# Repeated with fresh labels; every block has one backward branch and one forward jump
+BLOCK = """\
+loop{n}: add a0,a0,t0
+sub a1,a0,t1
+addi t0,t0,-1
+sw a0,8(sp)
+lw a2,8(sp)
+jal ra,next{n}
+bne t0,zero,loop{n}
+next{n}: jalr zero,ra,0
+"""
+
+
+def generate(path, lines, first=0):
+    with open(path, "w") as f:
+        for n in range(first, first + lines // BLOCK.count("\n")):
+            f.write(BLOCK.format(n=n))
+
+
+def legacy_convert(instruction, labels, addr):
+    # The old per-line path: chained replace() tokenizing, a walk over every type dict, string encoding
+    if instruction.startswith(("lw", "sw")):
+        parts = instruction.replace(",", " ").split(None, 2)
+    else:
+        parts = instruction.replace(",", " ").replace("(", " ").replace(")", "").split()
+    op = parts[0]
+    if not any(op in ops for ops in func3.values()):
+        raise ValueError(f"Unrecognized instruction: {op}")
+    if op in func3["R-Type"]:
+        return convert_r_type(op, parts)
+    if op in func3["I-Type"]:
+        return convert_i_type(op, parts)
+    if op in func3["S-Type"]:
+        return convert_s_type(op, parts)
+    if op in func3["B-Type"]:
+        binary = convert_b_type(op, parts, addr, labels)
+        return binary if binary is not None else f"UNRESOLVED_B:{op}:{','.join(parts[1:])}"
+    binary = convert_j_type(op, parts, addr, labels)
+    return binary if binary is not None else f"UNRESOLVED_J:{op}:{','.join(parts[1:])}"
+
+
+def legacy_assemble(path):
+    with open(path) as f:
+        source = f.read()
+    instructions = []
+    labels = {}
+    addr = 0
+    for line in source.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if ":" in line:
+            label, line = line.split(":")
+            labels[label.strip()] = addr
+            line = line.strip()
+            if not line:
+                continue
+        instructions.append((line, addr))
+        addr += 4
+    output = []
+    for instruction, addr in instructions:
+        binary = legacy_convert(instruction, labels, addr)
+        if binary.startswith("UNRESOLVED"):
+            _, kind, rest = binary.split(":", 2)
+            parts = rest.split(",")
+            convert = convert_b_type if kind == "B" else convert_j_type
+            binary = convert(parts[0], parts, addr, labels)
+        output.append(binary)
+    return [int(binary, 2) for binary in output]
+
+
+def streaming_assemble(path):
+    with open(path) as f:
+        return Assembler(track_source=False).assemble(f)
+
+
+def parallel_assemble(path, jobs):
+    start = time.perf_counter()
+    words = Assembler(track_source=False).assemble_files([path], jobs=jobs)
+    return time.perf_counter() - start, words
+
+
+def measure(fn, path):
+    # Timed untraced; tracemalloc slows allocation-heavy code unevenly, so the peak is a second run
+    start = time.perf_counter()
+    words = fn(path)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    fn(path)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak, words
+
+
+def incremental(tmp, lines, files):
+    # Seconds for a cold build, an unchanged rebuild and a rebuild after editing one file
+    per_file = lines // files
+    paths = []
+    for i in range(files):
+        paths.append(os.path.join(tmp, f"part{i}.s"))
+        generate(paths[-1], per_file, first=i * per_file)
+    cache = ObjectCache(os.path.join(tmp, "cache"), salt=CACHE_SALT)
+
+    def build():
+        start = time.perf_counter()
+        words = Assembler(track_source=False).assemble_files(paths, cache)
+        return time.perf_counter() - start, words
+
+    cold, words = build()
+    warm, _ = build()
+    with open(paths[files // 2], "a") as f:
+        f.write("addi a0,a0,1\n")
+    edited, edited_words = build()
+    assert len(edited_words) == len(words) + 1
+    return cold, warm, edited
+
+
+def main():
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 400_000
+    files = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    jobs = int(sys.argv[3]) if len(sys.argv) > 3 else max(2, os.cpu_count() or 1)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "program.s")
+        generate(path, lines)
+        legacy_time, legacy_peak, legacy_words = measure(legacy_assemble, path)
+        stream_time, stream_peak, stream_words = measure(streaming_assemble, path)
+        parallel_time, parallel_words = parallel_assemble(path, jobs)
+        cold, warm, edited = incremental(tmp, lines, files)
+    assert list(legacy_words) == list(stream_words), "assemblers disagree"
+    assert parallel_words == stream_words, "parallel build differs from the serial one"
+    print(f"lines:       {lines}")
+    print(f"two-pass:    {lines / legacy_time:12,.0f} lines/s  peak {legacy_peak / 2**20:8.1f} MiB")
+    print(f"single-pass: {lines / stream_time:12,.0f} lines/s  peak {stream_peak / 2**20:8.1f} MiB"
+          f"  ({legacy_time / stream_time:.2f}x faster, {legacy_peak / stream_peak:.1f}x less memory)")
+    print(f"{jobs} jobs:      {lines / parallel_time:12,.0f} lines/s  ({stream_time / parallel_time:.2f}x serial, "
+          f"{os.cpu_count()} CPUs)")
+    print(f"{files} files:    cold {cold * 1000:8.1f} ms  unchanged {warm * 1000:8.1f} ms  "
+          f"one edited {edited * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
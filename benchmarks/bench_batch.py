@@ -0,0 +1,72 @@
+# Instances-per-second of the NumPy batched engine against one scalar Simulator per input.
+# Usage: python benchmarks/bench_batch.py [instances] [iterations]
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from assembler.assembler import Assembler  # noqa: E402
+from simulator.batch import np  # noqa: E402
+from simulator.simulator import Simulator  # noqa: E402
+
+# Sums a0 * (iteration count) into a word per instance; the early exit for a0 == 0 makes
+# instances diverge and meet again at the halt
+SOURCE = """\
+addi t0,zero,{iterations}
+addi t1,zero,1
+addi a1,zero,0
+beq a0,zero,done
+loop: add a1,a1,a0
+srl a2,a1,t1
+or a3,a2,a0
+sw a1,0(sp)
+lw a4,0(sp)
+sub t0,t0,t1
+bne t0,zero,loop
+done: sw a1,4(sp)
+beq zero,zero,0
+"""
+
+
+def main():
+    if np is None:
+        print("NumPy is not installed; the batched engine is unavailable")
+        return
+    from simulator.batch import BatchSimulator
+
+    instances = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    words = Assembler().assemble(SOURCE.format(iterations=iterations))
+    inputs = [(i * 7919) % 1000 * (i % 5 != 0) for i in range(instances)]
+
+    start = time.perf_counter()
+    batch = BatchSimulator(words, instances, memory_size=1 << 12)
+    batch.reg[:, 10] = inputs
+    groups = batch.run()
+    batched = time.perf_counter() - start
+
+    start = time.perf_counter()
+    sims = []
+    for value in inputs:
+        sim = Simulator(memory_size=1 << 12)
+        sim.load(words)
+        sim.reg[10] = value
+        sim.run()
+        sims.append(sim)
+    scalar = time.perf_counter() - start
+
+    for i, sim in enumerate(sims):
+        assert batch.state(i) == sim.state(), f"instance {i} differs"
+        assert batch.dump_memory(i, 0, 1 << 12) == sim.dump_memory(0, 1 << 12), f"instance {i} memory differs"
+
+    steps = int(batch.steps.sum())
+    print(f"instances: {instances}, steps: {steps}, groups executed: {groups}")
+    print(f"scalar:    {instances / scalar:12,.0f} instances/s  {steps / scalar:14,.0f} steps/s")
+    print(f"batched:   {instances / batched:12,.0f} instances/s  {steps / batched:14,.0f} steps/s"
+          f"  ({scalar / batched:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+# Steps-per-second of the basic-block engine against the predecoded interpreter on loop-heavy code.
+# Usage: python benchmarks/bench_blocks.py [outer] [inner]
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from assembler.assembler import Assembler  # noqa: E402
+from simulator.simulator import Simulator  # noqa: E402
+
+# Nested counted loops with a memory round trip and a call in the inner body
+NESTED_SOURCE = """\
+addi s0,zero,{outer}
+addi t1,zero,1
+addi a0,zero,0
+outer: addi t0,zero,{inner}
+inner: add a0,a0,t0
+sub a1,a0,t1
+slt a2,t1,a0
+or a3,a0,t1
+and a4,a0,t1
+srl a5,a0,t1
+sw a0,0(sp)
+lw a6,0(sp)
+jal ra,body
+sub t0,t0,t1
+bne t0,zero,inner
+sub s0,s0,t1
+bne s0,zero,outer
+beq zero,zero,0
+body: addi a7,a7,1
+jalr zero,ra,0
+"""
+
+
+def measure(words, blocks):
+    sim = Simulator(blocks=blocks)
+    sim.load(words)
+    start = time.perf_counter()
+    sim.run()
+    return time.perf_counter() - start, sim
+
+
+def main():
+    outer = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    inner = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    words = Assembler().assemble(NESTED_SOURCE.format(outer=outer, inner=inner))
+    interp_time, interp = measure(words, blocks=False)
+    block_time, blocks = measure(words, blocks=True)
+    assert (interp.state(), list(interp.memory.items()), interp.steps) == \
+        (blocks.state(), list(blocks.memory.items()), blocks.steps), \
+        "block engine diverged from the interpreter"
+    steps = interp.steps
+    print(f"steps:       {steps}")
+    print(f"interpreter: {steps / interp_time:12,.0f} steps/s")
+    print(f"blocks:      {steps / block_time:12,.0f} steps/s  ({interp_time / block_time:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+# Cost of run limits and loop detection on terminating workloads, and how soon a spinning
+# program is stopped: plain run against Limits with a deadline and with loop checks.
+# Usage: python benchmarks/bench_limits.py [scale] [loop_check]
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from assembler.assembler import Assembler  # noqa: E402
+from benchmarks.corpus import WORKLOADS  # noqa: E402
+from simulator.limits import Limits  # noqa: E402
+from simulator.simulator import Simulator  # noqa: E402
+
+# Never halts: stores the same value over and over in a loop of a few dozen instructions
+SPIN = """
+    addi t1, zero, 7
+outer:
+    addi t0, zero, 0
+inner:
+    sw t1, 0(sp)
+    addi t0, t0, 1
+    addi t2, zero, 20
+    blt t0, t2, inner
+    jal zero, outer
+"""
+
+
+def timed(words, blocks, **limits):
+    sim = Simulator(blocks=blocks)
+    sim.load(words)
+    runner = Limits(sim, **limits) if limits else sim
+    start = time.perf_counter()
+    runner.run()
+    return sim, runner, time.perf_counter() - start
+
+
+def main():
+    scale = float(sys.argv[1]) if len(sys.argv) > 1 else 1.0
+    loop_check = int(sys.argv[2]) if len(sys.argv) > 2 else 10_000
+    print(f"{'workload':16} {'engine':6} {'steps':>9} {'plain s':>8} {'deadline':>9} {'loops':>9}")
+    for name, make in sorted(WORKLOADS.items()):
+        words = Assembler().encode(make(scale))
+        for blocks in (False, True):
+            sim, _, plain = timed(words, blocks)
+            _, _, deadline = timed(words, blocks, timeout=3600)
+            _, _, loops = timed(words, blocks, loop_check=loop_check)
+            print(f"{name:16} {'blocks' if blocks else 'interp':6} {sim.steps:9} {plain:8.3f} "
+                  f"{deadline / plain:8.2f}x {loops / plain:8.2f}x")
+    words = Assembler().encode(SPIN)
+    for blocks in (False, True):
+        sim, limits, seconds = timed(words, blocks, loop_check=loop_check)
+        print(f"spin ({'blocks' if blocks else 'interp'}): {limits.termination.reason} after {sim.steps} "
+              f"instructions, {seconds * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
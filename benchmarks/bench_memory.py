@@ -0,0 +1,72 @@
+# Paged guest memory against the old address-keyed dict: bytes per touched word and word load/store rate.
+# Usage: python benchmarks/bench_memory.py [words]
+import os
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from simulator.memory import PAGE_BITS, WORD_INDEX, ZERO_PAGE, Memory  # noqa: E402
+
+BASE = 0x00010000
+
+
+def fill_dict(words):
+    memory = {}
+    for addr in range(BASE, BASE + 4 * words, 4):
+        memory[addr] = addr ^ 0x5A5A5A5A
+    total = 0
+    for addr in range(BASE, BASE + 4 * words, 4):
+        total += memory.get(addr, 0)
+    return memory, total
+
+
+def fill_pages(words):
+    # Same access pattern as the interpreter's inline LW/SW paths
+    memory = Memory()
+    pages = memory.pages
+    fault_mask = memory.fault_mask
+    for addr in range(BASE, BASE + 4 * words, 4):
+        if addr & fault_mask:
+            memory.store_word(addr, addr ^ 0x5A5A5A5A)
+        else:
+            pages[addr >> PAGE_BITS][(addr >> 2) & WORD_INDEX] = addr ^ 0x5A5A5A5A
+    total = 0
+    for addr in range(BASE, BASE + 4 * words, 4):
+        if addr & fault_mask:
+            total += memory.load_word(addr)
+        else:
+            total += pages.get(addr >> PAGE_BITS, ZERO_PAGE)[(addr >> 2) & WORD_INDEX]
+    return memory, total
+
+
+def footprint(fill, words):
+    tracemalloc.start()
+    memory, _ = fill(words)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size
+
+
+def rate(fill, words):
+    start = time.perf_counter()
+    _, total = fill(words)
+    return 2 * words / (time.perf_counter() - start), total
+
+
+def main():
+    words = int(sys.argv[1]) if len(sys.argv) > 1 else 1 << 20
+    dict_rate, dict_total = rate(fill_dict, words)
+    page_rate, page_total = rate(fill_pages, words)
+    assert dict_total == page_total
+    dict_bytes = footprint(fill_dict, words)
+    page_bytes = footprint(fill_pages, words)
+    print(f"words touched: {words}")
+    print(f"dict:  {dict_bytes / words:6.1f} bytes/word  {dict_rate:12,.0f} accesses/s")
+    print(f"pages: {page_bytes / words:6.1f} bytes/word  {page_rate:12,.0f} accesses/s")
+
+
+if __name__ == "__main__":
+    main()
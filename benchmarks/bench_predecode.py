@@ -0,0 +1,152 @@
+# Steps-per-second of the predecoded simulator loop against the old string-slicing loop.
+# Usage: python benchmarks/bench_predecode.py [iterations]
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from assembler.assembler import Assembler  # noqa: E402
+from assembler.encoding import sign_extend  # noqa: E402
+from simulator.simulator import Simulator  # noqa: E402
+
+# Counted loop mixing the ALU, memory and branch paths of the main loop
+LOOP_SOURCE = """\
+addi t0,zero,{iterations}
+addi t1,zero,1
+addi a0,zero,0
+loop: add a0,a0,t0
+sub a1,a0,t1
+slt a2,t1,a0
+or a3,a0,t1
+and a4,a0,t1
+srl a5,a0,t1
+sw a0,0(sp)
+lw a6,0(sp)
+jal ra,body
+sub t0,t0,t1
+bne t0,zero,loop
+beq zero,zero,0
+body: addi a7,a7,1
+jalr zero,ra,0
+"""
+
+
+def legacy_run(instr):
+    # The pre-decode main loop: slices and int()-parses every field on every step (tracing off)
+    memory = {}
+    reg = [0] * 32
+    reg[2] = 380
+    PC = 0
+    pointer = 0
+    steps = 0
+    while 0 <= pointer < len(instr):
+        i = instr[pointer]
+        opcode = int(i[25:32], 2)
+        steps += 1
+        if opcode == 0b1100011:
+            imm = sign_extend(int(i[0] + i[24] + i[1:7] + i[20:24], 2) << 1, 13)
+            funct3 = i[17:20]
+            rs1 = int(i[12:17], 2)
+            rs2 = int(i[7:12], 2)
+            taken = (reg[rs1] == reg[rs2]) if funct3 == '000' else (reg[rs1] != reg[rs2]) if funct3 == '001' else False
+            if taken:
+                if imm == 0 and i[12:17] == "00000" and i[7:12] == "00000":
+                    break
+                pointer += imm // 4
+                PC += imm
+            else:
+                pointer += 1
+                PC += 4
+        elif opcode == 0b1101111:
+            rd = int(i[20:25], 2)
+            imm = sign_extend(int(i[0] + i[12:20] + i[11] + i[1:11] + '0', 2), 21)
+            reg[rd] = PC + 4
+            pointer += imm // 4
+            PC += imm
+        elif opcode == 0b1100111:
+            rd = int(i[20:25], 2)
+            rs1 = int(i[12:17], 2)
+            imm = sign_extend(int(i[0:12], 2), 12)
+            target = (reg[rs1] + imm) & 0xFFFFFFFE
+            reg[rd] = PC + 4
+            pointer = target // 4
+            PC = target
+        elif opcode == 0b0110011:
+            rd = int(i[20:25], 2)
+            funct3 = int(i[17:20], 2)
+            rs1 = int(i[12:17], 2)
+            rs2 = int(i[7:12], 2)
+            funct7 = int(i[0:7], 2)
+            if funct3 == 0b000:
+                if funct7 == 0b0000000:
+                    reg[rd] = (reg[rs1] + reg[rs2]) & 0xFFFFFFFF
+                elif funct7 == 0b0100000:
+                    reg[rd] = (reg[rs1] - reg[rs2]) & 0xFFFFFFFF
+            elif funct3 == 0b010:
+                reg[rd] = int(reg[rs1] < reg[rs2])
+            elif funct3 == 0b101 and funct7 == 0b0000000:
+                reg[rd] = (reg[rs1] >> reg[rs2]) & 0xFFFFFFFF
+            elif funct3 == 0b110:
+                reg[rd] = (reg[rs1] | reg[rs2]) & 0xFFFFFFFF
+            elif funct3 == 0b111:
+                reg[rd] = (reg[rs1] & reg[rs2]) & 0xFFFFFFFF
+            pointer += 1
+            PC += 4
+        elif opcode == 0b0010011:
+            rd = int(i[20:25], 2)
+            funct3 = int(i[17:20], 2)
+            rs1 = int(i[12:17], 2)
+            imm = sign_extend(int(i[0:12], 2), 12)
+            if funct3 == 0b000:
+                reg[rd] = (reg[rs1] + imm) & 0xFFFFFFFF
+            pointer += 1
+            PC += 4
+        elif opcode == 0b0000011:
+            rd = int(i[20:25], 2)
+            rs1 = int(i[12:17], 2)
+            imm = sign_extend(int(i[0:12], 2), 12)
+            reg[rd] = memory.get((reg[rs1] + imm) & 0xFFFFFFFF, 0)
+            pointer += 1
+            PC += 4
+        elif opcode == 0b0100011:
+            rs2 = int(i[7:12], 2)
+            rs1 = int(i[12:17], 2)
+            funct3 = int(i[17:20], 2)
+            imm = sign_extend(int(i[0:7] + i[20:25], 2), 12)
+            if funct3 == 0b010:
+                memory[(reg[rs1] + imm) & 0xFFFFFFFF] = reg[rs2]
+            pointer += 1
+            PC += 4
+        else:
+            break
+        reg[0] = 0
+    return steps
+
+
+def predecoded_run(instr):
+    sim = Simulator()
+    sim.load(instr)
+    sim.run()
+
+
+def measure(fn, instr):
+    start = time.perf_counter()
+    fn(instr)
+    return time.perf_counter() - start
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    instr = Assembler().lines(LOOP_SOURCE.format(iterations=iterations))
+    steps = legacy_run(instr)
+    legacy = measure(legacy_run, instr)
+    predecoded = measure(predecoded_run, instr)
+    print(f"steps:       {steps}")
+    print(f"string loop: {steps / legacy:12,.0f} steps/s")
+    print(f"predecoded:  {steps / predecoded:12,.0f} steps/s  ({legacy / predecoded:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# Regression corpus of small workload variants: assembler.py + simulator.py per case (the old
+# shell loop) against regress.py with 1 and N jobs, then again with every result cached.
+# Usage: python benchmarks/bench_regress.py [cases] [jobs]
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from assembler.assembler import Assembler  # noqa: E402
+from benchmarks.corpus import WORKLOADS  # noqa: E402
+from simulator.simulator import Simulator  # noqa: E402
+from simulator.trace import TraceWriter  # noqa: E402
+
+ASSEMBLER = os.path.join(ROOT, "src", "assembler", "assembler.py")
+SIMULATOR = os.path.join(ROOT, "src", "simulator", "simulator.py")
+REGRESS = os.path.join(ROOT, "src", "simulator", "regress.py")
+
+
+def generate(directory, cases):
+    names = sorted(WORKLOADS)
+    for i in range(cases):
+        source = WORKLOADS[names[i % len(names)]](0.02 + 0.01 * (i // len(names)))
+        stem = os.path.join(directory, f"case{i:05}")
+        with open(stem + ".s", "w") as f:
+            f.write(source)
+        sim = Simulator(TraceWriter())
+        sim.load(Assembler().assemble(source))
+        sim.run()
+        sim.write_memory()
+        with open(stem + ".expected", "w") as f:
+            f.write(sim.trace.getvalue())
+
+
+def shell_loop(directory):
+    out = os.path.join(directory, "out")
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(".s"):
+            stem = os.path.join(directory, name[:-2])
+            subprocess.run([sys.executable, ASSEMBLER, stem + ".s", out + ".txt"], check=True)
+            subprocess.run([sys.executable, SIMULATOR, out + ".txt", out], check=True)
+            subprocess.run(["cmp", "-s", out, stem + ".expected"], check=True)
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def regress(*args):
+    subprocess.run([sys.executable, REGRESS, *args], check=True, stdout=subprocess.DEVNULL)
+
+
+def main():
+    cases = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    jobs = sys.argv[2] if len(sys.argv) > 2 else str(os.cpu_count() or 1)
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus = os.path.join(tmp, "corpus")
+        os.mkdir(corpus)
+        generate(corpus, cases)
+        cache = os.path.join(tmp, "cache")
+        loop = timed(lambda: shell_loop(corpus))
+        serial = timed(lambda: regress(corpus, "--jobs", "1"))
+        parallel = timed(lambda: regress(corpus, "--jobs", jobs, "--cache", cache))
+        cached = timed(lambda: regress(corpus, "--jobs", jobs, "--cache", cache))
+    print(f"cases: {cases}, jobs: {jobs}, CPUs: {os.cpu_count()}")
+    print(f"shell loop:          {loop:8.2f} s")
+    print(f"regress.py 1 job:    {serial:8.2f} s  ({loop / serial:.1f}x)")
+    print(f"regress.py {jobs} jobs:   {parallel:8.2f} s  ({loop / parallel:.1f}x)")
+    print(f"all cached:          {cached:8.2f} s  ({loop / cached:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
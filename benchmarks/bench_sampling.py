@@ -0,0 +1,50 @@
+# Sampled simulation against a full run under the timing model: wall time, and the error of the
+# cycle estimate from periodic windows and from the windows --simpoints picks.
+# Usage: python benchmarks/bench_sampling.py [scale] [period] [window]
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from assembler.assembler import Assembler  # noqa: E402
+from benchmarks.corpus import WORKLOADS  # noqa: E402
+from simulator.sampling import Sampler, pick  # noqa: E402
+from simulator.simulator import Simulator  # noqa: E402
+from simulator.timing import TimingModel  # noqa: E402
+
+SIMPOINTS = 5
+
+
+def timed_run(words, make_runner):
+    sim = Simulator(timing=TimingModel())
+    sim.load(words)
+    runner = make_runner(sim)
+    start = time.perf_counter()
+    runner.run()
+    return sim, runner, time.perf_counter() - start
+
+
+def main():
+    scale = float(sys.argv[1]) if len(sys.argv) > 1 else 1.0
+    period = int(sys.argv[2]) if len(sys.argv) > 2 else 20_000
+    window = int(sys.argv[3]) if len(sys.argv) > 3 else 1_000
+    print(f"{'workload':16} {'steps':>9} {'full s':>7} {'sampled s':>9} {'speedup':>7} "
+          f"{'CPI':>6} {'periodic':>8} {'error':>7} {'simpoint':>8} {'error':>7}")
+    for name, make in sorted(WORKLOADS.items()):
+        words = Assembler().encode(make(scale))
+        sim, _, full = timed_run(words, lambda sim: sim)
+        cpi = sim.timing.cycles / sim.steps
+        _, sampler, sampled = timed_run(words, lambda sim: Sampler(sim, period, window, interval=period))
+        periodic = sampler.estimate_cpi()
+        points = [(index * period, weight) for index, weight in pick(sampler.vectors, SIMPOINTS)]
+        _, chosen, _ = timed_run(words, lambda sim: Sampler(sim, window=window, at=points))
+        simpoint = chosen.estimate_cpi()
+        print(f"{name:16} {sim.steps:9} {full:7.2f} {sampled:9.2f} {full / sampled:6.1f}x {cpi:6.3f} "
+              f"{periodic:8.3f} {100 * (periodic - cpi) / cpi:+6.1f}% {simpoint:8.3f} {100 * (simpoint - cpi) / cpi:+6.1f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# Per-job latency of a short assemble+simulate job: simulator.py in a fresh process against the
+# simulation service, both through client.py and over one kept-open connection.
+# Usage: python benchmarks/bench_service.py [jobs] [workers]
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from assembler.assembler import Assembler  # noqa: E402
+from simulator.client import connect, submit  # noqa: E402
+
+SRC = os.path.join(ROOT, "src")
+SOURCE = """\
+addi t0,zero,100
+addi a0,zero,0
+loop: add a0,a0,t0
+addi t0,t0,-1
+bne t0,zero,loop
+sw a0,0(sp)
+beq zero,zero,0
+"""
+
+
+def per_job(fn, jobs):
+    start = time.perf_counter()
+    for _ in range(jobs):
+        fn()
+    return (time.perf_counter() - start) / jobs
+
+
+def main():
+    jobs = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    workers = sys.argv[2] if len(sys.argv) > 2 else "1"
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "job.s")
+        program = os.path.join(tmp, "job.txt")
+        output = os.path.join(tmp, "out.txt")
+        sock = os.path.join(tmp, "rvsim.sock")
+        with open(source, "w") as f:
+            f.write(SOURCE)
+        assembler = Assembler()
+        with open(program, "w") as f:
+            f.writelines(f"{line}\n" for line in assembler.lines(SOURCE))
+
+        server = subprocess.Popen([sys.executable, os.path.join(SRC, "simulator", "service.py"), "--socket", sock,
+                                   "--workers", workers], stderr=subprocess.PIPE)
+        try:
+            server.stderr.readline()  # "Listening on ..."
+            cold = per_job(lambda: subprocess.run(
+                [sys.executable, os.path.join(SRC, "assembler", "assembler.py"), source, program], check=True)
+                or subprocess.run([sys.executable, os.path.join(SRC, "simulator", "simulator.py"), program, output],
+                                  check=True), jobs)
+            cli = per_job(lambda: subprocess.run(
+                [sys.executable, os.path.join(SRC, "simulator", "client.py"), source, output, "--source",
+                 "--socket", sock], check=True), jobs)
+            with connect(sock) as conn:
+                warm = per_job(lambda: submit(conn, {"source": SOURCE}, io.BytesIO()), jobs)
+        finally:
+            server.terminate()
+            server.wait()
+
+    print(f"jobs: {jobs}, workers: {workers}")
+    print(f"assembler.py + simulator.py: {cold * 1000:8.2f} ms/job")
+    print(f"client.py --source:          {cli * 1000:8.2f} ms/job  ({cold / cli:.1f}x)")
+    print(f"kept-open connection:        {warm * 1000:8.2f} ms/job  ({cold / warm:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# Guest I/O throughput: a cat-like program streaming data through read/write ECALLs in 64 KiB
+# chunks, against the same transfer done by the host one word at a time (what a per-word
+# syscall loop would cost) and a guest that only copies the data in memory with lw/sw.
+# Usage: python benchmarks/bench_syscalls.py [megabytes]
+import io
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from assembler.assembler import Assembler  # noqa: E402
+from simulator.simulator import Simulator  # noqa: E402
+from simulator.syscalls import Host  # noqa: E402
+
+BUFFER = 0x20000
+
+# read(0, BUFFER, 64 KiB) and write(1, ...) until end of file
+CAT = """
+    lui s0, 32
+    lui s1, 16
+loop:
+    addi a0, zero, 0
+    addi a1, s0, 0
+    addi a2, s1, 0
+    addi a7, zero, 63
+    ecall
+    beq a0, zero, done
+    addi a2, a0, 0
+    addi a0, zero, 1
+    addi a1, s0, 0
+    addi a7, zero, 64
+    ecall
+    jal zero, loop
+done:
+    beq zero, zero, 0
+"""
+
+# Copies 64 KiB from BUFFER to BUFFER + 64 KiB a word at a time
+COPY = """
+    lui s0, 32
+    lui s1, 48
+    lui t2, 16
+    add t2, s0, t2
+loop:
+    lw t0, 0(s0)
+    sw t0, 0(s1)
+    addi s0, s0, 4
+    addi s1, s1, 4
+    blt s0, t2, loop
+    beq zero, zero, 0
+"""
+
+
+def main():
+    megabytes = float(sys.argv[1]) if len(sys.argv) > 1 else 16
+    data = os.urandom(int(megabytes * (1 << 20)))
+
+    output = io.BytesIO()
+    sim = Simulator(host=Host(io.BytesIO(data), output))
+    sim.load(Assembler().encode(CAT))
+    start = time.perf_counter()
+    sim.run()
+    ecall = time.perf_counter() - start
+    assert output.getvalue() == data
+
+    sim = Simulator()
+    start = time.perf_counter()
+    for i in range(0, len(data) & ~3, 4):
+        sim.memory.store_word(BUFFER + (i & 0xFFFF), int.from_bytes(data[i:i + 4], "little"))
+    words = time.perf_counter() - start
+
+    sim = Simulator(blocks=True)
+    sim.load(Assembler().encode(COPY))
+    start = time.perf_counter()
+    sim.run()
+    guest = (time.perf_counter() - start) * len(data) / (1 << 16)
+
+    size = len(data) / (1 << 20)
+    print(f"{size:.0f} MiB in and out")
+    print(f"read/write ECALLs:    {ecall:8.3f} s  {size / ecall:10.1f} MiB/s")
+    print(f"host word by word:    {words:8.3f} s  {size / words:10.1f} MiB/s  (one way)")
+    print(f"guest lw/sw copy:     {guest:8.3f} s  {size / guest:10.1f} MiB/s  (compiled blocks, scaled)")
+
+
+if __name__ == "__main__":
+    main()
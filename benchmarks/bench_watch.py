@@ -0,0 +1,40 @@
+# Cost of watchpoints on a load/store-heavy workload: no watcher, a watchpoint on a page the
+# program never touches, and one on the page it works in whose value condition never matches.
+# Usage: python benchmarks/bench_watch.py [scale]
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from assembler.assembler import Assembler  # noqa: E402
+from benchmarks.corpus import WORKLOADS  # noqa: E402
+from simulator.simulator import Simulator  # noqa: E402
+from simulator.watch import Watcher, parse_watch  # noqa: E402
+
+CASES = {
+    "no watcher": None,
+    "other page": ["rw:0x80000000+4096"],
+    "same page, no match": ["rw:0x200:0x800=0xFFFFFFFF"],
+}
+
+
+def main():
+    scale = float(sys.argv[1]) if len(sys.argv) > 1 else 1.0
+    words = Assembler().encode(WORKLOADS["array_sum_copy"](scale))
+    base = None
+    for name, specs in CASES.items():
+        watcher = Watcher([parse_watch(spec) for spec in specs]) if specs else None
+        sim = Simulator(watcher=watcher)
+        sim.load(words)
+        start = time.perf_counter()
+        steps = sim.run()
+        rate = steps / (time.perf_counter() - start)
+        base = base or rate
+        print(f"{name:20} {steps:10} steps {rate:12,.0f} steps/s  {rate / base:5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+# Representative guest workloads using only the supported ISA subset. Each entry builds assembly
+# source for a size parameter; `scale` in the harness multiplies the default size.
+
+COUNTED_LOOP = """\
+addi s0,zero,{outer}
+addi t1,zero,1
+addi a0,zero,0
+outer: addi t0,zero,1000
+inner: add a0,a0,t0
+sub a1,a0,t1
+or a2,a0,t1
+and a3,a0,t1
+srl a4,a0,t1
+sub t0,t0,t1
+bne t0,zero,inner
+sub s0,s0,t1
+bne s0,zero,outer
+beq zero,zero,0
+"""
+
+RECURSIVE_FIB = """\
+addi a0,zero,{n}
+jal ra,fib
+beq zero,zero,0
+fib: addi t0,zero,2
+slt t2,a0,t0
+bne t2,zero,base
+addi sp,sp,-12
+sw ra,8(sp)
+sw a0,4(sp)
+addi a0,a0,-1
+jal ra,fib
+sw a0,0(sp)
+lw a0,4(sp)
+addi a0,a0,-2
+jal ra,fib
+lw t1,0(sp)
+add a0,a0,t1
+lw ra,8(sp)
+addi sp,sp,12
+jalr zero,ra,0
+base: jalr zero,ra,0
+"""
+
+# Fill a[i] = i, copy it to b, then sum b; repeated `rounds` times
+ARRAY_SUM_COPY = """\
+addi s2,zero,{rounds}
+round: addi s0,zero,512
+addi s1,zero,1536
+addi t0,zero,0
+addi t1,zero,256
+fill: sw t0,0(s0)
+addi t0,t0,1
+addi s0,s0,4
+bne t0,t1,fill
+addi s0,zero,512
+addi t0,zero,0
+copy: lw t2,0(s0)
+sw t2,0(s1)
+addi s0,s0,4
+addi s1,s1,4
+addi t0,t0,1
+bne t0,t1,copy
+addi s1,zero,1536
+addi t0,zero,0
+addi a0,zero,0
+sum: lw t2,0(s1)
+add a0,a0,t2
+addi s1,s1,4
+addi t0,t0,1
+bne t0,t1,sum
+addi s2,s2,-1
+bne s2,zero,round
+beq zero,zero,0
+"""
+
+# Fill a descending array of n words, then bubble sort it with slt/beq
+BUBBLE_SORT = """\
+addi s0,zero,{n}
+addi s1,zero,512
+addi t0,zero,0
+addi t1,s0,0
+fill: add t2,t0,t0
+add t2,t2,t2
+add t2,t2,s1
+sw t1,0(t2)
+addi t1,t1,-1
+addi t0,t0,1
+bne t0,s0,fill
+addi t5,s0,-1
+outer: addi t0,zero,0
+addi t6,s1,0
+inner: lw t1,0(t6)
+lw t2,4(t6)
+slt t3,t2,t1
+beq t3,zero,noswap
+sw t2,0(t6)
+sw t1,4(t6)
+noswap: addi t6,t6,4
+addi t0,t0,1
+bne t0,t5,inner
+addi t5,t5,-1
+bne t5,zero,outer
+beq zero,zero,0
+"""
+
+STRAIGHT_LINE_OPS = (
+    "add t0,t1,t2", "sub t1,t0,t2", "addi t2,t2,3", "or a0,t0,t1",
+    "and a1,a0,t2", "slt a2,t1,t0", "srl a3,a0,zero", "addi a4,a4,-1",
+)
+
+
+def straight_line(lines):
+    # Large generated code with no branches: every instruction retires exactly once
+    body = [STRAIGHT_LINE_OPS[i % len(STRAIGHT_LINE_OPS)] for i in range(lines)]
+    return "\n".join(body + ["beq zero,zero,0"]) + "\n"
+
+
+WORKLOADS = {
+    "counted_loop": lambda scale: COUNTED_LOOP.format(outer=max(1, int(200 * scale))),
+    "recursive_fib": lambda scale: RECURSIVE_FIB.format(n=max(2, min(2047, int(18 * scale)))),
+    "array_sum_copy": lambda scale: ARRAY_SUM_COPY.format(rounds=max(1, int(100 * scale))),
+    "bubble_sort": lambda scale: BUBBLE_SORT.format(n=max(2, min(255, int(120 * scale)))),
+    "straight_line": lambda scale: straight_line(max(1, int(50000 * scale))),
+}
@@ -0,0 +1,154 @@
+# Assembler and simulator throughput over the workload corpus, written as JSON.
+# Usage:
+#   python benchmarks/harness.py [--scale S] [--out results.json]
+#   python benchmarks/harness.py --compare baseline.json [--tolerance 0.10]
+# Each workload runs in its own interpreter so its peak RSS is not shared with the others.
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from benchmarks.corpus import WORKLOADS  # noqa: E402
+
+SIMULATOR = os.path.join(ROOT, "src", "simulator", "simulator.py")
+
+# Metrics where a larger value is better; every other metric is a cost
+HIGHER_IS_BETTER = ("asm_lines_per_s", "interp_steps_per_s", "blocks_steps_per_s", "trace_steps_per_s")
+
+
+def best_time(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None or elapsed < best else best
+    return best, result
+
+
+def measure_workload(name, scale, repeat):
+    from assembler.assembler import Assembler
+    from simulator.simulator import Simulator
+    from simulator.trace import TraceWriter
+
+    source = WORKLOADS[name](scale)
+    lines = source.count("\n")
+    asm_time, words = best_time(lambda: Assembler().assemble(source), repeat)
+
+    def simulate(blocks=False, trace=None):
+        sim = Simulator(trace, blocks=blocks)
+        sim.load(words)
+        sim.run()
+        return sim.steps
+
+    interp_time, steps = best_time(simulate, repeat)
+    blocks_time, _ = best_time(lambda: simulate(blocks=True), repeat)
+    with open(os.devnull, "w") as devnull:
+        trace_time, _ = best_time(lambda: simulate(trace=TraceWriter(devnull)), 1)
+    return {
+        "lines": lines,
+        "steps": steps,
+        "asm_lines_per_s": lines / asm_time,
+        "interp_steps_per_s": steps / interp_time,
+        "blocks_steps_per_s": steps / blocks_time,
+        "trace_steps_per_s": steps / trace_time,
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+def run_worker(name, scale, repeat):
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), "--worker", name,
+                             "--scale", str(scale), "--repeat", str(repeat)],
+                            check=True, capture_output=True, text=True).stdout
+    return json.loads(output)
+
+
+def startup_time(repeat=5):
+    # Wall time of the CLI on a one-instruction program: interpreter start, imports, file I/O
+    with tempfile.TemporaryDirectory() as tmp:
+        program = os.path.join(tmp, "halt.txt")
+        with open(program, "w") as f:
+            f.write("00000000000000000000000001100011\n")
+        command = [sys.executable, SIMULATOR, program, os.path.join(tmp, "out.txt")]
+        return best_time(lambda: subprocess.run(command, check=True), repeat)[0]
+
+
+def compare(results, baseline, tolerance):
+    # Yields (workload, metric, baseline, current) for metrics worse than the baseline by > tolerance
+    for name, metrics in results["workloads"].items():
+        base = baseline.get("workloads", {}).get(name)
+        if base is None:
+            continue
+        for metric, value in metrics.items():
+            old = base.get(metric)
+            if not old or metric in ("lines", "steps"):
+                continue
+            change = (old - value) / old if metric in HIGHER_IS_BETTER else (value - old) / old
+            if change > tolerance:
+                yield name, metric, old, value
+    old = baseline.get("startup_s")
+    if old and (results["startup_s"] - old) / old > tolerance:
+        yield "startup", "startup_s", old, results["startup_s"]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the assembler and simulator")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplier for workload sizes")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement; the best is kept")
+    parser.add_argument("--only", nargs="+", choices=sorted(WORKLOADS), help="run a subset of workloads")
+    parser.add_argument("--out", help="write results JSON here")
+    parser.add_argument("--compare", metavar="BASELINE", help="flag regressions against a stored results JSON")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed relative slowdown (default: 0.10)")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.worker:
+        print(json.dumps(measure_workload(args.worker, args.scale, args.repeat)))
+        return 0
+
+    results = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "scale": args.scale,
+        "startup_s": startup_time(),
+        "workloads": {},
+    }
+    print(f"{'workload':16} {'asm lines/s':>12} {'interp st/s':>12} {'blocks st/s':>12} "
+          f"{'trace st/s':>12} {'peak RSS KB':>12}")
+    for name in args.only or WORKLOADS:
+        metrics = results["workloads"][name] = run_worker(name, args.scale, args.repeat)
+        print(f"{name:16} {metrics['asm_lines_per_s']:12,.0f} {metrics['interp_steps_per_s']:12,.0f} "
+              f"{metrics['blocks_steps_per_s']:12,.0f} {metrics['trace_steps_per_s']:12,.0f} "
+              f"{metrics['peak_rss_kb']:12,}")
+    print(f"start-up: {results['startup_s'] * 1000:.1f} ms")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = list(compare(results, baseline, args.tolerance))
+        for name, metric, old, new in regressions:
+            print(f"REGRESSION {name} {metric}: {old:,.1f} -> {new:,.1f}")
+        if regressions:
+            return 1
+        print(f"no regressions beyond {args.tolerance:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,280 +1,275 @@
+import argparse
+import io
+import os
 import sys
+from array import array
+from concurrent.futures import ProcessPoolExecutor
 
-# Define funct3 and opcode mappings for all instruction types
-func3 = {"R-Type": {"add": "000", "sub": "000", "slt": "010", "srl": "101", "or": "110", "and": "111"},
-         "I-Type": {"lw": "010", "addi": "000", "jalr": "000"},
-         "S-Type": {"sw": "010"},
-         "B-Type": {"beq": "000", "bne": "001", "blt": "100"},
-         "J-Type": {"jal": "000"}}
+if __package__ in (None, ""):
+    # Running as a script: make the packages under src/ importable
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-opcode = {"R-Type": {"add": "0110011", "sub": "0110011", "slt": "0110011", "srl": "0110011", "or": "0110011", "and": "0110011"},
-          "I-Type": {"lw": "0000011", "addi": "0010011", "jalr": "1100111"},
-          "S-Type": {"sw": "0100011"},
-          "B-Type": {"beq": "1100011", "bne": "1100011", "blt": "1100011"},
-          "J-Type": {"jal": "1101111"}}
+from assembler.encoding import (CACHE_SALT, EXPECTED_ARGS, FORMAT, REGISTER, RELOCATIONS, i_immediate,
+                                s_immediate, shamt, u_immediate)
+from assembler.image import write_image
+from assembler.objects import CACHE_SIZE, ObjectCache, ObjectFile, link, merge
 
-registers = {"zero": "00000", "ra": "00001", "sp": "00010", "gp": "00011", "tp": "00100", "t0": "00101", "t1": "00110",
-             "t2": "00111", "s0": "01000", "s1": "01001", "a0": "01010", "a1": "01011", "a2": "01100", "a3": "01101",
-             "a4": "01110", "a5": "01111", "a6": "10000", "a7": "10001", "s2": "10010", "s3": "10011", "s4": "10100",
-             "s5": "10101", "s6": "10110", "s7": "10111", "s8": "11000", "s9": "11001", "s10": "11010", "s11": "11011",
-             "t3": "11100", "t4": "11101", "t5": "11110", "t6": "11111"}
+# Sources at least this large are split into chunks assembled by a process pool
+PARALLEL_BYTES = 4 << 20
+CHUNKS_PER_JOB = 4
 
-def int_to_bin(n, bits=12):
-    if n < 0:
-        n = (1 << bits) + n
-    return format(n & ((1 << bits) - 1), f'0{bits}b')
 
-def validate_instruction(op, parts):
-    # Instruction Error: Check if the instruction is recognized
-    if op not in func3["R-Type"] and op not in func3["I-Type"] and op not in func3["S-Type"] and op not in func3["B-Type"] and op not in func3["J-Type"]:
-        raise ValueError(f"Unrecognized instruction: {op}")
+def is_offset(target):
+    return target.lstrip("-").isdigit()
 
-    # Modified expected args for lw instruction
-    expected_args = {
-        "R-Type": 4,
-        "I-Type": {"lw": 3, "addi": 4, "jalr": 4},  # lw expects 3 parts due to different parsing
-        "S-Type": {"sw":3},
-        "B-Type": 4,
-        "J-Type": 3
-    }
-    # Modified syntax check for different instruction types
-    if op in func3["I-Type"]:
-        expected = expected_args["I-Type"][op]
-        if len(parts) != expected:
-            raise ValueError(f"Syntax error: Incorrect number of arguments for {op}, expected {expected}")
-    elif op in func3["S-Type"]:
-        expected = expected_args["S-Type"][op]
-        if len(parts) != expected:
-            raise ValueError(f"Syntax error: Incorrect number of arguments for {op}, expected {expected}")
-    else:
-        for inst_type, count in expected_args.items():
-            if isinstance(count, dict):
-                continue
-            if op in func3[inst_type] and len(parts) != count:
-                raise ValueError(f"Syntax error: Incorrect number of arguments for {op}, expected {count}")
-def convert_r_type(op, parts):
-    rd = registers[parts[1]]
-    rs1 = registers[parts[2]]
-    rs2 = registers[parts[3]]
-    funct7 = "0100000" if op == "sub" else "0000000"
-    funct3_val = func3["R-Type"][op]
-    op_val = opcode["R-Type"][op]
-    return f"{funct7}{rs2}{rs1}{funct3_val}{rd}{op_val}"
 
-def convert_i_type(op, parts):
-    if op == "lw":
-        rd = registers[parts[1]]
-        # Parse the offset and base register from the format: offset(reg)
-        offset_str, base_reg = parts[2].split('(')
-        base_reg = base_reg.rstrip(')')
-        imm = int(offset_str)
-        rs1 = registers[base_reg]
-        imm_val = int_to_bin(imm, 12)
-        funct3_val = func3["I-Type"][op]
-        op_val = opcode["I-Type"][op]
-    else:
-        rd = registers[parts[1]]
-        rs1 = registers[parts[2]]
-        imm = int(parts[3])
-        imm_val = int_to_bin(imm, 12)
-        funct3_val = func3["I-Type"][op]
-        op_val = opcode["I-Type"][op]
-    return f"{imm_val}{rs1}{funct3_val}{rd}{op_val}"
+def memory_operand(op, tokens):
+    # rd/rs2, offset, base from "op reg, offset(base)"
+    if len(tokens) > 3:
+        tokens = tokens[:2] + ["".join(tokens[2:])]
+    offset, paren, base = tokens[-1].partition("(")
+    if len(tokens) != 3 or not paren or not base.endswith(")"):
+        raise ValueError(f"Syntax error: Incorrect number of arguments for {op}, expected 3")
+    return REGISTER[tokens[1]], int(offset), REGISTER[base[:-1]]
+
 
-def convert_s_type(op, parts):
-    # Parse the offset and base register from the format: offset(reg)
-    rs2 = registers[parts[1]]  # Source register
-    offset_str, base_reg = parts[2].split('(')
-    base_reg = base_reg.rstrip(')')
-    imm = int(offset_str)
-    rs1 = registers[base_reg]  # Base register
-    
-    imm_val = int_to_bin(imm, 12)
-    funct3_val = func3["S-Type"][op]
-    op_val = opcode["S-Type"][op]
-    
-    # S-type immediate is split into two parts
-    imm_11_5 = imm_val[:7]   # Upper 7 bits
-    imm_4_0 = imm_val[7:]    # Lower 5 bits
-    
-    return f"{imm_11_5}{rs2}{rs1}{funct3_val}{imm_4_0}{op_val}"
+def source_lines(data):
+    # Lines of a source read as bytes, decoded and split exactly as open(path) would
+    return io.TextIOWrapper(io.BytesIO(data))
 
-def convert_b_type(op, parts, current_address, labels):
-    rs1 = registers[parts[1]]
-    rs2 = registers[parts[2]]
-    target = parts[3]
-    
-    # Calculate offset
-    if target.isdigit() or (target[0] == '-' and target[1:].isdigit()):
-        offset = int(target)  # Direct offset value
-    else:
-        if target not in labels:
-            return None
-        offset = labels[target] - current_address  # PC-relative offset
-    
-    # Convert offset to bits
-    imm_bin = int_to_bin(offset, 13)  # B-type uses 13-bit immediate
-    
-    # Rearrange immediate bits for B-type format
-    imm_12 = imm_bin[0]  # bit 12
-    imm_11 = imm_bin[1]  # bit 11
-    imm_10_5 = imm_bin[2:8]  # bits 10-5
-    imm_4_1 = imm_bin[8:12]  # bits 4-1
-    
-    funct3_val = func3["B-Type"][op]
-    op_val = opcode["B-Type"][op]
-    
-    return f"{imm_12}{imm_10_5}{rs2}{rs1}{funct3_val}{imm_4_1}{imm_11}{op_val}"
 
-def convert_j_type(op, parts, current_address, labels):
-    rd = registers[parts[1]]
-    target = parts[2]
-    
-    # Calculate offset
-    if target.isdigit() or (target[0] == '-' and target[1:].isdigit()):
-        offset = int(target)  # Direct offset value
-    else:
-        if target not in labels:
-            return None
-        offset = labels[target] - current_address  # PC-relative offset
-    
-    # Convert offset to bits
-    imm_bin = int_to_bin(offset, 21)  # J-type uses 21-bit immediate
-    
-    # Rearrange immediate bits for J-type format
-    imm_20 = imm_bin[0]       # bit 20
-    imm_10_1 = imm_bin[10:20]  # bits 10-1
-    imm_11 = imm_bin[9]        # bit 11
-    imm_19_12 = imm_bin[1:9]   # bits 19-12
-    
-    op_val = opcode["J-Type"][op]
-    
-    return f"{imm_20}{imm_10_1}{imm_11}{imm_19_12}{rd}{op_val}"
+def split_source(data, chunks):
+    # (start, end, first line number) of about `chunks` pieces of data, each ending after a newline
+    size = len(data)
+    step = max(1, size // chunks)
+    pieces = []
+    start = 0
+    line = 1
+    while start < size:
+        end = data.find(b"\n", start + step - 1)
+        end = size if end < 0 else end + 1
+        pieces.append((start, end, line))
+        line += data.count(b"\n", start, end)
+        start = end
+    return pieces
 
-def convert_to_binary(instruction, labels, current_address):
-    # Special handling for lw/sw instructions
-    if instruction.startswith(('lw', 'sw')):
-        parts = instruction.replace(',', ' ').split(None, 2)
-    else:
-        parts = instruction.replace(',', ' ').replace("(", ' ').replace(")", "").split()
-    
-    op = parts[0]
-    validate_instruction(op, parts)
-    
-    try:
-        if op in func3["R-Type"]:
-            return convert_r_type(op, parts)
-        elif op in func3["I-Type"]:
-            return convert_i_type(op, parts)
-        elif op in func3["S-Type"]:
-            return convert_s_type(op, parts)
-        elif op in func3["B-Type"]:
-            binary = convert_b_type(op, parts, current_address, labels)
-            if binary is None:
-                return f"UNRESOLVED_B:{op}:{','.join(parts[1:])}"
-            return binary
-        elif op in func3["J-Type"]:
-            binary = convert_j_type(op, parts, current_address, labels)
-            if binary is None:
-                return f"UNRESOLVED_J:{op}:{','.join(parts[1:])}"
-            return binary
-    except Exception as e:
-        raise ValueError(f"Error in {op} instruction: {str(e)}")
-    
 
-    # Register Error: Check if the provided registers exist
-    if op in func3["R-Type"]:
-        if parts[1] not in registers or parts[2] not in registers or parts[3] not in registers:
-            raise ValueError(f"Invalid register in {op} instruction")
-    elif op in func3["I-Type"]:
-        if op == "lw":
-            # For lw, check destination register and base register
-            if parts[1] not in registers or parts[2].split('(')[1].rstrip(')') not in registers:
-                raise ValueError(f"Invalid register in {op} instruction")
-        else:
-            # For other I-Type instructions
-            if parts[1] not in registers or parts[2] not in registers:
-                raise ValueError(f"Invalid register in {op} instruction")
-    elif op in func3["S-Type"]:
-        if parts[1] not in registers or parts[3] not in registers:
-            raise ValueError(f"Invalid register in {op} instruction")
-    elif op in func3["B-Type"]:
-        if parts[1] not in registers or parts[2] not in registers:
-            raise ValueError(f"Invalid register in {op} instruction")
-    elif op in func3["J-Type"]:
-        if parts[1] not in registers:
-            raise ValueError(f"Invalid register in {op} instruction")
+def assemble_chunk(path, start, end, first_line):
+    # Pool worker: one piece of a source file, read from disk so only the object is sent back
+    with open(path, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+    return Assembler(track_source=False).assemble_object(source_lines(data), first_line=first_line,
+                                                         resolve=False)
 
-    # Immediate Value Error: Check if the immediate value is within the allowed range
-    def check_immediate(imm, bits, signed=True):
-        min_val = -(1 << (bits - 1)) if signed else 0
-        max_val = (1 << (bits - 1)) - 1 if signed else (1 << bits) - 1
-        if not (min_val <= imm <= max_val):
-            raise ValueError(f"Immediate value {imm} out of range for {bits}-bit field: [{min_val}, {max_val}]")
 
-    try:
-        if op in func3["I-Type"]:
-            if op == "lw":
-                # Extract immediate from offset(reg) format
-                imm = int(parts[2].split('(')[0])
-            else:
-                imm = int(parts[3])
-            check_immediate(imm, 12)
-        elif op in func3["S-Type"]:
-            imm = int(parts[2])
-            check_immediate(imm, 12)
-        elif op in func3["B-Type"]:
-            if parts[3].isdigit() or (parts[3][0] == '-' and parts[3][1:].isdigit()):
-                imm = int(parts[3])
-                check_immediate(imm, 13)
-        elif op in func3["J-Type"]:
-            if parts[2].isdigit() or (parts[2][0] == '-' and parts[2][1:].isdigit()):
-                imm = int(parts[2])
-                check_immediate(imm, 21)
-    except ValueError as e:
-        if not (op in func3["B-Type"] or op in func3["J-Type"]):
-            raise ValueError(f"Invalid immediate value in {op} instruction: {str(e)}")
+class Assembler:
+    # Turns source text into encoded words without touching the filesystem.
+    #   words = Assembler().assemble(source)    # source text or any iterable of lines, e.g. a file
+    # A single pass tokenizes each line and appends its word to an array. Branches and jumps to
+    # labels defined further down are emitted with a zero offset and patched once the pass ends.
+    # assemble_object() stops short of that for labels the source does not define, leaving them
+    # as relocations for link(); assemble_files() builds and links several files through an
+    # optional ObjectCache (see objects.py). Large files are split across a process pool there
+    # when track_source is off; the merged chunks are identical to a serial pass.
+    # lines() keeps the CLI text output, with an "Error processing line N" entry per bad instruction.
+    # source_map maps each instruction address to its (line number, source line); pass
+    # track_source=False to skip it on very large inputs.
+    def __init__(self, track_source=True):
+        self.track_source = track_source
+        self.labels = {}
+        self.errors = []
+        self.failed = {}  # word index -> error line
+        self.source_map = {}
 
-def main():
-    # First pass: collect labels and instructions
-    instructions = []
-    labels = {}
-    current_address = 0
-    input_filename = str(sys.argv[1])
-    output_filename = str(sys.argv[2])
-    with open(input_filename, "r") as f:
-        for line in f:
-            line = line.strip()
-            if not line or line.startswith('#'):
+    @property
+    def entry(self):
+        return self.labels.get("_start", 0)
+
+    def assemble_object(self, source, name=None, first_line=1, resolve=True):
+        # With resolve=False every label reference is left as a relocation, for chunks of one
+        # source that are merged later (see assemble_chunk)
+        if isinstance(source, str):
+            source = source.splitlines()
+        words = array("I")
+        labels = {}
+        fixups = []  # (word index, kind, label, line number, line)
+        errors = []  # (line number, message)
+        failed = {}
+        source_map = {} if self.track_source else None
+        append = words.append
+        for number, line in enumerate(source, first_line):
+            # Plain str methods: on CPython they split a line several times faster than a regex
+            if "#" in line:
+                line = line[:line.index("#")]
+            address = 4 * len(words)
+            statement = line
+            if ":" in line:
+                label, _, line = line.partition(":")
+                labels[label.strip()] = address
+            tokens = line.replace(",", " ").split()
+            if not tokens:
                 continue
-            
-            if ':' in line:
-                label, instruction = line.split(':')
-                labels[label.strip()] = current_address
-                if instruction.strip():
-                    instructions.append((instruction.strip(), current_address))
-                    current_address += 4
-            else:
-                instructions.append((line, current_address))
-                current_address += 4
-    
-    # Second pass: resolve all instructions
-    with open(output_filename, "w") as outfile:
-        for instruction, addr in instructions:
+            if source_map is not None:
+                source_map[address] = (number, statement.strip())
+
+            op = tokens[0]
             try:
-                binary = convert_to_binary(instruction, labels, addr)
-                if binary:
-                    if binary.startswith("UNRESOLVED"):
-                        # Resolve the instruction now that we have all labels
-                        _, type, rest = binary.split(":", 2)
-                        op, *args = rest.split(",")
-                        parts = [op] + args
-                        if type == "B":
-                            binary = convert_b_type(op, parts, addr, labels)
-                        else:  # type == "J"
-                            binary = convert_j_type(op, parts, addr, labels)
-                    outfile.write(f"{binary}\n")
-            except Exception as e:
-                outfile.write(f"Error processing line: {instruction} -> {e}\n")
+                kind, base = FORMAT[op]
+            except KeyError:
+                kind = None
+            try:
+                if kind is None:
+                    raise ValueError(f"Unrecognized instruction: {op}")
+                if kind == "L":
+                    rd, imm, rs1 = memory_operand(op, tokens)
+                    word = base | i_immediate(imm) | rs1 << 15 | rd << 7
+                elif kind == "S":
+                    rs2, imm, rs1 = memory_operand(op, tokens)
+                    word = base | s_immediate(imm) | rs2 << 20 | rs1 << 15
+                else:
+                    if len(tokens) != EXPECTED_ARGS[kind]:
+                        # Parentheses separate operands like commas outside lw/sw
+                        tokens = line.replace(",", " ").replace("(", " ").replace(")", "").split()
+                        if len(tokens) != EXPECTED_ARGS[kind]:
+                            raise ValueError(f"Syntax error: Incorrect number of arguments for {op}, "
+                                             f"expected {EXPECTED_ARGS[kind]}")
+                    if kind == "R":
+                        word = (base | REGISTER[tokens[3]] << 20 | REGISTER[tokens[2]] << 15
+                                | REGISTER[tokens[1]] << 7)
+                    elif kind == "I":
+                        word = (base | i_immediate(int(tokens[3])) | REGISTER[tokens[2]] << 15
+                                | REGISTER[tokens[1]] << 7)
+                    elif kind == "T":
+                        word = base | shamt(int(tokens[3])) | REGISTER[tokens[2]] << 15 | REGISTER[tokens[1]] << 7
+                    elif kind == "U":
+                        word = base | u_immediate(int(tokens[2])) | REGISTER[tokens[1]] << 7
+                    elif kind == "N":
+                        word = base
+                    else:
+                        if kind == "B":
+                            word = base | REGISTER[tokens[2]] << 20 | REGISTER[tokens[1]] << 15
+                        else:
+                            word = base | REGISTER[tokens[1]] << 7
+                        immediate = RELOCATIONS[kind]
+                        target = tokens[-1]
+                        if is_offset(target):
+                            word |= immediate(int(target))
+                        else:
+                            # Resolved against the final labels, so a redefined label means its last definition
+                            fixups.append((len(words), kind, target, number, line.strip()))
+            except (KeyError, ValueError) as e:
+                message = f"Invalid register: {e.args[0]}" if isinstance(e, KeyError) else str(e)
+                errors.append((number, f"Error processing line {number}: {line.strip()} -> {message}"))
+                failed[len(words)] = errors[-1][1]
+                word = 0
+            append(word)
+
+        self.source_map = source_map if source_map is not None else {}
+        obj = ObjectFile(words, labels, fixups, errors, failed, name)
+        if resolve:
+            obj.resolve()  # backpatch references to labels of this source; the rest stay relocations
+        return obj
+
+    def link(self, objects):
+        words, self.labels, self.errors, self.failed = link(objects)
+        return words
+
+    def encode(self, source):
+        return self.link([self.assemble_object(source)])
+
+    def assemble_files(self, paths, cache=None, jobs=None):
+        # Assembles each file, or takes its object from the cache when its content is unchanged,
+        # and links them in order. Objects with errors are never cached. Files of PARALLEL_BYTES
+        # or more use `jobs` processes (default: one per CPU); jobs=1 keeps everything serial.
+        jobs = jobs or os.cpu_count() or 1
+        objects = []
+        pool = None
+        try:
+            for path in paths:
+                parallel = jobs > 1 and not self.track_source and os.path.getsize(path) >= PARALLEL_BYTES
+                if cache is None and not parallel:
+                    with open(path, "r") as f:
+                        objects.append(self.assemble_object(f, path))  # streams the file line by line
+                    continue
+                with open(path, "rb") as f:
+                    data = f.read()
+                obj = None
+                if cache is not None:
+                    key = cache.key(data)
+                    obj = cache.get(key, path)
+                if obj is None:
+                    if parallel:
+                        if pool is None:
+                            pool = ProcessPoolExecutor(jobs)
+                        pieces = split_source(data, jobs * CHUNKS_PER_JOB)
+                        starts, ends, lines = zip(*pieces)
+                        obj = merge(list(pool.map(assemble_chunk, [path] * len(pieces), starts, ends, lines)), path)
+                    else:
+                        obj = self.assemble_object(source_lines(data), path)
+                    if cache is not None and not obj.errors:
+                        cache.put(key, obj)
+                objects.append(obj)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        if cache is not None:
+            cache.trim()
+        return self.link(objects)
+
+    def text(self, words):
+        # Binary text lines for encoded words, with error lines in place of failed instructions
+        failed = self.failed
+        if not failed:
+            return map("{:032b}".format, words)
+        return (failed[index] if index in failed else format(word, "032b") for index, word in enumerate(words))
+
+    def lines(self, source):
+        return list(self.text(self.encode(source)))
+
+    def assemble(self, source):
+        words = self.encode(source)
+        if self.errors:
+            raise ValueError("\n".join(self.errors))
+        return words
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Assemble RISC-V source into a binary program")
+    parser.add_argument("inputs", nargs="+", metavar="input",
+                        help="assembly sources, linked in the order given")
+    parser.add_argument("output", help="assembled program")
+    parser.add_argument("--format", choices=("text", "raw", "image"), default="text",
+                        help="text: one binary line per instruction (default); raw: packed little-endian "
+                             "words; image: packed words with an entry point and symbol header")
+    parser.add_argument("--jobs", type=int,
+                        help=f"processes for sources of {PARALLEL_BYTES >> 20} MiB or more "
+                             f"(default: one per CPU; 1 assembles serially)")
+    parser.add_argument("--cache", metavar="DIR",
+                        help="reuse the objects of unchanged sources from this directory")
+    parser.add_argument("--cache-size", type=int, default=CACHE_SIZE,
+                        help=f"bytes the cache may hold before the least recently used objects go "
+                             f"(default: {CACHE_SIZE})")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    options = parse_args(argv)
+    assembler = Assembler(track_source=False)
+    cache = None
+    if options.cache:
+        cache = ObjectCache(options.cache, options.cache_size, salt=CACHE_SALT)
+    words = assembler.assemble_files(options.inputs, cache, options.jobs)
+
+    if options.format == "text":
+        with open(options.output, "w") as outfile:
+            outfile.writelines(f"{line}\n" for line in assembler.text(words))
+        return
+
+    # Packed formats cannot carry error lines
+    if assembler.errors:
+        print("\n".join(assembler.errors), file=sys.stderr)
+        sys.exit(1)
+    write_image(options.output, words, entry=assembler.entry, symbols=assembler.labels,
+                header=options.format == "image")
 
-main()
+if __name__ == "__main__":
+    main()
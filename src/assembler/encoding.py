@@ -0,0 +1,136 @@
+from .tables import func3, funct7, opcode, registers
+
+# Shared integer encoding and decoding of RV32IM words, used by the assembler, its per-format
+# converters and the simulator's decoder. Everything works on ints with shifts and masks; the
+# only binary strings are the ones in tables.py, read once here.
+
+LOADS = ("lb", "lh", "lw", "lbu", "lhu")
+SHIFTS = ("slli", "srli", "srai")
+# Instructions without operands -> the rest of their fixed bits (fence: pred and succ "iorw")
+NO_OPERANDS = {"fence": 0x0FF << 20, "ecall": 0, "ebreak": 1 << 20}
+
+
+def kind_of(inst_type, op):
+    # Format letter, with "L" for loads, "T" for shifts by an immediate and "N" for no operands
+    if op in LOADS:
+        return "L"
+    if op in SHIFTS:
+        return "T"
+    if op in NO_OPERANDS:
+        return "N"
+    return inst_type[0]
+
+
+# Integer forms of tables.py: register name -> number, and mnemonic -> (format, base word) where
+# the base word already holds opcode | funct3 << 12 | funct7 << 25 and any other fixed bits
+REGISTER = {name: int(bits, 2) for name, bits in registers.items()}
+FORMAT = {op: (kind_of(inst_type, op),
+               int(opcode[inst_type][op], 2) | int(funct3_val, 2) << 12 | int(funct7.get(op, "0"), 2) << 25
+               | NO_OPERANDS.get(op, 0))
+          for inst_type, ops in func3.items() for op, funct3_val in ops.items()}
+
+# Keys object caches (see objects.ObjectCache); changes whenever the encoding does
+CACHE_SALT = b"range-checked " + repr(sorted(FORMAT.items())).encode()
+
+# Operand count per format, including the mnemonic ("L"/"S" count offset(base) as one operand)
+EXPECTED_ARGS = {"R": 4, "I": 4, "T": 4, "L": 3, "S": 3, "B": 4, "J": 3, "U": 3, "N": 1}
+
+
+def check_range(value, bits, signed=True):
+    # Immediate Value Error: the value must fit a `bits`-wide field
+    low = -(1 << (bits - 1)) if signed else 0
+    high = (1 << (bits - 1)) - 1 if signed else (1 << bits) - 1
+    if not low <= value <= high:
+        raise ValueError(f"Immediate value {value} out of range for {bits}-bit field: [{low}, {high}]")
+
+
+def i_immediate(imm):
+    # imm[11:0] in bits 31:20
+    if not -2048 <= imm < 2048:
+        check_range(imm, 12)
+    return (imm & 0xFFF) << 20
+
+
+def s_immediate(imm):
+    # imm[11:5] in bits 31:25, imm[4:0] in bits 11:7
+    if not -2048 <= imm < 2048:
+        check_range(imm, 12)
+    return ((imm >> 5) & 0x7F) << 25 | (imm & 0x1F) << 7
+
+
+def b_immediate(offset):
+    # imm[12|10:5] in bits 31:25, imm[4:1|11] in bits 11:7
+    if not -4096 <= offset < 4096:
+        check_range(offset, 13)
+    offset &= 0x1FFF
+    return ((offset >> 12) << 31 | ((offset >> 5) & 0x3F) << 25 | ((offset >> 1) & 0xF) << 8
+            | ((offset >> 11) & 1) << 7)
+
+
+def j_immediate(offset):
+    # imm[20|10:1|11|19:12] in bits 31:12
+    if not -0x100000 <= offset < 0x100000:
+        check_range(offset, 21)
+    offset &= 0x1FFFFF
+    return ((offset >> 20) << 31 | ((offset >> 1) & 0x3FF) << 21 | ((offset >> 11) & 1) << 20
+            | ((offset >> 12) & 0xFF) << 12)
+
+
+def u_immediate(imm):
+    # imm[31:12] in bits 31:12; the 20 bits may be written signed or unsigned
+    if not -0x80000 <= imm < 0x100000:
+        raise ValueError(f"Immediate value {imm} out of range for 20-bit field: [-524288, 1048575]")
+    return (imm & 0xFFFFF) << 12
+
+
+def shamt(amount):
+    if not 0 <= amount < 32:
+        raise ValueError(f"Shift amount out of range: {amount}")
+    return amount << 20
+
+
+# Relocation kind -> encoder of a PC-relative offset into the word's immediate bits
+RELOCATIONS = {"B": b_immediate, "J": j_immediate}
+
+
+def encode(op, rd=0, rs1=0, rs2=0, imm=0):
+    # One word from register numbers and an immediate (a PC-relative offset for B and J)
+    kind, word = FORMAT[op]
+    if kind == "R":
+        return word | rs2 << 20 | rs1 << 15 | rd << 7
+    if kind in ("I", "L"):
+        return word | i_immediate(imm) | rs1 << 15 | rd << 7
+    if kind == "T":
+        return word | shamt(imm) | rs1 << 15 | rd << 7
+    if kind == "S":
+        return word | s_immediate(imm) | rs2 << 20 | rs1 << 15
+    if kind == "B":
+        return word | b_immediate(imm) | rs2 << 20 | rs1 << 15
+    if kind == "J":
+        return word | j_immediate(imm) | rd << 7
+    if kind == "U":
+        return word | u_immediate(imm) | rd << 7
+    return word
+
+
+def sign_extend(value, bits):
+    sign_bit = 1 << (bits - 1)
+    return (value & (sign_bit - 1)) - (value & sign_bit)
+
+
+def decode_imm(opcode, word):
+    # The immediate of a word, sign-extended for its format; the inverse of the encoders above
+    if opcode == 0b1100011:  # B-type: imm[12|10:5] rs2 rs1 funct3 imm[4:1|11]
+        imm = (((word >> 31) & 0x1) << 12) | (((word >> 7) & 0x1) << 11) | \
+              (((word >> 25) & 0x3F) << 5) | (((word >> 8) & 0xF) << 1)
+        return sign_extend(imm, 13)
+    if opcode == 0b1101111:  # J-type: imm[20|10:1|11|19:12] rd
+        imm = (((word >> 31) & 0x1) << 20) | (((word >> 12) & 0xFF) << 12) | \
+              (((word >> 20) & 0x1) << 11) | (((word >> 21) & 0x3FF) << 1)
+        return sign_extend(imm, 21)
+    if opcode == 0b0100011:  # S-type: imm[11:5] rs2 rs1 funct3 imm[4:0]
+        return sign_extend((((word >> 25) & 0x7F) << 5) | ((word >> 7) & 0x1F), 12)
+    if opcode in (0b0110111, 0b0010111):  # U-type (LUI, AUIPC): imm[31:12]
+        return sign_extend(word & 0xFFFFF000, 32)
+    # I-type (and anything else): imm[11:0] in the top 12 bits
+    return sign_extend(word >> 20, 12)
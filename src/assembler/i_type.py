@@ -1,22 +1,13 @@
-from .tables import func3, opcode, registers
-from .utils import int_to_bin
+from .encoding import LOADS, REGISTER, encode
 
 
 def convert_i_type(op, parts):
-    if op == "lw":
-        rd = registers[parts[1]]
+    rd = REGISTER[parts[1]]
+    if op in LOADS:
         offset_str, base_reg = parts[2].split('(')
-        base_reg = base_reg.rstrip(')')
+        rs1 = REGISTER[base_reg.rstrip(')')]
         imm = int(offset_str)
-        rs1 = registers[base_reg]
-        imm_val = int_to_bin(imm, 12)
     else:
-        rd = registers[parts[1]]
-        rs1 = registers[parts[2]]
-        imm = int(parts[3])
-        imm_val = int_to_bin(imm, 12)
-
-    funct3_val = func3["I-Type"][op]
-    op_val = opcode["I-Type"][op]
-
-    return f"{imm_val}{rs1}{funct3_val}{rd}{op_val}"
+        rs1 = REGISTER[parts[2]]
+        imm = int(parts[3])  # shamt for slli/srli/srai
+    return format(encode(op, rd, rs1, imm=imm), "032b")
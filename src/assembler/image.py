@@ -0,0 +1,71 @@
+import struct
+import sys
+from array import array
+
+# Packed program image: little-endian 32-bit words, optionally preceded by a header
+#   magic "RV32", version, flags, entry point, word count, symbol count
+# and followed by the symbol table (address, name length, UTF-8 name) per symbol.
+MAGIC = b"RV32"
+VERSION = 1
+HEADER = struct.Struct("<4sHHIII")
+SYMBOL = struct.Struct("<IH")
+
+
+def pack_words(words):
+    data = array("I", words)
+    if sys.byteorder != "little":
+        data.byteswap()
+    return data.tobytes()
+
+
+def pack_image(words, entry=0, symbols=None, header=True):
+    body = pack_words(words)
+    if not header:
+        return body
+    symbols = symbols or {}
+    table = b"".join(SYMBOL.pack(addr, len(name.encode())) + name.encode()
+                     for name, addr in symbols.items())
+    return HEADER.pack(MAGIC, VERSION, 0, entry, len(words), len(symbols)) + body + table
+
+
+def write_image(path, words, entry=0, symbols=None, header=True):
+    with open(path, "wb") as f:
+        f.write(pack_image(words, entry, symbols, header))
+
+
+def has_header(buffer):
+    return len(buffer) >= HEADER.size and bytes(buffer[:4]) == MAGIC
+
+
+def unpack_words(buffer):
+    # Zero-copy view of the words when the host is little-endian, otherwise a swapped copy
+    if len(buffer) % 4:
+        raise ValueError("Program image is not a whole number of 32-bit words")
+    if sys.byteorder == "little" and array("I").itemsize == 4:
+        return memoryview(buffer).cast("B").cast("I")
+    words = array("I")
+    words.frombytes(bytes(buffer))
+    if sys.byteorder != "little":
+        words.byteswap()
+    return words
+
+
+def parse_image(buffer):
+    # Returns (words, entry, symbols) for a headered or raw image
+    if not has_header(buffer):
+        return unpack_words(buffer), 0, {}
+    magic, version, flags, entry, count, nsyms = HEADER.unpack_from(buffer, 0)
+    if version != VERSION:
+        raise ValueError(f"Unsupported program image version: {version}")
+    start = HEADER.size
+    end = start + 4 * count
+    if end > len(buffer):
+        raise ValueError("Program image is truncated")
+    symbols = {}
+    offset = end
+    for _ in range(nsyms):
+        addr, length = SYMBOL.unpack_from(buffer, offset)
+        offset += SYMBOL.size
+        symbols[bytes(buffer[offset:offset + length]).decode()] = addr
+        offset += length
+    return unpack_words(memoryview(buffer)[start:end]), entry, symbols
@@ -0,0 +1,232 @@
+import hashlib
+import os
+import struct
+import sys
+import tempfile
+from array import array
+
+from .encoding import RELOCATIONS
+
+# Relocatable object: the words of one source file, its labels, and the branch/jump references
+# it could not resolve on its own. Serialized for the on-disk cache as
+#   magic "RVOB", version, flags, word count, symbol count, relocation count
+# then the little-endian words, the symbols (address, name length, UTF-8 name) and the
+# relocations (word index, kind, line number, label length, line length, label, line).
+MAGIC = b"RVOB"
+VERSION = 1
+HEADER = struct.Struct("<4sHHIII")
+SYMBOL = struct.Struct("<IH")
+RELOCATION = struct.Struct("<IcIHH")
+CACHE_SIZE = 64 << 20  # default bound on the cache directory, in bytes
+
+
+class ObjectFile:
+    # words: array('I') with zero immediates where relocations apply
+    # labels: label -> address relative to the start of this object
+    # relocations: (word index, kind, label, line number, line) per unresolved reference
+    # errors: (line number, message); failed: word index -> message, for text output
+    def __init__(self, words, labels, relocations, errors=None, failed=None, name=None):
+        self.words = words
+        self.labels = labels
+        self.relocations = relocations
+        self.errors = errors or []
+        self.failed = failed or {}
+        self.name = name
+
+    def resolve(self):
+        # Patches the relocations that refer to this object's own labels
+        words = self.words
+        labels = self.labels
+        relocations = []
+        for relocation in self.relocations:
+            index, kind, target = relocation[:3]
+            try:
+                words[index] |= RELOCATIONS[kind](labels[target] - 4 * index)
+            except (KeyError, ValueError):
+                relocations.append(relocation)  # undefined here or out of range; link() reports it
+        self.relocations = relocations
+
+
+def merge(chunks, name=None):
+    # Joins consecutive chunks of one source into the object a single pass over it would give:
+    # later label definitions win, and references between chunks are resolved.
+    if len(chunks) == 1:
+        obj = chunks[0]
+        obj.name = name
+        obj.resolve()
+        return obj
+    words = array("I")
+    labels = {}
+    relocations = []
+    errors = []
+    failed = {}
+    for chunk in chunks:
+        base = len(words)
+        words.extend(chunk.words)
+        for label, addr in chunk.labels.items():
+            labels[label] = 4 * base + addr
+        relocations.extend((base + index, kind, target, number, line)
+                           for index, kind, target, number, line in chunk.relocations)
+        errors.extend(chunk.errors)
+        for index, message in chunk.failed.items():
+            failed[base + index] = message
+    obj = ObjectFile(words, labels, relocations, errors, failed, name)
+    obj.resolve()
+    return obj
+
+
+def pack_object(obj):
+    words = array("I", obj.words)
+    if sys.byteorder != "little":
+        words.byteswap()
+    parts = [HEADER.pack(MAGIC, VERSION, 0, len(words), len(obj.labels), len(obj.relocations)), words.tobytes()]
+    for name, addr in obj.labels.items():
+        name = name.encode()
+        parts.append(SYMBOL.pack(addr, len(name)) + name)
+    for index, kind, target, number, line in obj.relocations:
+        target = target.encode()
+        line = line.encode()
+        parts.append(RELOCATION.pack(index, kind.encode(), number, len(target), len(line)) + target + line)
+    return b"".join(parts)
+
+
+def parse_object(buffer, name=None):
+    magic, version, flags, count, nsyms, nrelocs = HEADER.unpack_from(buffer, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"Not a version {VERSION} object file")
+    offset = HEADER.size
+    words = array("I")
+    words.frombytes(buffer[offset:offset + 4 * count])
+    if sys.byteorder != "little":
+        words.byteswap()
+    offset += 4 * count
+    labels = {}
+    for _ in range(nsyms):
+        addr, length = SYMBOL.unpack_from(buffer, offset)
+        offset += SYMBOL.size
+        labels[buffer[offset:offset + length].decode()] = addr
+        offset += length
+    relocations = []
+    for _ in range(nrelocs):
+        index, kind, number, target_length, line_length = RELOCATION.unpack_from(buffer, offset)
+        offset += RELOCATION.size
+        target = buffer[offset:offset + target_length].decode()
+        offset += target_length
+        line = buffer[offset:offset + line_length].decode()
+        offset += line_length
+        relocations.append((index, kind.decode(), target, number, line))
+    return ObjectFile(words, labels, relocations, name=name)
+
+
+def link(objects):
+    # Lays the objects out back to back, in order, and patches every reference between them.
+    # Returns (words, symbols, errors, failed). A single object is patched in place; with
+    # several, messages are prefixed with the object's name.
+    named = len(objects) > 1
+    if named:
+        words = array("I")
+        for obj in objects:
+            words.extend(obj.words)
+    else:
+        words = objects[0].words if objects else array("I")
+
+    symbols = {}
+    owners = {}
+    errors = []
+    failed = {}
+    bases = []
+    base = 0
+    for obj in objects:
+        prefix = f"{obj.name}: " if named else ""
+        bases.append(base)
+        for label, addr in obj.labels.items():
+            if label in symbols:
+                errors.append(f"{prefix}Duplicate symbol: {label} (also defined in {owners[label]})")
+                continue
+            symbols[label] = base + addr
+            owners[label] = obj.name
+        for index, message in obj.failed.items():
+            failed[base // 4 + index] = prefix + message
+        base += 4 * len(obj.words)
+
+    for obj, base in zip(objects, bases):
+        prefix = f"{obj.name}: " if named else ""
+        unresolved = []
+        for index, kind, target, number, line in obj.relocations:
+            try:
+                if target not in symbols:
+                    raise ValueError(f"Undefined label: {target}")
+                words[base // 4 + index] |= RELOCATIONS[kind](symbols[target] - base - 4 * index)
+            except ValueError as e:
+                message = f"Error processing line {number}: {line} -> {e}"
+                unresolved.append((number, message))
+                failed[base // 4 + index] = prefix + message
+        object_errors = sorted(obj.errors + unresolved, key=lambda error: error[0])
+        errors.extend(prefix + message for _, message in object_errors)
+    return words, symbols, errors, failed
+
+
+class ObjectCache:
+    # Objects on disk under the SHA-256 of (salt, source bytes). The salt should change whenever
+    # the encoding does, so stale objects are never reused. Reads refresh a file's mtime and
+    # trim() removes the least recently used files until the directory fits in max_bytes.
+    def __init__(self, directory, max_bytes=CACHE_SIZE, salt=b""):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.salt = salt
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, data):
+        digest = hashlib.sha256(self.salt)
+        digest.update(data)
+        return digest.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + ".o")
+
+    def get(self, key, name=None):
+        path = self.path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+            obj = parse_object(data, name)
+        except (OSError, ValueError, struct.error, UnicodeDecodeError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return obj
+
+    def put(self, key, obj):
+        # Written to a temporary file and renamed, so concurrent builds never read a partial object
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(pack_object(obj))
+            os.replace(tmp, self.path(key))
+        except OSError:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    def trim(self):
+        entries = []
+        total = 0
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith(".o"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total += stat.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        return total
@@ -1,16 +1,30 @@
 # Define funct3 and opcode mappings for all instruction types
-func3 = {"R-Type": {"add": "000", "sub": "000", "slt": "010", "srl": "101", "or": "110", "and": "111"},
-         "I-Type": {"lw": "010", "addi": "000", "jalr": "000"},
-         "S-Type": {"sw": "010"},
-         "B-Type": {"beq": "000", "bne": "001", "blt": "100"},
+func3 = {"R-Type": {"add": "000", "sub": "000", "sll": "001", "slt": "010", "sltu": "011", "xor": "100", "srl": "101",
+                    "sra": "101", "or": "110", "and": "111", "mul": "000", "mulh": "001", "mulhsu": "010",
+                    "mulhu": "011", "div": "100", "divu": "101", "rem": "110", "remu": "111"},
+         "I-Type": {"lb": "000", "lh": "001", "lw": "010", "lbu": "100", "lhu": "101", "addi": "000", "slti": "010",
+                    "sltiu": "011", "xori": "100", "ori": "110", "andi": "111", "slli": "001", "srli": "101",
+                    "srai": "101", "jalr": "000", "fence": "000", "ecall": "000", "ebreak": "000"},
+         "S-Type": {"sb": "000", "sh": "001", "sw": "010"},
+         "B-Type": {"beq": "000", "bne": "001", "blt": "100", "bge": "101", "bltu": "110", "bgeu": "111"},
+         "U-Type": {"lui": "000", "auipc": "000"},
          "J-Type": {"jal": "000"}}
 
-opcode = {"R-Type": {"add": "0110011", "sub": "0110011", "slt": "0110011", "srl": "0110011", "or": "0110011", "and": "0110011"},
-          "I-Type": {"lw": "0000011", "addi": "0010011", "jalr": "1100111"},
-          "S-Type": {"sw": "0100011"},
-          "B-Type": {"beq": "1100011", "bne": "1100011", "blt": "1100011"},
+opcode = {"R-Type": {op: "0110011" for op in func3["R-Type"]},
+          "I-Type": {"lb": "0000011", "lh": "0000011", "lw": "0000011", "lbu": "0000011", "lhu": "0000011",
+                     "addi": "0010011", "slti": "0010011", "sltiu": "0010011", "xori": "0010011", "ori": "0010011",
+                     "andi": "0010011", "slli": "0010011", "srli": "0010011", "srai": "0010011", "jalr": "1100111",
+                     "fence": "0001111", "ecall": "1110011", "ebreak": "1110011"},
+          "S-Type": {"sb": "0100011", "sh": "0100011", "sw": "0100011"},
+          "B-Type": {op: "1100011" for op in func3["B-Type"]},
+          "U-Type": {"lui": "0110111", "auipc": "0010111"},
           "J-Type": {"jal": "1101111"}}
 
+# funct7 where it is not 0000000 (for the immediate shifts, the top of the immediate)
+funct7 = {"sub": "0100000", "sra": "0100000", "srai": "0100000", "mul": "0000001", "mulh": "0000001",
+          "mulhsu": "0000001", "mulhu": "0000001", "div": "0000001", "divu": "0000001", "rem": "0000001",
+          "remu": "0000001"}
+
 registers = {"zero": "00000", "ra": "00001", "sp": "00010", "gp": "00011", "tp": "00100", "t0": "00101", "t1": "00110",
              "t2": "00111", "s0": "01000", "s1": "01001", "a0": "01010", "a1": "01011", "a2": "01100", "a3": "01101",
              "a4": "01110", "a5": "01111", "a6": "10000", "a7": "10001", "s2": "10010", "s3": "10011", "s4": "10100",
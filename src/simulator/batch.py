@@ -0,0 +1,299 @@
+import sys
+
+try:
+    import numpy as np
+except ImportError:  # optional: only the batched engine needs it
+    np = None
+
+from .decoder import decode_program, decode_words
+from .isa import (AUIPC, BRANCH, JAL, JALR, LOAD, LOADS, LUI, OP, OP_IMM, STORE, STORES, is_halt,
+                  mnemonic)
+from .memory import MemoryFault
+from .trace import format_memory
+
+STACK_POINTER = 380  # initial sp, as in the scalar simulator
+MEMORY_SIZE = 1 << 17  # bytes of guest memory per instance: covers the stack and the 0x10000 dump
+
+
+def signed(value):
+    return value.view(np.int32)
+
+
+def wide(value):
+    # Signed 64-bit copy, wide enough for products and quotients of 32-bit operands
+    return value.view(np.int32).astype(np.int64)
+
+
+def low_word(value):
+    return (value & 0xFFFFFFFF).astype(np.uint32)
+
+
+def shift(amount):
+    return amount & np.uint32(31)
+
+
+def div(a, b):
+    # Rounds toward zero; x / 0 is all ones and the -2**31 / -1 overflow wraps, as in isa.div()
+    a, b = wide(a), wide(b)
+    quotient = np.abs(a) // np.where(b == 0, 1, np.abs(b))
+    quotient = np.where((a < 0) != (b < 0), -quotient, quotient)
+    return low_word(np.where(b == 0, -1, quotient))
+
+
+def rem(a, b):
+    a, b = wide(a), wide(b)
+    remainder = np.abs(a) % np.where(b == 0, 1, np.abs(b))
+    remainder = np.where(a < 0, -remainder, remainder)
+    return low_word(np.where(b == 0, a, remainder))
+
+
+def extend(name, value):
+    # Loaded value -> register value
+    if name == "lb":
+        return value.astype(np.uint8).view(np.int8).astype(np.int32).view(np.uint32)
+    if name == "lh":
+        return value.astype(np.uint16).view(np.int16).astype(np.int32).view(np.uint32)
+    return value
+
+
+# The tables of isa.py over uint32 arrays: a, b are rs1 and rs2, imm the signed immediate and
+# uimm its uint32 bits
+REGISTER_OPS = {
+    "add": lambda a, b: a + b,
+    "sub": lambda a, b: a - b,
+    "sll": lambda a, b: a << shift(b),
+    "slt": lambda a, b: (signed(a) < signed(b)).astype(np.uint32),
+    "sltu": lambda a, b: (a < b).astype(np.uint32),
+    "xor": lambda a, b: a ^ b,
+    "srl": lambda a, b: a >> shift(b),
+    "sra": lambda a, b: (signed(a) >> shift(b).astype(np.int32)).view(np.uint32),
+    "or": lambda a, b: a | b,
+    "and": lambda a, b: a & b,
+    "mul": lambda a, b: a * b,
+    "mulh": lambda a, b: low_word((wide(a) * wide(b)) >> 32),
+    "mulhsu": lambda a, b: low_word((wide(a) * b.astype(np.int64)) >> 32),
+    "mulhu": lambda a, b: ((a.astype(np.uint64) * b) >> np.uint64(32)).astype(np.uint32),
+    "div": div,
+    "divu": lambda a, b: np.where(b == 0, np.uint32(0xFFFFFFFF), a // np.where(b == 0, 1, b).astype(np.uint32)),
+    "rem": rem,
+    "remu": lambda a, b: np.where(b == 0, a, a % np.where(b == 0, 1, b).astype(np.uint32)),
+}
+IMMEDIATE_OPS = {
+    "addi": lambda a, imm, uimm: a + uimm,
+    "slti": lambda a, imm, uimm: (signed(a) < imm).astype(np.uint32),
+    "sltiu": lambda a, imm, uimm: (a < uimm).astype(np.uint32),
+    "xori": lambda a, imm, uimm: a ^ uimm,
+    "ori": lambda a, imm, uimm: a | uimm,
+    "andi": lambda a, imm, uimm: a & uimm,
+    "slli": lambda a, imm, uimm: a << np.uint32(imm & 31),
+    "srli": lambda a, imm, uimm: a >> np.uint32(imm & 31),
+    "srai": lambda a, imm, uimm: (signed(a) >> np.int32(imm & 31)).view(np.uint32),
+}
+BRANCH_OPS = {
+    "beq": lambda a, b: a == b,
+    "bne": lambda a, b: a != b,
+    "blt": lambda a, b: signed(a) < signed(b),
+    "bge": lambda a, b: signed(a) >= signed(b),
+    "bltu": lambda a, b: a < b,
+    "bgeu": lambda a, b: a >= b,
+}
+
+
+class BatchSimulator:
+    # Runs one program for `count` instances at once, each with its own registers and memory:
+    #   batch = BatchSimulator(words, 1000)
+    #   batch.reg[:, 10] = inputs            # (count, 32) uint32 register files
+    #   batch.memory[:, 0x10000 >> 2] = ...  # (count, memory_size // 4) uint32 words
+    #   batch.run()
+    #   batch.state(i), batch.dump_memory(i)
+    # Every step groups the running instances by PC and executes each group's instruction as
+    # NumPy operations over the group, so instances in lockstep cost one instruction between
+    # them and divergent branches split them into groups until their PCs meet again.
+    # Semantics follow Simulator.interpret() with Simulator(memory_size=memory_size): an access
+    # outside the instance's memory, or an instruction outside RV32IM, halts only that instance,
+    # with `faults[i]` holding the MemoryFault or `unsupported[i]` set.
+    def __init__(self, program, count, memory_size=MEMORY_SIZE, entry=0):
+        if np is None:
+            raise RuntimeError("BatchSimulator needs NumPy (pip install numpy)")
+        if memory_size <= 0 or memory_size & (memory_size - 1) or memory_size > 1 << 32:
+            raise ValueError(f"Memory size must be a power of two up to 4 GiB, got {memory_size}")
+        if program and isinstance(program[0], str):
+            program = decode_program(program)
+        elif program and not isinstance(program[0], tuple):
+            program = decode_words(program)
+        self.program = program
+        self.count = count
+        self.memory_size = memory_size
+        self.fault_mask = ((memory_size - 1) ^ 0xFFFFFFFF) | 3
+        self.reg = np.zeros((count, 32), dtype=np.uint32)
+        self.reg[:, 2] = STACK_POINTER
+        self.memory = np.zeros((count, memory_size // 4), dtype=np.uint32)
+        self.pc = np.full(count, entry, dtype=np.int64)
+        self.pointer = np.full(count, entry // 4, dtype=np.int64)
+        self.steps = np.zeros(count, dtype=np.int64)
+        self.halted = np.zeros(count, dtype=bool)
+        self.unsupported = np.zeros(count, dtype=bool)
+        self.faults = {}  # instance -> MemoryFault
+        self.rows = np.arange(count)
+
+    def run(self, max_steps=None):
+        # Runs until every instance halts or has retired max_steps more instructions.
+        # Returns the number of instruction groups executed.
+        limit = None if max_steps is None else self.steps + max_steps
+        size = len(self.program)
+        pointer = self.pointer
+        halted = self.halted
+        groups = 0
+        while True:
+            # Instances whose pointer left the program halt without retiring anything, as in interpret()
+            halted |= (pointer < 0) | (pointer >= size)
+            running = ~halted if limit is None else ~halted & (self.steps < limit)
+            if not running.any():
+                return groups
+            if running.all() and (pointer == pointer[0]).all():
+                self.execute(int(pointer[0]), self.rows)  # lockstep
+                groups += 1
+                continue
+            active = self.rows[running]
+            at = pointer[active]
+            order = np.argsort(at, kind="stable")
+            at = at[order]
+            active = active[order]
+            starts = np.flatnonzero(np.diff(at)) + 1
+            for group in np.split(active, starts):
+                self.execute(int(pointer[group[0]]), group)
+                groups += 1
+
+    def execute(self, index, rows):
+        # One instruction for the instances in `rows`, all with pointer == index
+        ins = self.program[index]
+        opcode, rd, rs1, rs2, funct3, funct7, imm = ins
+        reg = self.reg
+        pc = self.pc
+        pointer = self.pointer
+        uimm = np.uint32(imm & 0xFFFFFFFF)
+        name = mnemonic(ins)
+
+        if name is None:
+            self.unsupported[rows] = True
+            self.halted[rows] = True
+            return
+
+        if opcode == BRANCH:
+            if is_halt(ins):
+                # Virtual halt: the instruction retires and the instance stops on it
+                self.steps[rows] += 1
+                self.halted[rows] = True
+                return
+            taken = BRANCH_OPS[name](reg[rows, rs1], reg[rows, rs2])
+            pointer[rows] += np.where(taken, imm // 4, 1)
+            pc[rows] += np.where(taken, imm, 4)
+
+        elif opcode == JAL:
+            if rd:
+                reg[rows, rd] = (pc[rows] + 4).astype(np.uint32)
+            pointer[rows] += imm // 4
+            pc[rows] += imm
+
+        elif opcode == JALR:
+            target = (reg[rows, rs1] + uimm) & np.uint32(0xFFFFFFFE)
+            if rd:
+                reg[rows, rd] = (pc[rows] + 4).astype(np.uint32)
+            pointer[rows] = target // 4
+            pc[rows] = target
+
+        elif opcode == LOAD:
+            _, size, _ = LOADS[funct3]
+            addr = reg[rows, rs1] + uimm
+            rows, addr, slow = self.split_slow(rows, addr, "load", size)
+            value = self.memory[rows, addr >> 2]
+            if size < 4:
+                value = (value >> ((addr & np.uint32(3)) << np.uint32(3))) & np.uint32((1 << 8 * size) - 1)
+            if rd:
+                reg[rows, rd] = extend(name, value)
+            pointer[rows] += 1
+            pc[rows] += 4
+            for row, a in slow:
+                if rd:
+                    reg[row, rd] = extend(name, np.uint32(self.load_bytes(row, a, size)))
+                pointer[row] += 1
+                pc[row] += 4
+                self.steps[row] += 1
+
+        elif opcode == STORE:
+            _, size = STORES[funct3]
+            addr = reg[rows, rs1] + uimm
+            rows, addr, slow = self.split_slow(rows, addr, "store", size)
+            value = reg[rows, rs2]
+            if size < 4:
+                shift = (addr & np.uint32(3)) << np.uint32(3)
+                mask = np.uint32((1 << 8 * size) - 1) << shift
+                word = self.memory[rows, addr >> 2]
+                value = (word & ~mask) | ((value << shift) & mask)
+            self.memory[rows, addr >> 2] = value
+            for row, a in slow:
+                self.store_bytes(row, a, int(reg[row, rs2]), size)
+                pointer[row] += 1
+                pc[row] += 4
+                self.steps[row] += 1
+            pointer[rows] += 1
+            pc[rows] += 4
+
+        else:
+            if rd:
+                a = reg[rows, rs1]
+                if opcode == OP:
+                    reg[rows, rd] = REGISTER_OPS[name](a, reg[rows, rs2])
+                elif opcode == OP_IMM:
+                    reg[rows, rd] = IMMEDIATE_OPS[name](a, imm, uimm)
+                elif opcode == LUI:
+                    reg[rows, rd] = uimm
+                elif opcode == AUIPC:
+                    reg[rows, rd] = ((pc[rows] + imm) & 0xFFFFFFFF).astype(np.uint32)
+            pointer[rows] += 1
+            pc[rows] += 4
+        self.steps[rows] += 1
+
+    def split_slow(self, rows, addr, kind, size=4):
+        # Returns (rows, addresses) of the aligned in-range accesses, which stay vectorized, and
+        # the misaligned ones as (row, address) for byte-wise access. Out-of-range accesses halt
+        # their instance with a MemoryFault.
+        odd = (addr & np.uint32(self.fault_mask & ~3 | (size - 1))) != 0
+        if not odd.any():
+            return rows, addr, []
+        slow = []
+        for row, a in zip(rows[odd].tolist(), addr[odd].tolist()):
+            if a + size > self.memory_size:
+                self.faults[row] = MemoryFault(a, size, kind)
+                self.halted[row] = True
+            else:
+                slow.append((row, a))
+        return rows[~odd], addr[~odd], slow
+
+    def byte_view(self, row):
+        data = self.memory[row]
+        return data.view(np.uint8) if sys.byteorder == "little" else data.byteswap().view(np.uint8)
+
+    def load_bytes(self, row, addr, size=4):
+        data = self.byte_view(row)
+        return sum(int(data[addr + i]) << (8 * i) for i in range(size))
+
+    def store_bytes(self, row, addr, value, size=4):
+        for i in range(size):
+            a = addr + i
+            shift = (a & 3) * 8
+            word = int(self.memory[row, a >> 2])
+            self.memory[row, a >> 2] = (word & ~(0xFF << shift) & 0xFFFFFFFF) | (((value >> (8 * i)) & 0xFF) << shift)
+
+    def state(self, i):
+        # (pc, registers) of one instance, as Simulator.state() gives them
+        return int(self.pc[i]), [int(value) for value in self.reg[i]]
+
+    def words(self, i, start, end):
+        # (addr, value) for every word in [start, end); words past the instance's memory read as 0
+        data = self.memory[i]
+        for index in range(start >> 2, (end + 3) >> 2):
+            yield index << 2, int(data[index]) if index < len(data) else 0
+
+    def dump_memory(self, i, start=0x00010000, end=0x00010080):
+        return format_memory(self.words(i, start, end))
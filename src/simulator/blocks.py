@@ -0,0 +1,234 @@
+from .isa import (AUIPC, BRANCH, BRANCHES, HELPERS, IMMEDIATE_OPS, JAL, JALR, LOAD, LOADS, LUI, OP, OP_IMM,
+                  REGISTER_OPS, STORE, STORES, is_halt, lookup)
+from .memory import PAGE_BITS, WORD_INDEX, ZERO_PAGE, MemoryFault
+
+MAX_BLOCK = 256  # instructions per compiled block
+HOT_THRESHOLD = 8  # executions of a block entry before it is compiled
+
+# Instructions that end a basic block: B-type, JAL, JALR
+TERMINATORS = (BRANCH, JAL, JALR)
+MEMORY_OPS = (LOAD, STORE)
+
+# Aligned words inside guest memory index the page buffers directly; the rest go through Memory
+LOAD_WORD = f"""\
+addr = ({{base}} + {{imm}}) & 0xFFFFFFFF
+if addr & fault_mask:
+    reg[{{rd}}] = memory.load_word(addr)
+else:
+    reg[{{rd}}] = pages.get(addr >> {PAGE_BITS}, ZERO_PAGE)[(addr >> 2) & {WORD_INDEX}]"""
+STORE_WORD = f"""\
+addr = ({{base}} + {{imm}}) & 0xFFFFFFFF
+if addr & fault_mask:
+    memory.store_word(addr, {{value}})
+else:
+    pages[addr >> {PAGE_BITS}][(addr >> 2) & {WORD_INDEX}] = {{value}}"""
+
+
+def read(r):
+    # x0 is always zero between instructions, so reads of it fold to a constant
+    return f"reg[{r}]" if r else "0"
+
+
+def emit(ins, pc):
+    # Python source for one non-terminating instruction, from the expression tables in isa.py;
+    # writes to x0 are dropped
+    opcode, rd, rs1, rs2, funct3, funct7, imm = ins
+    if opcode == STORE:
+        size = STORES[funct3][1]
+        if size == 4:
+            return STORE_WORD.format(base=read(rs1), imm=imm, value=read(rs2)).splitlines()
+        return [f"memory.store(({read(rs1)} + {imm}) & 0xFFFFFFFF, {read(rs2)}, {size})"]
+    if not rd:
+        # Loads still run for their faults
+        return [f"memory.load(({read(rs1)} + {imm}) & 0xFFFFFFFF, {LOADS[funct3][1]})"] if opcode == LOAD else []
+    if opcode == OP:
+        return [f"reg[{rd}] = " + REGISTER_OPS[funct3, funct7][1].format(a=read(rs1), b=read(rs2))]
+    if opcode == OP_IMM:
+        _, expr = IMMEDIATE_OPS[lookup(ins)[1:]]
+        return [f"reg[{rd}] = " + expr.format(a=read(rs1), imm=imm)]
+    if opcode == LOAD:
+        _, size, value = LOADS[funct3]
+        if size == 4:
+            return LOAD_WORD.format(base=read(rs1), imm=imm, rd=rd).splitlines()
+        return [f"v = memory.load(({read(rs1)} + {imm}) & 0xFFFFFFFF, {size})", f"reg[{rd}] = {value}"]
+    if opcode == LUI:
+        return [f"reg[{rd}] = {imm & 0xFFFFFFFF}"]
+    if opcode == AUIPC:
+        return [f"reg[{rd}] = {(pc + imm) & 0xFFFFFFFF}"]
+    return []  # FENCE
+
+
+def emit_exit(ins, pc):
+    # Source for the terminator; every path returns (next pointer, next pc), or (None, pc) on halt
+    opcode, rd, rs1, rs2, funct3, funct7, imm = ins
+    if opcode == BRANCH:
+        if is_halt(ins):
+            return [f"return None, {pc}"]  # Virtual halt
+        cond = BRANCHES[funct3][1].format(a=read(rs1), b=read(rs2))
+        return [f"if {cond}:", f"    return {(pc + imm) // 4}, {pc + imm}",
+                f"return {(pc + 4) // 4}, {pc + 4}"]
+    if opcode == JAL:
+        lines = [f"reg[{rd}] = {pc + 4}"] if rd else []
+        return lines + [f"return {(pc + imm) // 4}, {pc + imm}"]
+    # JALR: the target is read before rd is written
+    lines = [f"target = ({read(rs1)} + {imm}) & 0xFFFFFFFE"]
+    if rd:
+        lines.append(f"reg[{rd}] = {pc + 4}")
+    return lines + ["return target // 4, target"]
+
+
+class BlockEngine:
+    # Runs a Simulator's program as compiled basic blocks, cached by entry pointer.
+    # Blocks end at B-type/JAL/JALR (the control-flow edges of the interpreter), an instruction
+    # outside the tables of isa.py, or MAX_BLOCK instructions. Cold blocks and unsupported
+    # instructions go through the interpreter, which also handles max_steps that end mid-block.
+    # split_at() also ends blocks before given pointers, so run() can stop on arriving there.
+    def __init__(self, sim, threshold=HOT_THRESHOLD):
+        self.sim = sim
+        self.threshold = threshold
+        self.cache = {}
+        self.lengths = {}
+        self.counts = {}
+        self.boundaries = set()
+
+    def split_at(self, pointers):
+        self.boundaries.update(pointers)
+        self.cache.clear()
+        self.lengths.clear()
+
+    def block(self, pointer):
+        program = self.sim.program
+        end = pointer
+        limit = min(len(program), pointer + MAX_BLOCK)
+        boundaries = self.boundaries
+        while end < limit:
+            ins = program[end]
+            if lookup(ins) is None or (end in boundaries and end != pointer):
+                break
+            end += 1
+            if ins[0] in TERMINATORS:
+                break
+        return program[pointer:end]
+
+    def body(self, pointer):
+        # (index of the instruction it belongs to, source line) for each line of a block's function
+        records = self.block(pointer)
+        pc = pointer * 4
+        lines = []
+        if any(ins[0] in MEMORY_OPS for ins in records):
+            lines += [(0, "pages = memory.pages"), (0, "fault_mask = memory.fault_mask")]
+        for index, ins in enumerate(records):
+            lines += [(index, line) for line in (emit_exit if ins[0] in TERMINATORS else emit)(ins, pc)]
+            pc += 4
+        if not records or records[-1][0] not in TERMINATORS:
+            lines.append((len(records), f"return {pc // 4}, {pc}"))
+        return records, lines
+
+    def source(self, pointer):
+        records, lines = self.body(pointer)
+        name = f"block_{pointer * 4:08x}"
+        return name, len(records), f"def {name}(reg, memory):\n" + "".join(f"    {line}\n" for _, line in lines)
+
+    def retired(self, pointer, traceback):
+        # Instructions of the block at `pointer` that completed before the one that raised, found
+        # from the source line the exception left the block's function at (the first is line 2)
+        name = f"block_{pointer * 4:08x}"
+        while traceback.tb_frame.f_code.co_name != name:
+            traceback = traceback.tb_next
+        return self.body(pointer)[1][traceback.tb_lineno - 2][0]
+
+    def compile(self, pointer):
+        name, length, source = self.source(pointer)
+        namespace = dict(HELPERS, ZERO_PAGE=ZERO_PAGE)
+        exec(compile(source, f"<{name}>", "exec"), namespace)
+        self.cache[pointer] = entry = (namespace[name], length)
+        return entry
+
+    def length(self, pointer):
+        length = self.lengths.get(pointer)
+        if length is None:
+            length = self.lengths[pointer] = len(self.block(pointer))
+        return length
+
+    def run(self, max_steps=None, vector=None, stops=None):
+        # With `vector` (a Counter), adds the instructions run from each block entry pointer, i.e.
+        # a basic-block vector. With `stops`, returns on arriving at any of those pointers.
+        sim = self.sim
+        reg = sim.reg
+        memory = sim.memory
+        cache = self.cache
+        counts = self.counts
+        size = len(sim.program)
+        record = sim.trace.record if sim.trace is not None else None
+        remaining = -1 if max_steps is None else max_steps
+        pointer = sim.pointer
+        pc = sim.pc
+        steps = 0
+        compiled = 0
+        while remaining and not sim.halted:
+            if stops is not None and pointer in stops:
+                break
+            entry = cache.get(pointer)
+            if entry is None:
+                if not 0 <= pointer < size:
+                    sim.halted = True
+                    sim.reason = "end of program"
+                    break
+                hits = counts.get(pointer, 0) + 1
+                counts[pointer] = hits
+                if hits >= self.threshold and pc == pointer * 4:
+                    entry = self.compile(pointer)
+            if entry is None or entry[1] == 0 or pc != pointer * 4 or 0 < remaining < entry[1]:
+                # Cold, uncompilable, misaligned or cut short by max_steps: interpret it
+                sim.pointer, sim.pc = pointer, pc
+                sim.steps += compiled  # exact for an ECALL reading the instruction count
+                compiled = 0
+                if remaining == 1:
+                    done = sim.interpret(1)  # single-stepping: no need to find the block's end
+                else:
+                    limit = max(self.length(pointer), 1)
+                    done = sim.interpret(limit if remaining < 0 else min(limit, remaining))
+                if vector is not None:
+                    vector[pointer] += done
+                pointer, pc = sim.pointer, sim.pc
+                steps += done
+                remaining -= done
+                continue
+            fn, length = entry
+            try:
+                pointer, pc = fn(reg, memory)
+            except MemoryFault as e:
+                # Registers and memory hold the state before the faulting instruction: retire the
+                # ones before it, then let the interpreter run it, so the fault leaves the state,
+                # step count, reason and final trace state that interpret() would
+                done = self.retired(pointer, e.__traceback__)
+                if vector is not None:
+                    vector[pointer] += done
+                pointer += done
+                pc += 4 * done
+                steps += done
+                remaining -= done
+                sim.pointer, sim.pc = pointer, pc
+                sim.steps += compiled + done
+                compiled = 0
+                if record is not None and steps:
+                    record(pc, reg)
+                done = sim.interpret(1)
+                pointer, pc = sim.pointer, sim.pc
+                steps += done
+                remaining -= done
+                continue
+            if vector is not None:
+                vector[pointer] += length
+            steps += length
+            compiled += length
+            remaining -= length
+            if pointer is None:
+                pointer = pc // 4
+                sim.halted = True
+                sim.reason = "halted"
+        sim.pointer, sim.pc = pointer, pc
+        sim.steps += compiled  # interpreted steps were counted by interpret()
+        if record is not None and steps:
+            record(pc, reg)
+        return steps
@@ -0,0 +1,229 @@
+import os
+import struct
+import sys
+import zlib
+from array import array
+from collections import namedtuple
+
+from .memory import PAGE_SIZE, Memory
+
+# Architectural state after `steps` retired instructions. `pages` maps page numbers to private
+# copies of the touched page buffers, so a snapshot stays valid however the run continues.
+Snapshot = namedtuple("Snapshot", "pc pointer steps halted reg pages memory_size")
+
+# Snapshot file: magic "RVSN", version, flags (bit 0: halted), pc, pointer, steps, program CRC-32,
+# memory size, page count, the 32 registers, then a zlib stream of (page number, page words)
+# for every page that is not all zeros.
+MAGIC = b"RVSN"
+VERSION = 1
+HEADER = struct.Struct("<4sHHIqQIQI32I")
+PAGE_NUMBER = struct.Struct("<I")
+HALTED = 1
+
+# What one ECALL did to the guest: the registers after it, the (addr, bytes) it wrote to memory,
+# and whether the program carried on or exited with `exit_code`
+Effect = namedtuple("Effect", "reg writes alive exit_code")
+
+
+def capture(sim):
+    pages = {number: array("I", page) for number, page in sim.memory.pages.items()}
+    return Snapshot(sim.pc, sim.pointer, sim.steps, sim.halted, list(sim.reg), pages, sim.memory.size)
+
+
+def restore(sim, snapshot):
+    # Copies the pages again so the snapshot can be restored any number of times
+    memory = Memory(snapshot.memory_size)
+    for number, page in snapshot.pages.items():
+        memory.pages[number] = array("I", page)
+    sim.memory = memory
+    sim.memory_size = snapshot.memory_size
+    sim.reg = list(snapshot.reg)
+    sim.pc = snapshot.pc
+    sim.pointer = snapshot.pointer
+    sim.steps = snapshot.steps
+    sim.halted = snapshot.halted
+    sim.reason = None  # not kept in snapshots
+    sim.exit_code = None
+
+
+def program_digest(program):
+    # CRC-32 of the predecoded records; a snapshot only makes sense for the program it came from
+    fields = array("q", [field for ins in program for field in ins])
+    return zlib.crc32(fields.tobytes())
+
+
+def pack_snapshot(snapshot, digest=0):
+    body = bytearray()
+    count = 0
+    for number in sorted(snapshot.pages):
+        page = snapshot.pages[number]
+        if not any(page):
+            continue
+        if sys.byteorder != "little":
+            page = array("I", page)
+            page.byteswap()
+        body += PAGE_NUMBER.pack(number)
+        body += page.tobytes()
+        count += 1
+    header = HEADER.pack(MAGIC, VERSION, HALTED if snapshot.halted else 0, snapshot.pc, snapshot.pointer,
+                         snapshot.steps, digest, snapshot.memory_size, count, *snapshot.reg)
+    return header + zlib.compress(bytes(body), 1)
+
+
+def parse_snapshot(buffer):
+    # Returns (snapshot, program digest)
+    if len(buffer) < HEADER.size or bytes(buffer[:4]) != MAGIC:
+        raise ValueError("Not a simulator snapshot")
+    magic, version, flags, pc, pointer, steps, digest, memory_size, count, *reg = HEADER.unpack_from(buffer, 0)
+    if version != VERSION:
+        raise ValueError(f"Unsupported snapshot version: {version}")
+    body = zlib.decompress(buffer[HEADER.size:])
+    pages = {}
+    offset = 0
+    for _ in range(count):
+        number, = PAGE_NUMBER.unpack_from(body, offset)
+        offset += PAGE_NUMBER.size
+        page = array("I")
+        page.frombytes(body[offset:offset + PAGE_SIZE])
+        if sys.byteorder != "little":
+            page.byteswap()
+        offset += PAGE_SIZE
+        pages[number] = page
+    return Snapshot(pc, pointer, steps, bool(flags & HALTED), reg, pages, memory_size), digest
+
+
+def write_snapshot(path, snapshot, digest=0):
+    # Written to a temporary name and renamed, so an interrupted write never leaves a torn file
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(pack_snapshot(snapshot, digest))
+    os.replace(tmp, path)
+
+
+def read_snapshot(path, program=None):
+    # With `program`, refuses snapshots taken from a different program
+    with open(path, "rb") as f:
+        snapshot, digest = parse_snapshot(f.read())
+    if program is not None and digest != program_digest(program):
+        raise ValueError(f"{path} was taken from a different program")
+    return snapshot
+
+
+class Journal:
+    # Stands in for a simulator's host (see syscalls.py) while a TimeMachine runs it. The first
+    # time an ECALL runs, the host makes the call and the journal keeps its Effect, keyed by the
+    # instructions retired before it; running that ECALL again (a replay, or a run forward over
+    # steps already taken) applies the Effect without calling the host. Going back in time never
+    # writes output twice or reads input the forward run did not, and the host stays in its
+    # state at the furthest step reached. The journal holds every byte the program has read.
+    def __init__(self, host):
+        self.host = host
+        self.entries = {}  # instret -> Effect
+        self.start = host.calls  # calls made before the journal started
+
+    def call(self, sim, instret):
+        host = self.host
+        effect = self.entries.get(instret)
+        if effect is None:
+            alive = host.call(sim, instret)
+            writes = [(addr, sim.memory.read_bytes(addr, length)) for addr, length in host.written]
+            self.entries[instret] = Effect(list(sim.reg), writes, alive, sim.exit_code)
+            return alive
+        host.calls += 1
+        sim.reg[:] = effect.reg
+        for addr, data in effect.writes:
+            sim.memory.write_bytes(addr, data)
+        if not effect.alive:
+            sim.exit_code = effect.exit_code
+        return effect.alive
+
+    def calls(self, step):
+        # The host's call count once `step` instructions have retired
+        return self.start + sum(1 for instret in self.entries if instret < step)
+
+
+class TimeMachine:
+    # Runs a simulator in segments of `every` instructions and keeps a snapshot at each boundary,
+    # so any earlier step is reached by restoring the nearest snapshot and replaying from it.
+    #   tm = TimeMachine(sim, every=1_000_000)
+    #   tm.run()                  # like sim.run(), taking checkpoints on the way
+    #   tm.goto(50_000_123)       # state after that many retired instructions
+    #   tm.back()                 # one instruction back
+    # Replays run with the trace, profiler, timing model and watcher detached: the interpreter is
+    # deterministic, so they only recompute states the forward run already went through. System
+    # calls go through a Journal, so replays repeat what each one did to the guest without
+    # calling the host again. With `directory`, every checkpoint is also written there as
+    # step-<steps>.snap for a later run to resume from.
+    # `keep` bounds the snapshots held in memory; the oldest go first, except the earliest.
+    def __init__(self, sim, every=1_000_000, directory=None, keep=None):
+        if every <= 0:
+            raise ValueError("Checkpoint interval must be positive")
+        self.sim = sim
+        self.every = every
+        self.directory = directory
+        self.keep = keep
+        self.checkpoints = {}  # steps -> Snapshot
+        self.journal = Journal(sim.host)
+        self.digest = None
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+        self.checkpoint()
+
+    def checkpoint(self):
+        sim = self.sim
+        snapshot = self.checkpoints[sim.steps] = capture(sim)
+        if self.keep is not None and len(self.checkpoints) > self.keep:
+            steps = sorted(self.checkpoints)
+            del self.checkpoints[steps[1]]
+        if self.directory is not None:
+            if self.digest is None:
+                self.digest = program_digest(sim.program)
+            write_snapshot(os.path.join(self.directory, f"step-{sim.steps}.snap"), snapshot, self.digest)
+        return snapshot
+
+    def run(self, max_steps=None):
+        # Returns the number of retired instructions, as Simulator.run() does
+        sim = self.sim
+        every = self.every
+        remaining = max_steps
+        total = 0
+        host = sim.host
+        sim.host = self.journal
+        try:
+            while not sim.halted and remaining != 0:
+                count = every - sim.steps % every
+                if remaining is not None:
+                    count = min(count, remaining)
+                    remaining -= count
+                done = sim.run(count)
+                total += done
+                if sim.steps % every == 0 and sim.steps not in self.checkpoints:
+                    self.checkpoint()
+                if done < count:
+                    break
+        finally:
+            sim.host = host
+        return total
+
+    def goto(self, step):
+        # Leaves the simulator in its state after `step` retired instructions (or at its halt)
+        sim = self.sim
+        if step >= sim.steps:
+            self.run(step - sim.steps)
+            return sim.steps
+        base = max((steps for steps in self.checkpoints if steps <= step), default=None)
+        if base is None:
+            raise ValueError(f"No checkpoint at or before step {step}")
+        restore(sim, self.checkpoints[base])
+        attached = sim.trace, sim.profiler, sim.timing, sim.watcher, sim.host
+        sim.trace = sim.profiler = sim.timing = sim.watcher = None
+        sim.host = self.journal
+        self.journal.host.calls = self.journal.calls(base)
+        try:
+            sim.run(step - base)
+        finally:
+            sim.trace, sim.profiler, sim.timing, sim.watcher, sim.host = attached
+        return sim.steps
+
+    def back(self, count=1):
+        return self.goto(max(self.sim.steps - count, 0))
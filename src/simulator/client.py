@@ -0,0 +1,102 @@
+import argparse
+import base64
+import json
+import os
+import socket
+import sys
+
+if __package__ in (None, ""):
+    # Running as a script: make the packages under src/ importable
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from simulator.deltatrace import guess_compression
+from simulator.limits import LIMITS, LOOP_CHECK, Termination, exit_status, format_termination
+from simulator.protocol import DEFAULT_SOCKET, DONE, JOB, MESSAGE, OUTPUT, pack_json, recv_frame
+
+
+def connect(socket_path=DEFAULT_SOCKET, host="127.0.0.1", port=None):
+    if port is not None:
+        return socket.create_connection((host, port))
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def submit(sock, job, out):
+    # Sends one job (see service.run_job) and writes its output to the binary stream `out`.
+    # Returns (printed messages, status dict).
+    sock.sendall(pack_json(JOB, job))
+    messages = []
+    while True:
+        kind, payload = recv_frame(sock)
+        if kind == OUTPUT:
+            out.write(payload)
+        elif kind == MESSAGE:
+            messages.append(payload.decode())
+        elif kind == DONE:
+            return "".join(messages), json.loads(payload)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate a RISC-V program on a running service.py; "
+                                                 "takes the same input and writes the same output as simulator.py")
+    parser.add_argument("input", help="assembled program, as text lines or a packed image")
+    parser.add_argument("output", help="trace and memory dump")
+    parser.add_argument("--source", action="store_true", help="the input is assembly source to assemble first")
+    parser.add_argument("--trace", default="full", help="which states to write, as for simulator.py (default: full)")
+    parser.add_argument("--every", type=int, default=1000, help="sampling interval for --trace sample")
+    parser.add_argument("--ring", type=int, default=1024, help="states kept for --trace ring")
+    parser.add_argument("--compression", help="framing for --trace delta (default: from the output extension)")
+    parser.add_argument("--dump", action="append", metavar="START:END|START+LENGTH|all",
+                        help="memory to dump after the trace, repeatable, as for simulator.py")
+    parser.add_argument("--memory-size", type=lambda v: int(v, 0), help="guest memory size in bytes")
+    parser.add_argument("--blocks", action="store_true", help="run hot code as compiled basic blocks")
+    parser.add_argument("--max-steps", type=int, help="stop after this many instructions (capped by the service)")
+    parser.add_argument("--timeout", type=float, help="stop after this many seconds (capped by the service)")
+    parser.add_argument("--stdin", metavar="PATH", help="file the guest reads as fd 0; its output is printed")
+    parser.add_argument("--detect-loops", type=int, nargs="?", const=LOOP_CHECK, metavar="N",
+                        help="stop once the state repeats, checked every N instructions, as for simulator.py")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET, help=f"service socket (default: {DEFAULT_SOCKET})")
+    parser.add_argument("--port", type=int, help="connect to this localhost TCP port instead of the socket")
+    parser.add_argument("--host", default="127.0.0.1", help="address for --port (default: 127.0.0.1)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    with open(args.input, "rb") as f:
+        data = f.read()
+    job = {"trace": args.trace, "every": args.every, "ring": args.ring, "blocks": args.blocks,
+           "compression": args.compression or guess_compression(args.output)}
+    if args.source:
+        job["source"] = data.decode()
+    else:
+        job["program"] = base64.b64encode(data).decode()
+    for name in ("dump", "memory_size", "max_steps", "timeout"):
+        if getattr(args, name) is not None:
+            job[name] = getattr(args, name)
+    if args.detect_loops is not None:
+        job["loop_check"] = args.detect_loops
+    if args.stdin:
+        with open(args.stdin, "rb") as f:
+            job["stdin"] = base64.b64encode(f.read()).decode()
+
+    with connect(args.socket, args.host, args.port) as sock, open(args.output, "wb") as out:
+        messages, status = submit(sock, job, out)
+    sys.stdout.write(messages)
+    if status["status"] == "error":
+        sys.exit(1)
+    if status["status"] in LIMITS:
+        termination = Termination(status["reason"], status["steps"], status["pc"], status["detail"])
+        print(f"[STOP] {format_termination(termination)}")  # as simulator.py prints it
+    code = exit_status(status["reason"], status.get("exit_code"))
+    if code:
+        sys.exit(code)  # as simulator.py does
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+from collections import namedtuple
+
+from assembler.encoding import decode_imm
+
+# One predecoded instruction; imm is already sign-extended for the instruction's format
+Decoded = namedtuple("Decoded", "opcode rd rs1 rs2 funct3 funct7 imm")
+
+
+def decode_word(word):
+    opcode = word & 0x7F
+    return Decoded(opcode,
+                   (word >> 7) & 0x1F,
+                   (word >> 15) & 0x1F,
+                   (word >> 20) & 0x1F,
+                   (word >> 12) & 0x7,
+                   (word >> 25) & 0x7F,
+                   decode_imm(opcode, word))
+
+
+def decode_words(words):
+    # Decode every word once; identical words share a single record
+    cache = {}
+    program = []
+    for word in words:
+        record = cache.get(word)
+        if record is None:
+            record = cache[word] = decode_word(word)
+        program.append(record)
+    return program
+
+
+def decode_program(lines):
+    words = []
+    for number, line in enumerate(lines, 1):
+        try:
+            words.append(int(line, 2))
+        except ValueError:
+            raise ValueError(f"Invalid instruction on line {number}: {line.strip()}")
+    return decode_words(words)
@@ -0,0 +1,261 @@
+import gzip
+import lzma
+
+from .memory import Memory
+from .trace import format_memory, format_state
+
+# Binary delta trace: a header followed by one record per retired instruction
+#   zigzag(pc - previous pc), 32-bit mask of changed registers, the changed values,
+#   number of memory words stored, then (address, value) per store
+# all as LEB128 varints. The first record carries every register. The header is the magic, the
+# version byte and the memory dump ranges of the run: their number plus one (0 for every
+# non-zero word), then (start, end) per range. Version 1 traces have no ranges and used the
+# default window. The stream may be wrapped in gzip or xz framing, which the reader detects
+# from the leading bytes.
+MAGIC = b"RVTD"
+VERSION = 2
+DUMP_RANGES = ((0x00010000, 0x00010080),)  # simulator.py's default dump window
+COMPRESSION = {"none": open, "gzip": gzip.open, "lzma": lzma.open}
+FLUSH_SIZE = 1 << 20
+
+
+def put_varint(out, value):
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def zigzag(value):
+    return value << 1 if value >= 0 else ((-value) << 1) - 1
+
+
+def unzigzag(value):
+    return (value >> 1) ^ -(value & 1)
+
+
+def guess_compression(path):
+    if str(path).endswith(".gz"):
+        return "gzip"
+    if str(path).endswith((".xz", ".lzma")):
+        return "lzma"
+    return "none"
+
+
+class DeltaTraceWriter:
+    # Same interface as TraceWriter, but stores only what changed at each step.
+    # The interpreter reports every store through store(); the memory dump text is not kept,
+    # since readers rebuild memory from the recorded stores.
+    per_step = True
+
+    def __init__(self, path, compression=None, dump=DUMP_RANGES):
+        compression = compression or guess_compression(path)
+        if compression not in COMPRESSION:
+            raise ValueError(f"Unknown trace compression: {compression}")
+        self.f = COMPRESSION[compression](path, "wb")
+        self.buffer = bytearray(MAGIC)
+        self.buffer.append(VERSION)
+        if dump is None:
+            put_varint(self.buffer, 0)
+        else:
+            put_varint(self.buffer, len(dump) + 1)
+            for start, end in dump:
+                put_varint(self.buffer, start)
+                put_varint(self.buffer, end)
+        self.prev_pc = 0
+        self.prev = None
+        self.stores = []
+
+    def store(self, addr, value):
+        self.stores.append((addr, value))
+
+    def record(self, pc, reg):
+        out = self.buffer
+        put_varint(out, zigzag(pc - self.prev_pc))
+        prev = self.prev
+        if prev is None:
+            changed = range(32)
+        else:
+            changed = [n for n in range(32) if reg[n] != prev[n]]
+        mask = 0
+        for n in changed:
+            mask |= 1 << n
+        put_varint(out, mask)
+        for n in changed:
+            put_varint(out, reg[n])
+        stores = self.stores
+        put_varint(out, len(stores))
+        for addr, value in stores:
+            put_varint(out, addr)
+            put_varint(out, value)
+        stores.clear()
+        self.prev_pc = pc
+        self.prev = reg[:]
+        if len(out) >= FLUSH_SIZE:
+            self.f.write(out)
+            out.clear()
+
+    def write(self, text):
+        pass
+
+    def flush_pending(self):
+        pass
+
+    def close(self):
+        if self.f.closed:
+            return
+        self.f.write(self.buffer)
+        self.buffer.clear()
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+def open_trace(path):
+    with open(path, "rb") as f:
+        head = f.read(6)
+    if head.startswith(b"\x1f\x8b"):
+        return gzip.open(path, "rb")
+    if head.startswith(b"\xfd7zXZ\x00"):
+        return lzma.open(path, "rb")
+    return open(path, "rb")
+
+
+class TraceReader:
+    # Streams a delta trace, rebuilding the full state as it goes.
+    #   for pc, reg, stores, raw in TraceReader(path).records(): ...
+    # `reg` is the live register list (copy it to keep it) and `raw` the encoded record bytes.
+    def __init__(self, path, chunk_size=FLUSH_SIZE):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.pc = 0
+        self.reg = [0] * 32
+        self.memory = Memory()
+        self.step = -1
+        self.dump = DUMP_RANGES  # from the header, once records() has started
+
+    def chunks(self):
+        with open_trace(self.path) as f:
+            header = f.read(len(MAGIC) + 1)
+            if header[:len(MAGIC)] != MAGIC:
+                raise ValueError(f"{self.path} is not a delta trace")
+            version = header[len(MAGIC)]
+            if version not in (1, VERSION):
+                raise ValueError(f"Unsupported delta trace version: {version}")
+            if version > 1:
+                count = self.header_varint(f)
+                ranges = [(self.header_varint(f), self.header_varint(f)) for _ in range(count - 1)]
+                self.dump = None if count == 0 else tuple(ranges)
+            while True:
+                chunk = f.read(self.chunk_size)
+                if not chunk:
+                    return
+                yield chunk
+
+    def header_varint(self, f):
+        shift = 0
+        value = 0
+        while True:
+            byte = f.read(1)
+            if not byte:
+                raise ValueError(f"{self.path} ends inside its header")
+            value |= (byte[0] & 0x7F) << shift
+            if byte[0] < 0x80:
+                return value
+            shift += 7
+
+    def records(self):
+        reg = self.reg
+        memory = self.memory
+        data = b""
+        pos = 0
+        for chunk in self.chunks():
+            data = data[pos:] + chunk
+            pos = 0
+            end = len(data)
+            while pos < end:
+                start = pos
+                try:
+                    delta, pos = read_varint(data, pos)
+                    mask, pos = read_varint(data, pos)
+                    changed = [n for n in range(32) if mask >> n & 1]
+                    new = []
+                    for _ in changed:
+                        value, pos = read_varint(data, pos)
+                        new.append(value)
+                    count, pos = read_varint(data, pos)
+                    stores = []
+                    for _ in range(count):
+                        addr, pos = read_varint(data, pos)
+                        value, pos = read_varint(data, pos)
+                        stores.append((addr, value))
+                except IndexError:
+                    # Record continues in the next chunk
+                    pos = start
+                    break
+                self.pc += unzigzag(delta)
+                for n, value in zip(changed, new):
+                    reg[n] = value
+                for addr, value in stores:
+                    memory.store_word(addr, value)
+                self.step += 1
+                yield self.pc, reg, stores, data[start:pos]
+        if pos < len(data):
+            raise ValueError(f"{self.path} ends with a truncated record")
+
+    def state_at(self, step):
+        # (pc, registers, memory) after the given 0-based step
+        for _ in self.records():
+            if self.step == step:
+                return self.pc, list(self.reg), self.memory
+        raise IndexError(f"Trace has {self.step + 1} states, no step {step}")
+
+    def to_text(self, out):
+        # Legacy text trace: one state line per step, then the memory dump of the recorded ranges
+        for pc, reg, _, _ in self.records():
+            out.write(format_state(pc, reg))
+        out.write(format_memory(self.memory.dump(self.dump)))
+
+
+def read_varint(data, pos):
+    shift = 0
+    value = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def diff(path_a, path_b):
+    # First divergence between two traces as (step, field, value_a, value_b), or None if identical.
+    # field is "pc", "xN", "stores", or "end" when one trace stops early (its value is None).
+    # Records are deltas from identical states until they differ, so equal raw bytes mean equal
+    # steps and only the first differing record is inspected field by field.
+    a = TraceReader(path_a)
+    b = TraceReader(path_b)
+    records_b = b.records()
+    for pc_a, reg_a, stores_a, raw_a in a.records():
+        rec_b = next(records_b, None)
+        if rec_b is None:
+            return a.step, "end", pc_a, None
+        pc_b, reg_b, stores_b, raw_b = rec_b
+        if raw_a == raw_b:
+            continue
+        if pc_a != pc_b:
+            return a.step, "pc", pc_a, pc_b
+        for n in range(32):
+            if reg_a[n] != reg_b[n]:
+                return a.step, f"x{n}", reg_a[n], reg_b[n]
+        return a.step, "stores", stores_a, stores_b
+    rec_b = next(records_b, None)
+    if rec_b is not None:
+        return b.step, "end", None, rec_b[0]
+    return None
@@ -0,0 +1,287 @@
+from .memory import PAGE_BITS, WORD_INDEX, ZERO_PAGE
+
+# RV32I and RV32M as dispatch tables. Every decoded record maps to one handler through
+# DISPATCH[(opcode, funct3, funct7)], looked up once per distinct record when a program is
+# loaded, so the interpreter pays the same single call for every instruction however many
+# the tables hold. Formats that do not use funct7 (or funct3) are keyed with None there.
+#
+# Handlers take (reg, memory, ins, pc, pointer) and return None to fall through to the next
+# instruction, (next pointer, next pc) for a transfer of control, (None, pc) to halt, or ECALL
+# for the interpreter to make a system call (see syscalls.py).
+# Registers hold unsigned 32-bit values; x0 is cleared by the caller after each instruction.
+# The ALU, branch and load tables are Python expressions, shared with the block compiler.
+
+LOAD = 0b0000011
+MISC_MEM = 0b0001111
+OP_IMM = 0b0010011
+AUIPC = 0b0010111
+STORE = 0b0100011
+OP = 0b0110011
+LUI = 0b0110111
+BRANCH = 0b1100011
+JALR = 0b1100111
+JAL = 0b1101111
+SYSTEM = 0b1110011
+
+# (funct3, funct7) -> (mnemonic, value of rd from a = rs1, b = rs2)
+REGISTER_OPS = {
+    (0b000, 0b0000000): ("add", "({a} + {b}) & 0xFFFFFFFF"),
+    (0b000, 0b0100000): ("sub", "({a} - {b}) & 0xFFFFFFFF"),
+    (0b001, 0b0000000): ("sll", "({a} << ({b} & 31)) & 0xFFFFFFFF"),
+    (0b010, 0b0000000): ("slt", "int(({a} ^ 0x80000000) < ({b} ^ 0x80000000))"),
+    (0b011, 0b0000000): ("sltu", "int({a} < {b})"),
+    (0b100, 0b0000000): ("xor", "{a} ^ {b}"),
+    (0b101, 0b0000000): ("srl", "{a} >> ({b} & 31)"),
+    (0b101, 0b0100000): ("sra", "(({a} ^ 0x80000000) - 0x80000000 >> ({b} & 31)) & 0xFFFFFFFF"),
+    (0b110, 0b0000000): ("or", "{a} | {b}"),
+    (0b111, 0b0000000): ("and", "{a} & {b}"),
+    (0b000, 0b0000001): ("mul", "({a} * {b}) & 0xFFFFFFFF"),
+    (0b001, 0b0000001): ("mulh", "mulh({a}, {b})"),
+    (0b010, 0b0000001): ("mulhsu", "mulhsu({a}, {b})"),
+    (0b011, 0b0000001): ("mulhu", "({a} * {b}) >> 32"),
+    (0b100, 0b0000001): ("div", "div({a}, {b})"),
+    (0b101, 0b0000001): ("divu", "divu({a}, {b})"),
+    (0b110, 0b0000001): ("rem", "rem({a}, {b})"),
+    (0b111, 0b0000001): ("remu", "remu({a}, {b})"),
+}
+
+# (funct3, funct7) -> (mnemonic, value of rd from a = rs1 and the sign-extended imm); only the
+# shifts use funct7, which is the top of their immediate
+IMMEDIATE_OPS = {
+    (0b000, None): ("addi", "({a} + {imm}) & 0xFFFFFFFF"),
+    (0b010, None): ("slti", "int(({a} ^ 0x80000000) - 0x80000000 < {imm})"),
+    (0b011, None): ("sltiu", "int({a} < ({imm} & 0xFFFFFFFF))"),
+    (0b100, None): ("xori", "({a} ^ {imm}) & 0xFFFFFFFF"),
+    (0b110, None): ("ori", "({a} | {imm}) & 0xFFFFFFFF"),
+    (0b111, None): ("andi", "{a} & {imm}"),
+    (0b001, 0b0000000): ("slli", "({a} << ({imm} & 31)) & 0xFFFFFFFF"),
+    (0b101, 0b0000000): ("srli", "{a} >> ({imm} & 31)"),
+    (0b101, 0b0100000): ("srai", "(({a} ^ 0x80000000) - 0x80000000 >> ({imm} & 31)) & 0xFFFFFFFF"),
+}
+
+# funct3 -> (mnemonic, condition on a = rs1, b = rs2)
+BRANCHES = {
+    0b000: ("beq", "{a} == {b}"),
+    0b001: ("bne", "{a} != {b}"),
+    0b100: ("blt", "({a} ^ 0x80000000) < ({b} ^ 0x80000000)"),
+    0b101: ("bge", "({a} ^ 0x80000000) >= ({b} ^ 0x80000000)"),
+    0b110: ("bltu", "{a} < {b}"),
+    0b111: ("bgeu", "{a} >= {b}"),
+}
+# Branches taken when both operands are x0: with a zero offset they are the virtual halt
+ALWAYS_TAKEN = (0b000, 0b101, 0b111)
+
+# funct3 -> (mnemonic, bytes, value of rd from the loaded value v)
+LOADS = {
+    0b000: ("lb", 1, "((v ^ 0x80) - 0x80) & 0xFFFFFFFF"),
+    0b001: ("lh", 2, "((v ^ 0x8000) - 0x8000) & 0xFFFFFFFF"),
+    0b010: ("lw", 4, "v"),
+    0b100: ("lbu", 1, "v"),
+    0b101: ("lhu", 2, "v"),
+}
+
+# funct3 -> (mnemonic, bytes)
+STORES = {
+    0b000: ("sb", 1),
+    0b001: ("sh", 2),
+    0b010: ("sw", 4),
+}
+
+
+def signed(value):
+    return value - ((value & 0x80000000) << 1)
+
+
+def mulh(a, b):
+    return ((signed(a) * signed(b)) >> 32) & 0xFFFFFFFF
+
+
+def mulhsu(a, b):
+    return ((signed(a) * b) >> 32) & 0xFFFFFFFF
+
+
+def div(a, b):
+    # Rounds toward zero; x / 0 is all ones and the -2**31 / -1 overflow wraps to -2**31
+    if not b:
+        return 0xFFFFFFFF
+    a = signed(a)
+    b = signed(b)
+    quotient = abs(a) // abs(b)
+    return (-quotient if (a < 0) != (b < 0) else quotient) & 0xFFFFFFFF
+
+
+def divu(a, b):
+    return a // b if b else 0xFFFFFFFF
+
+
+def rem(a, b):
+    # Takes the sign of the dividend; x % 0 is x
+    if not b:
+        return a
+    a = signed(a)
+    remainder = abs(a) % abs(signed(b))
+    return (-remainder if a < 0 else remainder) & 0xFFFFFFFF
+
+
+def remu(a, b):
+    return a % b if b else a
+
+
+# Names the expressions above may call
+HELPERS = {"mulh": mulh, "mulhsu": mulhsu, "div": div, "divu": divu, "rem": rem, "remu": remu}
+
+
+class IllegalInstruction(Exception):
+    def __init__(self, ins):
+        opcode, rd, rs1, rs2, funct3, funct7, imm = ins
+        if opcode in OPCODES:
+            message = f"Unsupported instruction: opcode {opcode:07b}, funct3 {funct3:03b}, funct7 {funct7:07b}"
+        else:
+            message = f"Unsupported opcode: {opcode:07b}"
+        super().__init__(message)
+        self.ins = ins
+
+
+def compile_handler(name, body):
+    source = (f"def op_{name}(reg, memory, ins, pc, pointer):\n"
+              f"    opcode, rd, rs1, rs2, funct3, funct7, imm = ins\n"
+              + "".join(f"    {line}\n" for line in body))
+    namespace = dict(HELPERS, ZERO_PAGE=ZERO_PAGE)
+    exec(compile(source, f"<{name}>", "exec"), namespace)
+    return namespace[f"op_{name}"]
+
+
+def load_handler(name, size, value):
+    if size == 4:
+        # Aligned words inside guest memory index the page buffers directly, as in Memory.load_word()
+        return compile_handler(name, [
+            "addr = (reg[rs1] + imm) & 0xFFFFFFFF",
+            "if addr & memory.fault_mask:",
+            "    reg[rd] = memory.load(addr, 4)",
+            "else:",
+            f"    reg[rd] = memory.pages.get(addr >> {PAGE_BITS}, ZERO_PAGE)[(addr >> 2) & {WORD_INDEX}]",
+        ])
+    return compile_handler(name, [
+        f"v = memory.load((reg[rs1] + imm) & 0xFFFFFFFF, {size})",
+        f"reg[rd] = {value}",
+    ])
+
+
+def store_handler(name, size):
+    if size == 4:
+        return compile_handler(name, [
+            "addr = (reg[rs1] + imm) & 0xFFFFFFFF",
+            "if addr & memory.fault_mask:",
+            "    memory.store(addr, reg[rs2], 4)",
+            "else:",
+            f"    memory.pages[addr >> {PAGE_BITS}][(addr >> 2) & {WORD_INDEX}] = reg[rs2]",
+        ])
+    return compile_handler(name, [f"memory.store((reg[rs1] + imm) & 0xFFFFFFFF, reg[rs2], {size})"])
+
+
+def jal(reg, memory, ins, pc, pointer):
+    reg[ins[1]] = pc + 4
+    imm = ins[6]
+    return pointer + imm // 4, pc + imm
+
+
+def jalr(reg, memory, ins, pc, pointer):
+    # The target is read before rd is written
+    target = (reg[ins[2]] + ins[6]) & 0xFFFFFFFE
+    reg[ins[1]] = pc + 4
+    return target // 4, target
+
+
+def lui(reg, memory, ins, pc, pointer):
+    reg[ins[1]] = ins[6] & 0xFFFFFFFF
+
+
+def auipc(reg, memory, ins, pc, pointer):
+    reg[ins[1]] = (pc + ins[6]) & 0xFFFFFFFF
+
+
+def fence(reg, memory, ins, pc, pointer):
+    pass  # a single hart sees its own memory accesses in order
+
+
+def halt(reg, memory, ins, pc, pointer):
+    return None, pc
+
+
+ECALL = (None, None)
+
+
+def ecall(reg, memory, ins, pc, pointer):
+    return ECALL
+
+
+def unsupported(reg, memory, ins, pc, pointer):
+    raise IllegalInstruction(ins)
+
+
+DISPATCH = {(JAL, None, None): jal, (JALR, 0b000, None): jalr, (LUI, None, None): lui,
+            (AUIPC, None, None): auipc, (MISC_MEM, 0b000, None): fence}
+MNEMONICS = {(JAL, None, None): "jal", (JALR, 0b000, None): "jalr", (LUI, None, None): "lui",
+             (AUIPC, None, None): "auipc", (MISC_MEM, 0b000, None): "fence"}
+for (funct3, funct7), (name, expr) in REGISTER_OPS.items():
+    MNEMONICS[OP, funct3, funct7] = name
+    DISPATCH[OP, funct3, funct7] = compile_handler(name, [f"reg[rd] = {expr.format(a='reg[rs1]', b='reg[rs2]')}"])
+for (funct3, funct7), (name, expr) in IMMEDIATE_OPS.items():
+    MNEMONICS[OP_IMM, funct3, funct7] = name
+    DISPATCH[OP_IMM, funct3, funct7] = compile_handler(name, [f"reg[rd] = {expr.format(a='reg[rs1]', imm='imm')}"])
+for funct3, (name, cond) in BRANCHES.items():
+    MNEMONICS[BRANCH, funct3, None] = name
+    DISPATCH[BRANCH, funct3, None] = compile_handler(name, [f"if {cond.format(a='reg[rs1]', b='reg[rs2]')}:",
+                                                             "    return pointer + imm // 4, pc + imm"])
+for funct3, (name, size, value) in LOADS.items():
+    MNEMONICS[LOAD, funct3, None] = name
+    DISPATCH[LOAD, funct3, None] = load_handler(name, size, value)
+for funct3, (name, size) in STORES.items():
+    MNEMONICS[STORE, funct3, None] = name
+    DISPATCH[STORE, funct3, None] = store_handler(name, size)
+OPCODES = {opcode for opcode, funct3, funct7 in DISPATCH}
+
+
+def lookup(ins):
+    # Table key of a decoded record, or None if it is not an RV32IM instruction
+    opcode, funct3, funct7 = ins[0], ins[4], ins[5]
+    for key in ((opcode, funct3, funct7), (opcode, funct3, None), (opcode, None, None)):
+        if key in DISPATCH:
+            return key
+    return None
+
+
+def is_halt(ins):
+    # beq zero,zero,0 and the other branches to themselves that are always taken
+    return ins[0] == BRANCH and ins[4] in ALWAYS_TAKEN and ins[6] == 0 and ins[2] == 0 and ins[3] == 0
+
+
+def is_ecall(ins):
+    # Outside DISPATCH: the block compiler and the batch simulator leave it to the interpreter
+    return ins[0] == SYSTEM and ins[4] == 0 and ins[6] == 0 and ins[1] == 0 and ins[2] == 0
+
+
+def handler_for(ins):
+    if is_halt(ins):
+        return halt
+    if is_ecall(ins):
+        return ecall
+    key = lookup(ins)
+    return unsupported if key is None else DISPATCH[key]
+
+
+def mnemonic(ins):
+    key = lookup(ins)
+    return None if key is None else MNEMONICS[key]
+
+
+def decode_handlers(program):
+    # Handler per record; records shared by decode_words() share the lookup too
+    cache = {}
+    handlers = []
+    for ins in program:
+        handler = cache.get(ins)
+        if handler is None:
+            handler = cache[ins] = handler_for(ins)
+        handlers.append(handler)
+    return handlers
@@ -0,0 +1,147 @@
+import hashlib
+import time
+from collections import namedtuple
+
+from .memory import MemoryFault
+
+SLICE = 10_000  # instructions between checks of the deadline
+LOOP_CHECK = 10_000  # default instructions between state checks of the loop detector
+BACK_EDGE_SEARCH = 1_000  # most instructions stepped looking for a back-edge to check at
+MAX_STATES = 100_000  # states remembered by the loop detector before it starts over
+
+# Why a run ended. The simulator itself ends on "halted" (the virtual halt), "exit" (the exit
+# system call), "end of program" (control left the program), "illegal instruction" or "fault";
+# Limits adds "step limit", "time limit" and "loop", and "paused" or "stopped" when the run
+# ended early without any of them (at the caller's max_steps, or a watchpoint).
+HALTED = ("halted", "exit", "end of program", "illegal instruction")
+LIMITS = ("step limit", "time limit", "loop")
+Termination = namedtuple("Termination", "reason steps pc detail")
+
+# Exit statuses of simulator.py and client.py (see exit_status()): LIMIT_EXIT as timeout(1) uses
+# it, and FAULT_EXIT for a program that faulted or hit an illegal instruction
+LIMIT_EXIT = 124
+FAULT_EXIT = 125
+FAULTS = ("fault", "illegal instruction")
+
+
+def memory_digest(memory):
+    # Digest of every allocated page; pages are allocated on the first store, so this covers
+    # all memory the program has written
+    digest = hashlib.blake2b(digest_size=16)
+    pages = memory.pages
+    for number in sorted(pages):
+        digest.update(number.to_bytes(4, "little"))
+        digest.update(pages[number])
+    return digest.digest()
+
+
+def exit_status(reason, exit_code):
+    # Process exit status for a run that ended with `reason`: LIMIT_EXIT or FAULT_EXIT when the
+    # simulator stopped the program, the guest's status (its low 8 bits, as a shell sees it) when
+    # it called exit, else 0. A guest status equal to LIMIT_EXIT or FAULT_EXIT is reported as 1,
+    # so those two always mean the simulator stopped it; the exact one is in the termination detail.
+    if reason in LIMITS:
+        return LIMIT_EXIT
+    if reason in FAULTS:
+        return FAULT_EXIT
+    status = (exit_code or 0) & 0xFF if reason == "exit" else 0
+    return 1 if status in (LIMIT_EXIT, FAULT_EXIT) else status
+
+
+def format_termination(termination):
+    text = f"{termination.reason} after {termination.steps} instructions at pc 0x{termination.pc:08X}"
+    return f"{text}: {termination.detail}" if termination.detail else text
+
+
+class Limits:
+    # Runs a simulator, or a runner wrapping one (TimeMachine, Sampler), under an instruction
+    # budget and a wall-clock deadline, both counted from construction. With `loop_check`, it
+    # also stops a program that provably never ends: every `loop_check` instructions it steps to
+    # the next back-edge (a jump to the same or a lower PC) and keeps (PC, registers, system calls
+    # made) there and, once those repeat, a digest of the written memory. Seeing the same state
+    # twice means the program, which gets no input between system calls, is going round the same
+    # loop forever; checking at back-edges lines the checks up with the loop's iterations, so
+    # that takes a few intervals.
+    # run() returns the number of retired instructions and leaves the reason in `termination`.
+    #   limits = Limits(sim, max_steps=100_000_000, timeout=60, loop_check=10_000)
+    #   limits.run()
+    #   limits.termination   # Termination("loop", 30000, 0x40, "state at step 20000 repeated")
+    # Without a deadline or loop detection the runner is called once, for the whole budget.
+    def __init__(self, sim, max_steps=None, timeout=None, loop_check=None, runner=None):
+        if (max_steps is not None and max_steps < 0) or (loop_check is not None and loop_check <= 0):
+            raise ValueError("Step budget and loop check interval must be positive")
+        self.sim = sim
+        self.runner = runner or sim
+        self.end = None if max_steps is None else sim.steps + max_steps
+        self.deadline = None if timeout is None else time.perf_counter() + timeout
+        self.loop_check = loop_check
+        self.search = None  # [step, at a back-edge] while stepping to the next back-edge
+        self.states = {}  # (pc, calls, registers) -> {memory digest, or None before it repeats: step}
+        self.termination = None
+
+    def run(self, max_steps=None):
+        sim = self.sim
+        start = sim.steps
+        stop = None if max_steps is None else start + max_steps
+        interval = self.loop_check or (SLICE if self.deadline is not None else None)
+        detail = ""
+        try:
+            while True:
+                if sim.halted:
+                    reason = sim.reason or "halted"
+                    if reason == "exit":
+                        detail = f"status {sim.exit_code}"
+                    break
+                if self.end is not None and sim.steps >= self.end:
+                    reason = "step limit"
+                    break
+                if stop is not None and sim.steps >= stop:
+                    reason = "paused"
+                    break
+                if self.deadline is not None and time.perf_counter() >= self.deadline:
+                    reason = "time limit"
+                    break
+                if self.search is not None and self.search[1]:
+                    self.search = None
+                    repeated = self.check_loop()
+                    if repeated is not None:
+                        reason = "loop"
+                        detail = f"state at step {repeated} repeated"
+                        break
+                count = 1 if self.search is not None else interval
+                count = min((n for n in (count, None if self.end is None else self.end - sim.steps,
+                                         None if stop is None else stop - sim.steps) if n is not None), default=None)
+                pc = sim.pc
+                before = sim.steps
+                self.runner.run(count)
+                if not sim.halted and (count is None or sim.steps - before < count):
+                    reason = "stopped"
+                    break
+                if self.search is not None:
+                    # At a back-edge, or given up looking for one
+                    self.search[1] = sim.pc <= pc or sim.steps - self.search[0] >= BACK_EDGE_SEARCH
+                elif self.loop_check is not None:
+                    self.search = [sim.steps, False]
+        except MemoryFault as e:
+            self.termination = Termination("fault", sim.steps, sim.pc, str(e))
+            raise
+        self.termination = Termination(reason, sim.steps, sim.pc, detail)
+        return sim.steps - start
+
+    def check_loop(self):
+        # The step at which the current state was seen before, or None. Memory is only hashed
+        # for (PC, system calls, registers) seen before, so a program that is getting somewhere
+        # pays for one tuple per check.
+        sim = self.sim
+        key = (sim.pc, sim.host.calls, *sim.reg)
+        seen = self.states.get(key)
+        if seen is None:
+            if len(self.states) >= MAX_STATES:
+                self.states.clear()
+            self.states[key] = {None: sim.steps}
+            return None
+        digest = memory_digest(sim.memory)
+        if digest in seen:
+            return seen[digest]
+        seen[digest] = sim.steps
+        return None
@@ -0,0 +1,36 @@
+import mmap
+
+from assembler.image import has_header, parse_image
+from .decoder import decode_program, decode_words
+
+TEXT_BYTES = frozenset(b"01\r\n\t ")
+
+
+def is_text(buffer):
+    # Legacy programs are lines of '0'/'1' characters
+    return all(b in TEXT_BYTES for b in bytes(buffer[:64]))
+
+
+def load_buffer(buffer):
+    # Returns (program, entry, symbols), choosing the text or packed image format from the contents
+    if not len(buffer):
+        return [], 0, {}
+    if not has_header(buffer) and is_text(buffer):
+        return decode_program(bytes(buffer).decode().strip().splitlines()), 0, {}
+    words, entry, symbols = parse_image(buffer)
+    try:
+        program = decode_words(words)
+    finally:
+        if isinstance(words, memoryview):
+            words.release()
+    return program, entry, symbols
+
+
+def load_program(path):
+    with open(path, "rb") as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # empty file
+            return [], 0, {}
+    with mm:
+        return load_buffer(mm)
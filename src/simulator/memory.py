@@ -0,0 +1,205 @@
+import sys
+from array import array
+
+PAGE_BITS = 12
+PAGE_SIZE = 1 << PAGE_BITS  # bytes per page
+PAGE_WORDS = PAGE_SIZE // 4
+WORD_INDEX = PAGE_WORDS - 1  # (addr >> 2) & WORD_INDEX is the word within its page
+ADDRESS_SPACE = 1 << 32
+
+ZERO_PAGE = array("I", bytes(PAGE_SIZE))  # stands in for untouched pages on reads; never written
+LITTLE_ENDIAN = sys.byteorder == "little"  # page buffers are in guest byte order
+
+
+class MemoryFault(Exception):
+    def __init__(self, addr, size, kind):
+        super().__init__(f"{kind} of {size} byte(s) at 0x{addr:08X} is outside guest memory")
+        self.addr = addr
+        self.size = size
+        self.kind = kind
+
+
+class PageTable(dict):
+    # Page number -> array('I') of PAGE_WORDS words, allocated on first store
+    def __missing__(self, number):
+        page = self[number] = array("I", ZERO_PAGE)
+        return page
+
+
+class Memory:
+    # Little-endian guest memory made of fixed-size word pages allocated lazily.
+    # Aligned word access is two subscripts (pages, then word), which the interpreter and the
+    # block compiler inline for any address with no bit of `fault_mask` set; everything else
+    # (bytes, halfwords, misaligned words, faults) goes through load()/store().
+    # `size` must be a power of two; accesses at or beyond it raise MemoryFault.
+    def __init__(self, size=ADDRESS_SPACE):
+        if size <= 0 or size & (size - 1) or size > ADDRESS_SPACE:
+            raise ValueError(f"Memory size must be a power of two up to 4 GiB, got {size}")
+        self.size = size
+        self.fault_mask = ((size - 1) ^ 0xFFFFFFFF) | 3
+        self.pages = PageTable()
+
+    def clear(self):
+        self.pages.clear()
+
+    def check(self, addr, size, kind):
+        if addr < 0 or addr + size > self.size:
+            raise MemoryFault(addr, size, kind)
+
+    def load_word(self, addr):
+        if addr & self.fault_mask:
+            return self.load(addr, 4)
+        return self.pages.get(addr >> PAGE_BITS, ZERO_PAGE)[(addr >> 2) & WORD_INDEX]
+
+    def store_word(self, addr, value):
+        if addr & self.fault_mask:
+            return self.store(addr, value, 4)
+        self.pages[addr >> PAGE_BITS][(addr >> 2) & WORD_INDEX] = value & 0xFFFFFFFF
+
+    def load(self, addr, size):
+        # Unsigned little-endian value of `size` bytes
+        self.check(addr, size, "load")
+        pages = self.pages
+        if not addr & 3 and size == 4:
+            return pages.get(addr >> PAGE_BITS, ZERO_PAGE)[(addr >> 2) & WORD_INDEX]
+        value = 0
+        for i in range(size):
+            a = addr + i
+            page = pages.get(a >> PAGE_BITS)
+            if page is not None:
+                value |= ((page[(a >> 2) & WORD_INDEX] >> ((a & 3) * 8)) & 0xFF) << (8 * i)
+        return value
+
+    def store(self, addr, value, size):
+        self.check(addr, size, "store")
+        pages = self.pages
+        if not addr & 3 and size == 4:
+            pages[addr >> PAGE_BITS][(addr >> 2) & WORD_INDEX] = value & 0xFFFFFFFF
+            return
+        for i in range(size):
+            a = addr + i
+            page = pages[a >> PAGE_BITS]
+            index = (a >> 2) & WORD_INDEX
+            shift = (a & 3) * 8
+            page[index] = (page[index] & ~(0xFF << shift) & 0xFFFFFFFF) | (((value >> (8 * i)) & 0xFF) << shift)
+
+    def load_byte(self, addr):
+        return self.load(addr, 1)
+
+    def load_half(self, addr):
+        return self.load(addr, 2)
+
+    def store_byte(self, addr, value):
+        self.store(addr, value, 1)
+
+    def store_half(self, addr, value):
+        self.store(addr, value, 2)
+
+    def read_into(self, addr, length, sink):
+        # Passes the bytes of [addr, addr + length) to sink() a page at a time, as memoryviews of
+        # the page buffers themselves (untouched pages read as zeros), for bulk transfers that
+        # never go word by word
+        self.check(addr, length, "load")
+        end = addr + length
+        while addr < end:
+            offset = addr & (PAGE_SIZE - 1)
+            count = min(end - addr, PAGE_SIZE - offset)
+            page = self.pages.get(addr >> PAGE_BITS, ZERO_PAGE)
+            if not LITTLE_ENDIAN:
+                page = array("I", page)
+                page.byteswap()
+            sink(memoryview(page).cast("B")[offset:offset + count])
+            addr += count
+
+    def write_from(self, addr, length, source):
+        # Fills [addr, addr + length) a page at a time: source(view) writes into a memoryview of
+        # the page buffer and returns how many bytes it wrote. Stops after the first short count
+        # and returns the bytes written in all.
+        self.check(addr, length, "store")
+        done = 0
+        while done < length:
+            a = addr + done
+            offset = a & (PAGE_SIZE - 1)
+            count = min(length - done, PAGE_SIZE - offset)
+            page = self.pages[a >> PAGE_BITS]
+            if LITTLE_ENDIAN:
+                written = source(memoryview(page).cast("B")[offset:offset + count]) or 0
+            else:
+                swapped = array("I", page)
+                swapped.byteswap()
+                written = source(memoryview(swapped).cast("B")[offset:offset + count]) or 0
+                swapped.byteswap()
+                page[:] = swapped
+            done += written
+            if written < count:
+                break
+        return done
+
+    def read_bytes(self, addr, length):
+        data = bytearray()
+        self.read_into(addr, length, data.extend)
+        return bytes(data)
+
+    def write_bytes(self, addr, data):
+        data = memoryview(data)
+
+        def copy(view):
+            nonlocal data
+            count = len(view)
+            view[:] = data[:count]
+            data = data[count:]
+            return count
+
+        self.write_from(addr, len(data), copy)
+
+    def words(self, start, end):
+        # (addr, value) for every word in [start, end), read straight from the page buffers
+        addr = start & ~3
+        while addr < end:
+            number = addr >> PAGE_BITS
+            stop = min(end, (number + 1) << PAGE_BITS)
+            page = self.pages.get(number, ZERO_PAGE)
+            first = (addr >> 2) & WORD_INDEX
+            for value in page[first:first + ((stop - addr + 3) >> 2)]:
+                yield addr, value
+                addr += 4
+
+    def items(self):
+        # Non-zero words of every touched page, in address order
+        for number in sorted(self.pages):
+            base = number << PAGE_BITS
+            for index, value in enumerate(self.pages[number]):
+                if value:
+                    yield base + 4 * index, value
+
+    def dump(self, ranges=None):
+        # (addr, value) for the words of the [start, end) ranges, sorted and with overlaps merged;
+        # with None, every non-zero word of touched memory (see items())
+        if ranges is None:
+            yield from self.items()
+            return
+        merged = []
+        for start, end in sorted((start & ~3, end) for start, end in ranges):
+            if merged and start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        for start, end in merged:
+            yield from self.words(start, end)
+
+
+def parse_range(spec):
+    # "START:END" or "START+LENGTH" (bytes, any int() base), or "all" for None
+    if spec == "all":
+        return None
+    try:
+        if "+" in spec:
+            start, length = (int(part, 0) for part in spec.split("+"))
+            end = start + length
+        else:
+            start, end = (int(part, 0) for part in spec.split(":"))
+    except ValueError:
+        raise ValueError(f"Range must be START:END, START+LENGTH or all, got {spec!r}")
+    if not 0 <= start < end <= ADDRESS_SPACE:
+        raise ValueError(f"Empty or out-of-range range: {spec!r}")
+    return start, end
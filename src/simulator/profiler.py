@@ -0,0 +1,115 @@
+import time
+from collections import Counter
+
+# Opcode classes, one per major opcode of RV32IM (see isa.py)
+OPCODE_CLASS = {
+    0b0110011: "R",
+    0b0010011: "I",
+    0b0000011: "LOAD",
+    0b0100011: "STORE",
+    0b1100011: "B",
+    0b1101111: "J",
+    0b1100111: "JALR",
+    0b0110111: "U",
+    0b0010111: "U",
+    0b0001111: "FENCE",
+}
+MEMORY_OPS = (0b0000011, 0b0100011)
+
+
+class Profiler:
+    # Opt-in instrumentation. A Simulator with a profiler attached runs through
+    # Simulator.instrumented(), a separate loop that steps the interpreter one instruction at a
+    # time and passes each retired record to retire(); without one, the normal loops run untouched.
+    #   sim.profiler = Profiler(interval=100_000)
+    #   sim.run()
+    #   print(sim.profiler.report(source_map=assembler.source_map, symbols=assembler.labels))
+    def __init__(self, interval=100_000):
+        self.interval = interval
+        self.classes = Counter()
+        self.pcs = Counter()
+        self.taken = Counter()
+        self.not_taken = Counter()
+        self.loads = Counter()  # word address -> loads
+        self.stores = Counter()
+        self.intervals = []  # host seconds per `interval` instructions
+        self.retired = 0
+        self.countdown = interval  # instructions left in the current wall-time sample
+        self.wall = 0.0
+        self.started = self.mark = 0.0
+
+    def begin(self):
+        self.started = self.mark = time.perf_counter()
+
+    def retire(self, sim, pc, ins, addr):
+        # One retired record at `pc`; `addr` is the address a load or store accessed
+        opcode = ins.opcode
+        self.pcs[pc] += 1
+        self.classes[OPCODE_CLASS.get(opcode, "other")] += 1
+        if opcode == 0b1100011:
+            if sim.pc != pc + 4 or sim.halted:
+                self.taken[pc] += 1
+            else:
+                self.not_taken[pc] += 1
+        elif opcode == 0b0000011:
+            self.loads[addr & ~3] += 1
+        elif opcode == 0b0100011:
+            self.stores[addr & ~3] += 1
+        self.retired += 1
+        self.countdown -= 1
+        if not self.countdown:
+            now = time.perf_counter()
+            self.intervals.append(now - self.mark)
+            self.mark = now
+            self.countdown = self.interval
+
+    def end(self):
+        self.wall += time.perf_counter() - self.started
+
+    def label_for(self, pc, symbols):
+        # Nearest preceding label as "name+offset"
+        best = None
+        for name, addr in symbols.items():
+            if addr <= pc and (best is None or addr > best[1]):
+                best = (name, addr)
+        if best is None:
+            return ""
+        return best[0] if best[1] == pc else f"{best[0]}+{pc - best[1]}"
+
+    def report(self, top=20, source_map=None, symbols=None):
+        source_map = source_map or {}
+        symbols = symbols or {}
+        retired = self.retired or 1
+        lines = [f"retired {self.retired} instructions in {self.wall:.3f} s (instrumented)", "",
+                 "by opcode class:"]
+        for name, count in self.classes.most_common():
+            lines.append(f"  {name:6} {count:12} {100 * count / retired:6.1f}%")
+
+        lines += ["", f"hottest PCs (top {top}):",
+                  f"  {'count':>12} {'%':>6}  {'pc':10}  {'taken':>10} {'not taken':>10}  source"]
+        for pc, count in self.pcs.most_common(top):
+            branch = ""
+            if pc in self.taken or pc in self.not_taken:
+                branch = f"{self.taken[pc]:10} {self.not_taken[pc]:10}"
+            number, text = source_map.get(pc, (None, ""))
+            where = f"{number}: {text}" if number is not None else self.label_for(pc, symbols)
+            lines.append(f"  {count:12} {100 * count / retired:5.1f}%  0x{pc:08X}  {branch:21}  {where}")
+
+        taken = sum(self.taken.values())
+        not_taken = sum(self.not_taken.values())
+        lines += ["", f"branches: {taken} taken, {not_taken} not taken"]
+
+        pages = {addr >> 12 for addr in self.loads} | {addr >> 12 for addr in self.stores}
+        lines += [f"memory: {len(self.loads)} distinct words loaded ({sum(self.loads.values())} loads), "
+                  f"{len(self.stores)} stored ({sum(self.stores.values())} stores), {len(pages)} pages"]
+        if self.loads or self.stores:
+            low = min(list(self.loads) + list(self.stores))
+            high = max(list(self.loads) + list(self.stores))
+            lines.append(f"  address range 0x{low:08X}-0x{high + 3:08X}")
+
+        if self.intervals:
+            rates = [self.interval / seconds for seconds in self.intervals if seconds]
+            lines += ["", f"host time per {self.interval} instructions: {len(self.intervals)} intervals, "
+                          f"min {min(self.intervals) * 1000:.2f} ms, max {max(self.intervals) * 1000:.2f} ms"
+                          + (f", mean {sum(rates) / len(rates):,.0f} instructions/s" if rates else "")]
+        return "\n".join(lines) + "\n"
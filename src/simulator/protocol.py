@@ -0,0 +1,64 @@
+import json
+import os
+import struct
+import tempfile
+
+# Wire format of the simulation service (see service.py and client.py). Both directions send
+# frames of a kind byte, a 4-byte little-endian payload length and the payload:
+#   JOB      client -> server, JSON job (see service.run_job)
+#   OUTPUT   server -> client, the next piece of the trace and memory dump file
+#   MESSAGE  server -> client, text the simulator would have printed ([ERROR] lines)
+#   DONE     server -> client, JSON status; ends the reply to one job
+# A connection may carry any number of jobs, one after the other.
+FRAME = struct.Struct("<cI")
+JOB = b"J"
+OUTPUT = b"O"
+MESSAGE = b"M"
+DONE = b"D"
+CHUNK_SIZE = 1 << 16  # bytes of output per OUTPUT frame
+MAX_FRAME = 1 << 30
+
+DEFAULT_SOCKET = os.path.join(tempfile.gettempdir(), "rvsim.sock")
+
+
+def pack_frame(kind, payload):
+    if isinstance(payload, str):
+        payload = payload.encode()
+    return FRAME.pack(kind, len(payload)) + payload
+
+
+def pack_json(kind, value):
+    return pack_frame(kind, json.dumps(value, separators=(",", ":")))
+
+
+def parse_header(header):
+    kind, length = FRAME.unpack(header)
+    if length > MAX_FRAME:
+        raise ValueError(f"Frame of {length} bytes is too large")
+    return kind, length
+
+
+async def read_frame(reader):
+    # (kind, payload), or None at a clean end of stream
+    header = await reader.read(FRAME.size)
+    if not header:
+        return None
+    if len(header) < FRAME.size:
+        header += await reader.readexactly(FRAME.size - len(header))
+    kind, length = parse_header(header)
+    return kind, await reader.readexactly(length)
+
+
+def recv_exactly(sock, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("Service closed the connection")
+        data += chunk
+    return bytes(data)
+
+
+def recv_frame(sock):
+    kind, length = parse_header(recv_exactly(sock, FRAME.size))
+    return kind, recv_exactly(sock, length)
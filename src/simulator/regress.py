@@ -0,0 +1,424 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+
+if __package__ in (None, ""):
+    # Running as a script: make the packages under src/ importable
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from simulator.limits import LIMITS, LOOP_CHECK
+from simulator.service import MAX_STEPS, TIMEOUT, run_job
+
+# A test case is NAME.s next to NAME.expected, the output simulator.py should write for it.
+# An optional NAME.json holds the case's options as a service job (see service.run_job), e.g.
+# {"trace": "final", "dump": ["all"]}; without it the case runs with simulator.py's defaults.
+SOURCE_EXT = ".s"
+EXPECTED_EXT = ".expected"
+OPTIONS_EXT = ".json"
+BLOCK_SIZE = 1 << 20  # bytes compared at a time
+SHOWN = 200  # characters of a divergent line kept in reports
+CACHE_FILE = "results.json"
+
+
+def discover(paths):
+    # (name, source, expected, options path or None) for every case under the given files and
+    # directories, sorted by name. A name is the case's path without extension relative to the
+    # directory given (for a file, the one holding it), with / separators, so it is the same
+    # whatever the working directory and platform.
+    sources = {}  # real path -> (source, root); a case reached through two of the paths runs once
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in files:
+                    if name.endswith(SOURCE_EXT):
+                        source = os.path.join(root, name)
+                        sources.setdefault(os.path.realpath(source), (source, path))
+        else:
+            sources.setdefault(os.path.realpath(path), (path, os.path.dirname(path) or os.curdir))
+    cases = []
+    for source, root in sources.values():
+        stem = source[:-len(SOURCE_EXT)] if source.endswith(SOURCE_EXT) else source
+        if not os.path.exists(stem + EXPECTED_EXT):
+            continue
+        options = stem + OPTIONS_EXT
+        cases.append((os.path.relpath(stem, root).replace(os.sep, "/"), source, stem + EXPECTED_EXT,
+                      options if os.path.exists(options) else None))
+    cases.sort(key=lambda case: case[0])
+    for case, other in zip(cases, cases[1:]):
+        if case[0] == other[0]:
+            raise ValueError(f"Two cases are named {case[0]}: {case[1]} and {other[1]}")
+    return cases
+
+
+def shard(cases, index, count):
+    # The index-th of `count` disjoint slices, stable across runs and machines
+    return [case for case in cases
+            if int.from_bytes(hashlib.sha256(case[0].encode()).digest()[:4], "little") % count == index]
+
+
+def code_version():
+    # Digest of the assembler and simulator sources, so a result is never reused across code changes
+    digest = hashlib.sha256()
+    src = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    for package in ("assembler", "simulator"):
+        directory = os.path.join(src, package)
+        for name in sorted(os.listdir(directory)):
+            if name.endswith(".py"):
+                digest.update(name.encode())
+                with open(os.path.join(directory, name), "rb") as f:
+                    digest.update(f.read())
+    return digest.hexdigest()
+
+
+def case_key(case, version, limits):
+    # Hash of the source, options, code version and limits. Expected outputs can be far larger
+    # than their sources, so they are identified by size and modification time instead.
+    _, source, expected, options = case
+    digest = hashlib.sha256(version.encode())
+    digest.update(repr(limits).encode())
+    for path in (source, options):
+        digest.update(b"\0")
+        if path is not None:
+            with open(path, "rb") as f:
+                digest.update(f.read())
+    stat = os.stat(expected)
+    digest.update(f"\0{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return digest.hexdigest()
+
+
+def common_prefix(x, y):
+    # Length of the longest common prefix of two byte strings
+    end = min(len(x), len(y))
+    i = 0
+    while i + 4096 <= end and x[i:i + 4096] == y[i:i + 4096]:
+        i += 4096
+    while i < end and x[i] == y[i]:
+        i += 1
+    return i
+
+
+def first_difference(expected, actual):
+    # (line number, expected line, actual line) at the first difference of two files, None if
+    # they are identical; reads both a block at a time and stops at the first differing block
+    with open(expected, "rb") as a, open(actual, "rb") as b:
+        pos = 0
+        line = 1
+        line_start = 0
+        while True:
+            x = a.read(BLOCK_SIZE)
+            y = b.read(BLOCK_SIZE)
+            if x == y:
+                if not x:
+                    return None
+                newline = x.rfind(b"\n")
+                if newline >= 0:
+                    line += x.count(b"\n")
+                    line_start = pos + newline + 1
+                pos += len(x)
+                continue
+            i = common_prefix(x, y)
+            newline = x.rfind(b"\n", 0, i)
+            if newline >= 0:
+                line += x.count(b"\n", 0, i)
+                line_start = pos + newline + 1
+            a.seek(line_start)
+            b.seek(line_start)
+            return line, shown(a.readline()), shown(b.readline())
+
+
+def shown(line):
+    if not line:
+        return "<end of file>"
+    text = line.decode(errors="replace").rstrip("\n")
+    return text if len(text) <= SHOWN else text[:SHOWN] + "..."
+
+
+class Mismatch(Exception):
+    pass
+
+
+class Comparison:
+    # Text stream that compares the output written to it with an expected file while it is being
+    # written, a block of whole lines at a time. At the first difference it keeps `difference`, as
+    # first_difference() returns it, and raises Mismatch from write(), which stops the run; the
+    # rest of the output is dropped. finish() compares what is left once the output is complete.
+    #   with Comparison(expected) as stream:
+    #       run_job(job, stream=stream)
+    #       difference = stream.difference or stream.finish()
+    def __init__(self, path):
+        self.path = path
+        self.expected = open(path, "rb")
+        self.pending = []  # text written since the last comparison
+        self.size = 0
+        self.pos = 0  # bytes compared
+        self.line = 1  # line number at `pos`
+        self.difference = None
+        self.closed = False
+
+    def write(self, text):
+        if self.difference is None:
+            self.pending.append(text)
+            self.size += len(text)
+            if self.size >= BLOCK_SIZE:
+                data = "".join(self.pending).encode()
+                cut = data.rfind(b"\n") + 1  # a partial last line waits, so a divergent line is seen whole
+                rest = data[cut:].decode()
+                self.pending = [rest] if rest else []
+                self.size = len(rest)
+                if self.compare(data[:cut]) is not None:
+                    raise Mismatch(f"output differs from {self.path} at line {self.difference[0]}")
+        return len(text)
+
+    def finish(self):
+        # The first difference, or None if the output matched to the end of the expected file
+        if self.difference is None:
+            self.compare("".join(self.pending).encode(), final=True)
+            self.pending = []
+            self.size = 0
+        return self.difference
+
+    def compare(self, data, final=False):
+        # With `final`, the expected file must also end where `data` does
+        expected = self.expected.read(len(data) + 1 if final else len(data))
+        if expected == data:
+            self.line += data.count(b"\n")
+            self.pos += len(data)
+            return None
+        i = common_prefix(expected, data)
+        start = data.rfind(b"\n", 0, i) + 1
+        line = self.line + data.count(b"\n", 0, start)
+        self.expected.seek(self.pos + start)
+        newline = data.find(b"\n", start)
+        actual = data[start:] if newline < 0 else data[start:newline + 1]
+        self.difference = line, shown(self.expected.readline()), shown(actual)
+        return self.difference
+
+    def close(self):
+        # Called when the run's trace is closed; the expected file stays open for finish()
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.expected.close()
+        return False
+
+
+def run_case(case, max_steps=MAX_STEPS, timeout=TIMEOUT, loop_check=None):
+    # Pool worker: assembles and runs one case and compares its output; returns its result dict.
+    # A text trace is compared through a Comparison as it is written, which stops the run at the
+    # first difference; a delta trace is written to a file and compared once the run is done.
+    # `loop_check` is the default for cases whose options do not set one.
+    name, source, expected, options = case
+    start = time.perf_counter()
+    result = {"name": name, "status": "pass", "message": ""}
+    path = None
+    try:
+        job = {} if loop_check is None else {"loop_check": loop_check}
+        if options is not None:
+            with open(options) as f:
+                job.update(json.load(f))
+        with open(source) as f:
+            job["source"] = f.read()
+        if job.get("trace") == "delta":
+            path, messages, status = run_job(job, max_steps, timeout)
+            ended = path is not None and status["status"] not in LIMITS
+            difference = first_difference(expected, path) if ended else None
+        else:
+            with Comparison(expected) as stream:
+                _, messages, status = run_job(job, max_steps, timeout, stream)
+                difference = stream.difference
+                if difference is None and status["status"] not in LIMITS + ("error",):
+                    difference = stream.finish()
+        if difference is not None:
+            line, want, got = difference
+            result.update(status="fail", line=line, expected=want, actual=got,
+                          message=f"first difference at line {line}")
+        elif status["status"] in LIMITS:
+            detail = f": {status['detail']}" if status["detail"] else ""
+            result.update(status="error", message=f"Stopped ({status['status']}) after {status['steps']} "
+                                                  f"instructions{detail}")
+        elif status["status"] == "error":
+            result.update(status="error", message=messages.strip())
+    except (OSError, ValueError) as e:
+        result.update(status="error", message=str(e))
+    finally:
+        if path is not None:
+            os.remove(path)
+    result["seconds"] = round(time.perf_counter() - start, 6)
+    return result
+
+
+def run_cases(cases, jobs=1, max_steps=MAX_STEPS, timeout=TIMEOUT, on_result=None, loop_check=None):
+    # Results in case order; with jobs > 1 the cases are split into chunks over a process pool
+    results = []
+    if jobs <= 1 or len(cases) <= 1:
+        iterator = (run_case(case, max_steps, timeout, loop_check) for case in cases)
+        pool = None
+    else:
+        pool = ProcessPoolExecutor(jobs)
+        chunksize = max(1, len(cases) // (jobs * 8))
+        iterator = pool.map(run_case, cases, [max_steps] * len(cases), [timeout] * len(cases),
+                            [loop_check] * len(cases), chunksize=chunksize)
+    try:
+        for result in iterator:
+            results.append(result)
+            if on_result is not None:
+                on_result(result)
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+    return results
+
+
+class ResultCache:
+    # Case results under cache_key(); only passes are kept, since a failure should be seen again
+    # until it is fixed. Saved as one JSON file, replaced atomically, without the results of
+    # other code versions; shards may share the directory as long as they do not save at once.
+    def __init__(self, directory, version):
+        self.directory = directory
+        self.version = version
+        self.path = os.path.join(directory, CACHE_FILE)
+        os.makedirs(directory, exist_ok=True)
+        try:
+            with open(self.path) as f:
+                self.results = json.load(f)
+        except (OSError, ValueError):
+            self.results = {}
+
+    def get(self, key):
+        return self.results.get(key)
+
+    def put(self, key, result):
+        if result["status"] == "pass":
+            self.results[key] = dict(result, version=self.version)
+
+    def save(self):
+        self.results = {key: result for key, result in self.results.items()
+                        if result.get("version") == self.version}
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(self.results, f)
+        os.replace(tmp, self.path)
+
+
+def format_failure(result):
+    lines = [f"{result['status'].upper()} {result['name']}: {result['message']}"]
+    if result["status"] == "fail":
+        lines += [f"  expected: {result['expected']}", f"  actual:   {result['actual']}"]
+    return "\n".join(lines)
+
+
+def write_junit(path, results, seconds):
+    failures = sum(result["status"] == "fail" for result in results)
+    errors = sum(result["status"] == "error" for result in results)
+    suite = ET.Element("testsuite", name="regress", tests=str(len(results)), failures=str(failures),
+                       errors=str(errors), time=f"{seconds:.3f}")
+    for result in results:
+        directory, _, name = result["name"].rpartition("/")
+        case = ET.SubElement(suite, "testcase", classname=directory or ".", name=name,
+                             time=f"{result['seconds']:.3f}")
+        if result["status"] != "pass":
+            element = ET.SubElement(case, "failure" if result["status"] == "fail" else "error",
+                                    message=result["message"])
+            element.text = format_failure(result)
+    ET.ElementTree(suite).write(path, encoding="utf-8", xml_declaration=True)
+
+
+def write_json(path, results, seconds):
+    summary = {status: sum(result["status"] == status for result in results) for status in ("pass", "fail", "error")}
+    summary.update(cached=sum(result.get("cached", False) for result in results), seconds=round(seconds, 3),
+                   results=results)
+    with open(path, "w") as f:
+        json.dump(summary, f, indent=1)
+
+
+def parse_shard(spec):
+    # "I/N", 1-based
+    try:
+        index, count = (int(part) for part in spec.split("/"))
+    except ValueError:
+        raise ValueError(f"Shard must be I/N, got {spec!r}")
+    if not 1 <= index <= count:
+        raise ValueError(f"Shard index out of range: {spec!r}")
+    return index - 1, count
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run a regression corpus of NAME.s / NAME.expected pairs")
+    parser.add_argument("paths", nargs="+", metavar="path", help="test directories (searched recursively) or sources")
+    parser.add_argument("--jobs", type=int, help="worker processes (default: one per CPU)")
+    parser.add_argument("--shard", type=parse_shard, metavar="I/N", help="run only the I-th of N slices of the corpus")
+    parser.add_argument("--cache", metavar="DIR", help="skip cases that passed before with the same source, "
+                                                       "expected output, options and simulator code")
+    parser.add_argument("--max-steps", type=int, default=MAX_STEPS,
+                        help=f"most instructions a case may run (default: {MAX_STEPS})")
+    parser.add_argument("--timeout", type=float, default=TIMEOUT,
+                        help=f"most seconds a case may run (default: {TIMEOUT:g})")
+    parser.add_argument("--detect-loops", type=int, nargs="?", const=LOOP_CHECK, metavar="N",
+                        help="fail cases once their state repeats, checked every N instructions (default: "
+                             f"{LOOP_CHECK}); a case's options may set loop_check instead")
+    parser.add_argument("--junit", metavar="PATH", help="write a JUnit XML report here")
+    parser.add_argument("--json", metavar="PATH", help="write a JSON report here")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    start = time.perf_counter()
+    try:
+        cases = discover(args.paths)
+    except ValueError as e:
+        print(f"[ERROR] {e}")
+        return 1
+    if args.shard is not None:
+        cases = shard(cases, *args.shard)
+
+    cache = None
+    keys = {}
+    results = {}
+    if args.cache:
+        cache = ResultCache(args.cache, code_version())
+        for case in cases:
+            key = keys[case[0]] = case_key(case, cache.version, (args.max_steps, args.timeout, args.detect_loops))
+            cached = cache.get(key)
+            if cached is not None:
+                cached = dict(cached, name=case[0], cached=True)
+                del cached["version"]
+                results[case[0]] = cached
+    pending = [case for case in cases if case[0] not in results]
+
+    def report(result):
+        if result["status"] != "pass":
+            print(format_failure(result), flush=True)
+
+    for result in run_cases(pending, args.jobs or os.cpu_count() or 1, args.max_steps, args.timeout, report,
+                            args.detect_loops):
+        results[result["name"]] = result
+        if cache is not None:
+            cache.put(keys[result["name"]], result)
+    if cache is not None:
+        cache.save()
+
+    ordered = [results[case[0]] for case in cases]
+    seconds = time.perf_counter() - start
+    counts = {status: sum(result["status"] == status for result in ordered) for status in ("pass", "fail", "error")}
+    print(f"{len(ordered)} cases: {counts['pass']} passed, {counts['fail']} failed, {counts['error']} errors, "
+          f"{len(ordered) - len(pending)} cached, in {seconds:.2f} s")
+    if args.junit:
+        write_junit(args.junit, ordered, seconds)
+    if args.json:
+        write_json(args.json, ordered, seconds)
+    return 1 if counts["fail"] or counts["error"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,205 @@
+from collections import Counter, namedtuple
+
+from .blocks import BlockEngine
+
+# One detailed window: `steps` instructions from step `start`, opened by `trigger` ("every",
+# "step" or "pc 0x..."). `weight` comes from --sample-at STEP:WEIGHT (e.g. a SimPoint weight);
+# `cycles` is what the timing model counted over the window, when one is attached.
+Window = namedtuple("Window", "start steps trigger weight cycles")
+
+
+def parse_points(spec):
+    # "STEP[:WEIGHT],..." -> [(step, weight or None)]
+    points = []
+    try:
+        for part in spec.split(","):
+            step, _, weight = part.partition(":")
+            points.append((int(step, 0), float(weight) if weight else None))
+    except ValueError:
+        raise ValueError(f"Sample points must be STEP[:WEIGHT],..., got {spec!r}")
+    return points
+
+
+def distance(a, b):
+    # Manhattan distance between two normalized sparse vectors
+    return sum(abs(a.get(key, 0.0) - b.get(key, 0.0)) for key in a.keys() | b.keys())
+
+
+def normalize(vector):
+    total = sum(vector.values()) or 1
+    return {key: count / total for key, count in vector.items()}
+
+
+def pick(vectors, k, iterations=20):
+    # SimPoint-style choice of representative intervals: k-means over the normalized basic-block
+    # vectors, seeded by farthest-point, then the interval nearest each centroid. Returns
+    # [(interval index, weight)] sorted by index, the weights being the cluster sizes as fractions.
+    points = [normalize(vector) for vector in vectors]
+    if not points:
+        return []
+    centroids = [points[0]]
+    while len(centroids) < min(k, len(points)):
+        far = max(range(len(points)), key=lambda i: min(distance(points[i], c) for c in centroids))
+        if not min(distance(points[far], c) for c in centroids):
+            break  # every interval already matches a centroid
+        centroids.append(points[far])
+    for _ in range(iterations):
+        clusters = [[] for _ in centroids]
+        for i, point in enumerate(points):
+            clusters[min(range(len(centroids)), key=lambda c: distance(point, centroids[c]))].append(i)
+        updated = []
+        for members, centroid in zip(clusters, centroids):
+            if not members:
+                updated.append(centroid)
+                continue
+            total = Counter()
+            for i in members:
+                total.update(points[i])
+            updated.append({key: value / len(members) for key, value in total.items()})
+        if updated == centroids:
+            break
+        centroids = updated
+    picks = []
+    for members, centroid in zip(clusters, centroids):
+        if members:
+            nearest = min(members, key=lambda i: distance(points[i], centroid))
+            picks.append((nearest, len(members) / len(points)))
+    return sorted(picks)
+
+
+class Sampler:
+    # Sampled simulation for runs too long to trace or instrument in full. Between windows the
+    # program is fast-forwarded as compiled basic blocks with the profiler, timing model, watcher
+    # and any per-step trace detached; each detailed window then runs `window` instructions through
+    # sim.run() with all of them attached. Windows open every `every` instructions, at the steps
+    # in `at` ((step, weight) pairs) and on the first arrival at each PC in `pcs`.
+    # With `interval`, fast-forwarding also collects one basic-block vector per `interval`
+    # instructions (instructions in detailed windows are not counted), for pick().
+    #   sampler = Sampler(sim, every=10_000_000, window=100_000, interval=1_000_000)
+    #   sampler.run()
+    #   print(sampler.report(simpoints=10))
+    # The timing model and caches are not warmed between windows, so short windows overstate misses.
+    def __init__(self, sim, every=None, window=10_000, at=(), pcs=(), interval=None):
+        if window <= 0 or (every is not None and every <= 0) or (interval is not None and interval <= 0):
+            raise ValueError("Sampling period, window and interval must be positive")
+        self.sim = sim
+        self.every = every
+        self.window = window
+        self.at = dict(at)
+        self.stops = {pc // 4 for pc in pcs}
+        self.interval = interval
+        self.engine = BlockEngine(sim)
+        self.engine.split_at(self.stops)
+        self.vectors = []
+        self.vector = Counter()
+        self.interval_end = interval
+        self.windows = []
+        self.fast = 0  # fast-forwarded instructions
+
+    def next_window(self):
+        steps = self.sim.steps
+        candidates = [step for step in self.at if step >= steps]
+        if self.every is not None:
+            candidates.append(-(-steps // self.every) * self.every)
+        return min(candidates, default=None)
+
+    def run(self, max_steps=None):
+        # Returns the number of retired instructions, as Simulator.run() does
+        sim = self.sim
+        start = sim.steps
+        limit = None if max_steps is None else start + max_steps
+        while not sim.halted and (limit is None or sim.steps < limit):
+            target = self.next_window()
+            if target == sim.steps:
+                weight = self.at.pop(target, None)
+                trigger = "step" if weight is not None or self.every is None or target % self.every else "every"
+                self.detail(trigger, weight, limit)
+                continue
+            stop = min((x for x in (target, self.interval_end, limit) if x is not None), default=None)
+            self.fast_forward(None if stop is None else stop - sim.steps)
+            if not sim.halted and sim.pointer in self.stops:
+                self.stops.discard(sim.pointer)
+                self.detail(f"pc 0x{sim.pc:08X}", None, limit)
+        if sim.halted and self.interval is not None and self.vector:
+            self.vectors.append(self.vector)  # the last, partial interval
+            self.vector = Counter()
+        return sim.steps - start
+
+    def fast_forward(self, count):
+        sim = self.sim
+        attached = sim.trace, sim.profiler, sim.timing, sim.watcher
+        sim.profiler = sim.timing = sim.watcher = None
+        if sim.trace is not None and sim.trace.per_step:
+            sim.trace = None  # a "final" trace stays, so it still ends on the last state
+        try:
+            self.fast += self.engine.run(count, self.vector if self.interval is not None else None,
+                                         self.stops or None)
+        finally:
+            sim.trace, sim.profiler, sim.timing, sim.watcher = attached
+        self.close_intervals()
+
+    def detail(self, trigger, weight, limit):
+        sim = self.sim
+        timing = sim.timing
+        cycles = timing.cycles if timing is not None else None
+        start = sim.steps
+        sim.run(self.window if limit is None else min(self.window, limit - start))
+        if timing is not None:
+            cycles = timing.cycles - cycles
+        self.windows.append(Window(start, sim.steps - start, trigger, weight, cycles))
+        self.close_intervals()
+
+    def close_intervals(self):
+        steps = self.sim.steps
+        while self.interval is not None and steps >= self.interval_end:
+            self.vectors.append(self.vector)
+            self.vector = Counter()
+            self.interval_end += self.interval
+
+    def write_vectors(self, path):
+        # SimPoint's frequency vector format: "T:id:count :id:count ..." per interval, ids from 1
+        ids = {}
+        with open(path, "w") as f:
+            for vector in self.vectors:
+                fields = []
+                for pointer in sorted(vector):
+                    fields.append(f":{ids.setdefault(pointer, len(ids) + 1)}:{vector[pointer]}")
+                f.write("T" + " ".join(fields) + "\n")
+
+    def estimate_cpi(self):
+        # Cycles per instruction over the windows: weighted by their weights if they have them
+        measured = [window for window in self.windows if window.cycles is not None and window.steps]
+        if not measured:
+            return None
+        weighted = [window for window in measured if window.weight is not None]
+        if weighted:
+            total = sum(window.weight for window in weighted) or 1
+            return sum(window.weight * window.cycles / window.steps for window in weighted) / total
+        return sum(window.cycles for window in measured) / sum(window.steps for window in measured)
+
+    def report(self, simpoints=None):
+        total = self.sim.steps
+        detailed = sum(window.steps for window in self.windows)
+        lines = [f"sampled run: {total} instructions, {detailed} in {len(self.windows)} detailed windows "
+                 f"({100 * detailed / (total or 1):.2f}%), {self.fast} fast-forwarded", "",
+                 "windows:", f"  {'start':>14} {'steps':>10}  {'trigger':14} {'weight':>8} {'cycles':>12} {'CPI':>7}"]
+        for window in self.windows:
+            weight = f"{window.weight:8.4f}" if window.weight is not None else f"{'':8}"
+            cycles = f"{window.cycles:12} {window.cycles / window.steps:7.3f}" if window.cycles and window.steps else ""
+            lines.append(f"  {window.start:14} {window.steps:10}  {window.trigger:14} {weight} {cycles}")
+        cpi = self.estimate_cpi()
+        if cpi is not None:
+            lines += ["", f"estimated cycles for the whole run: {cpi * total:,.0f} (CPI {cpi:.3f})"]
+        if self.vectors:
+            blocks = set().union(*self.vectors)
+            lines += ["", f"basic-block vectors: {len(self.vectors)} intervals of {self.interval} instructions, "
+                          f"{len(blocks)} distinct blocks"]
+            if simpoints:
+                picks = pick(self.vectors, simpoints)
+                lines.append(f"representative intervals (k={simpoints}):")
+                for index, weight in picks:
+                    lines.append(f"  interval {index:8}  steps {index * self.interval}-"
+                                 f"{(index + 1) * self.interval - 1}  weight {weight:.4f}")
+                points = ",".join(f"{index * self.interval}:{weight:.4f}" for index, weight in picks)
+                lines.append(f"  measure them with: --sample-at {points} --sample-window {self.interval}")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,235 @@
+import argparse
+import asyncio
+import base64
+import contextlib
+import io
+import json
+import os
+import signal
+import stat
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+if __package__ in (None, ""):
+    # Running as a script: make the packages under src/ importable
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from assembler.assembler import Assembler
+from simulator.limits import HALTED, Limits
+from simulator.memory import ADDRESS_SPACE, MemoryFault, parse_range
+from simulator.protocol import (CHUNK_SIZE, DEFAULT_SOCKET, DONE, JOB, MESSAGE, OUTPUT, pack_frame, pack_json,
+                                read_frame)
+from simulator.simulator import Simulator, dump_ranges, open_trace
+from simulator.syscalls import Host
+
+MAX_STEPS = 100_000_000  # default per-job limits; jobs may ask for less, never more
+TIMEOUT = 60.0
+# Status of a job that failed before it could run
+ERROR = {"status": "error", "reason": "error", "detail": "", "exit_code": None, "steps": 0, "pc": 0, "seconds": 0}
+
+
+def job_limit(job, key, kinds=(int,)):
+    # A numeric field of a job, or None if it is not set
+    value = job.get(key)
+    if value is not None and (isinstance(value, bool) or not isinstance(value, kinds)):
+        raise ValueError(f"Job field {key} must be {'a number' if float in kinds else 'an integer'}, got {value!r}")
+    return value
+
+
+def run_job(job, max_steps=MAX_STEPS, timeout=TIMEOUT, stream=None):
+    # Pool worker: assembles and runs one job, with the trace and memory dump going to a
+    # temporary file the server streams back and removes, or to `stream`, a text stream, for the
+    # text trace modes. An exception raised by `stream` ends the run as an error. A job is a dict of
+    #   program      base64 of a program file (binary text lines or a packed image), or
+    #   source       assembly text
+    #   trace, every, ring, compression, memory_size, blocks    as for simulator.py
+    #   dump         list of --dump ranges, e.g. ["0x10000:0x10080"] or ["all"]
+    #   max_steps, timeout                                      lowered to the server's limits
+    #   loop_check   instructions between checks for a repeated state (see limits.Limits)
+    #   stdin        base64 of what the guest reads from fd 0; what it writes to fds 1 and 2 comes
+    #                back with the messages. Jobs cannot open host files.
+    # Returns (output path or None, printed messages, status), where status["status"] is
+    # "halted", "fault", "step limit", "time limit", "loop" or "error", status["reason"] and
+    # status["detail"] say more (see limits.py) and status["exit_code"] is the guest's, if it exited.
+    # The path is None after an error, and with `stream`.
+    start = time.perf_counter()
+    messages = io.StringIO()
+    path = None
+    if stream is None:
+        fd, path = tempfile.mkstemp(prefix="rvsim-", suffix=".out")
+        os.close(fd)
+    sim = None
+    reason = detail = ""
+    output = io.BytesIO()
+    with contextlib.redirect_stdout(messages):
+        try:
+            if not isinstance(job, dict):
+                raise ValueError(f"Job must be a JSON object, got {type(job).__name__}")
+            max_steps = min(job_limit(job, "max_steps") or max_steps, max_steps)
+            deadline = start + min(job_limit(job, "timeout", (int, float)) or timeout, timeout)
+            loop_check = job_limit(job, "loop_check")
+            host = Host(io.BytesIO(base64.b64decode(job.get("stdin", ""))), output, output, files=False)
+            dump = dump_ranges([parse_range(spec) for spec in job.get("dump", ())])
+            with open_trace(path if stream is None else stream, job.get("trace", "full"), job.get("every", 1000),
+                            job.get("ring", 1024), job.get("compression", "none"), dump) as trace:
+                sim = Simulator(trace, blocks=job.get("blocks", False),
+                                memory_size=job.get("memory_size", ADDRESS_SPACE), dump=dump, host=host)
+                if "source" in job:
+                    assembler = Assembler(track_source=False)
+                    words = assembler.encode(job["source"])
+                    if assembler.errors:
+                        raise ValueError("\n".join(assembler.errors))
+                    sim.load(words, assembler.entry)
+                elif "program" in job:
+                    sim.load(base64.b64decode(job["program"]))
+                else:
+                    raise ValueError("Job has neither a program nor source")
+                limits = Limits(sim, max_steps, deadline - time.perf_counter(), loop_check)
+                try:
+                    limits.run()
+                except MemoryFault as e:
+                    print(f"[ERROR] {e}")
+                reason, _, _, detail = limits.termination
+                status = "halted" if reason in HALTED else reason
+                trace.flush_pending()
+                sim.write_memory()
+        except Exception as e:  # a bad job must not take the worker down
+            print(f"[ERROR] {e}")
+            if path is not None:
+                os.remove(path)
+                path = None
+            status = "error"
+    result = {"status": status, "reason": "error" if status == "error" else reason, "detail": detail,
+              "exit_code": sim.exit_code if sim else None, "steps": sim.steps if sim else 0,
+              "pc": sim.pc if sim else 0, "seconds": round(time.perf_counter() - start, 6)}
+    return path, output.getvalue().decode(errors="replace") + messages.getvalue(), result
+
+
+def warm_up():
+    # Runs a trivial job so a new worker has every module and table loaded before real jobs arrive
+    path, _, _ = run_job({"source": "beq zero,zero,0", "trace": "final"})
+    if path is not None:
+        os.remove(path)
+
+
+class Service:
+    # Accepts jobs over any number of connections and runs them on a pool of worker processes
+    # that stay up between jobs, so a job costs neither interpreter start-up nor imports.
+    #   service = Service(workers=4)
+    #   asyncio.run(service.serve(socket_path="/tmp/rvsim.sock"))   # or host=..., port=...
+    def __init__(self, workers=None, max_steps=MAX_STEPS, timeout=TIMEOUT):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_steps = max_steps
+        self.timeout = timeout
+        self.pool = None
+
+    async def handle(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                frame = await read_frame(reader)
+                if frame is None:
+                    break
+                kind, payload = frame
+                if kind != JOB:
+                    raise ValueError(f"Expected a job frame, got {kind!r}")
+                try:
+                    job = json.loads(payload)
+                except ValueError as e:
+                    await self.fail(writer, f"Bad job: {e}")
+                    continue
+                pool = self.pool
+                try:
+                    path, messages, status = await loop.run_in_executor(pool, run_job, job, self.max_steps,
+                                                                        self.timeout)
+                except BrokenProcessPool:
+                    # A worker died (killed, or out of memory) and took the pool with it; later
+                    # jobs get a new one
+                    if self.pool is pool:
+                        self.pool = ProcessPoolExecutor(self.workers)
+                        pool.shutdown(wait=False)
+                    await self.fail(writer, "A worker process died running the job")
+                    continue
+                except Exception as e:  # run_job catches job errors; this is the pool failing to run it
+                    await self.fail(writer, f"Job could not run: {e}")
+                    continue
+                try:
+                    if messages:
+                        writer.write(pack_frame(MESSAGE, messages))
+                    if path is not None:
+                        with open(path, "rb") as f:
+                            while chunk := f.read(CHUNK_SIZE):
+                                writer.write(pack_frame(OUTPUT, chunk))
+                                await writer.drain()
+                finally:
+                    if path is not None:
+                        os.remove(path)
+                writer.write(pack_json(DONE, status))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass  # the client went away or broke the protocol; its job, if any, has finished
+        finally:
+            writer.close()
+
+    async def fail(self, writer, message):
+        # Ends the reply to a job that did not run with an error message and status
+        writer.write(pack_frame(MESSAGE, f"[ERROR] {message}\n"))
+        writer.write(pack_json(DONE, ERROR))
+        await writer.drain()
+
+    async def serve(self, socket_path=DEFAULT_SOCKET, host="127.0.0.1", port=None, ready=None):
+        loop = asyncio.get_running_loop()
+        self.pool = ProcessPoolExecutor(self.workers)
+        with contextlib.suppress(NotImplementedError, RuntimeError, ValueError):
+            # Shut the pool down on SIGTERM too, or its workers outlive the server
+            loop.add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+        try:
+            await asyncio.gather(*(loop.run_in_executor(self.pool, warm_up) for _ in range(self.workers)))
+            if port is None:
+                if os.path.exists(socket_path) and stat.S_ISSOCK(os.stat(socket_path).st_mode):
+                    os.remove(socket_path)  # left behind by a server that did not shut down cleanly
+                server = await asyncio.start_unix_server(self.handle, socket_path)
+            else:
+                server = await asyncio.start_server(self.handle, host, port)
+            async with server:
+                if ready is not None:
+                    ready(server)
+                await server.serve_forever()
+        finally:
+            self.pool.shutdown(cancel_futures=True)
+            if port is None and os.path.exists(socket_path):
+                os.remove(socket_path)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run simulation jobs for client.py on warm worker processes")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET, help=f"Unix socket to listen on (default: {DEFAULT_SOCKET})")
+    parser.add_argument("--port", type=int, help="listen on this TCP port instead of the socket")
+    parser.add_argument("--host", default="127.0.0.1", help="address for --port (default: 127.0.0.1)")
+    parser.add_argument("--workers", type=int, help="worker processes (default: one per CPU)")
+    parser.add_argument("--max-steps", type=int, default=MAX_STEPS,
+                        help=f"most instructions a job may run (default: {MAX_STEPS})")
+    parser.add_argument("--timeout", type=float, default=TIMEOUT,
+                        help=f"most seconds a job may run (default: {TIMEOUT:g})")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    service = Service(args.workers, args.max_steps, args.timeout)
+    address = f"{args.host}:{args.port}" if args.port is not None else args.socket
+
+    def ready(server):
+        print(f"Listening on {address} with {service.workers} worker(s)", file=sys.stderr, flush=True)
+
+    try:
+        asyncio.run(service.serve(args.socket, args.host, args.port, ready))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+
+
+if __name__ == "__main__":
+    main()
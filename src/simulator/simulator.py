@@ -1,149 +1,423 @@
+import argparse
+import contextlib
+import json
+import os
 import sys
-memory = {}
-reg = [0] * 32
-reg[2] = 380  #register 2 is sp (initialized to 380)
-PC = 0
-
-INPUT_FILE = str(sys.argv[1]) 
-OUTPUT_FILE = str(sys.argv[2])
-
-def sign_extend(value, bits):
-    sign_bit = 1 << (bits - 1)
-    return (value & (sign_bit - 1)) - (value & sign_bit)
-
-def write_memory():
-    with open(OUTPUT_FILE, 'a') as f:
-        for addr in range(0x00010000, 0x00010080, 4):
-            value = memory.get(addr, 0)
-            f.write(f"0x{addr:08X}:0b{value:032b}\n")
-
-def write_state():
-    with open(OUTPUT_FILE, 'a') as f:
-        f.write(f"0b{PC:032b} ")
-        for r in reg:
-            f.write(f"0b{r:032b} ")
-        f.write("\n")
-
-def btype(i):
-    funct3 = i[17:20]
-    rs1 = int(i[12:17], 2)
-    rs2 = int(i[7:12], 2)
-
-    if funct3 == '000':  # BEQ
-        return reg[rs1] == reg[rs2]
-    elif funct3 == '001':  # BNE
-        return reg[rs1] != reg[rs2]
-    return False
-
-def get_btype_imm(i):
-    imm = i[0] + i[24] + i[1:7] + i[20:24]
-    imm = int(imm, 2)
-    return sign_extend(imm << 1, 13)
-
-def get_jtype_imm(i):
-    return sign_extend(int(i[0] + i[12:20] + i[11] + i[1:11] + '0', 2), 21)
-
-# Clear output file
-with open(OUTPUT_FILE, 'w') as f:
-    f.write("")
-
-# Read input instructions
-with open(INPUT_FILE, 'r') as f:
-    instr = f.read().strip().splitlines()
-
-pointer = 0
-while 0 <= pointer < len(instr):
-    i = instr[pointer]
-    opcode = int(i[25:32], 2)
-
-    if opcode == 0b1100011:  # B-TYPE
-        imm = get_btype_imm(i)
-        if btype(i):
-            if imm == 0 and i[12:17] == "00000" and i[7:12] == "00000":
-                write_state()
-                break  # Virtual halt
-            pointer += imm // 4
-            PC += imm
+
+if __package__ in (None, ""):
+    # Running as a script: make the packages under src/ importable
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from simulator.blocks import BlockEngine
+from simulator.checkpoint import TimeMachine, capture, read_snapshot, restore, write_snapshot
+from simulator.decoder import decode_program, decode_words
+from simulator.deltatrace import COMPRESSION, DeltaTraceWriter
+from simulator.isa import ECALL, STORE, IllegalInstruction, decode_handlers
+from simulator.limits import FAULT_EXIT, LIMIT_EXIT, LIMITS, LOOP_CHECK, Limits, exit_status, format_termination
+from simulator.loader import load_buffer, load_program
+from simulator.memory import ADDRESS_SPACE, Memory, MemoryFault, parse_range
+from simulator.profiler import MEMORY_OPS, Profiler
+from simulator.sampling import Sampler, parse_points
+from simulator.syscalls import Host
+from simulator.timing import PREDICTORS, TimingModel, parse_cache
+from simulator.trace import TRACE_MODES, TraceWriter, format_memory
+from simulator.watch import Watcher, format_hit, parse_watch
+
+STACK_POINTER = 380  # initial value of register 2 (sp)
+DUMP_START = 0x00010000
+DUMP_END = 0x00010080
+DUMP_RANGES = ((DUMP_START, DUMP_END),)
+
+
+def report_store(on_store, memory, reg, ins):
+    # A word store is reported as written; narrower stores as the words they changed
+    addr = (reg[ins.rs1] + ins.imm) & 0xFFFFFFFF
+    if ins.funct3 == 0b010:
+        on_store(addr, reg[ins.rs2])
+        return
+    for word in range(addr & ~3, addr + (2 if ins.funct3 == 0b001 else 1), 4):
+        on_store(word, memory.load_word(word))
+
+
+class Simulator:
+    # Holds its own register file, memory and PC so many programs can run in one process.
+    #   sim = Simulator(TraceWriter())     # trace kept in memory
+    #   sim.load(words)                    # path, image bytes, words or binary text lines
+    #   sim.run(max_steps=10_000)
+    #   sim.pc, sim.reg, sim.memory, sim.trace.getvalue()
+    # With blocks=True, run() executes hot code as compiled basic blocks (see blocks.py) unless the
+    # trace needs every step, in which case it falls back to the interpreter.
+    # Setting `profiler` (see profiler.py) or `timing` (see timing.py) routes run() through
+    # instrumented() instead, which feeds every retired instruction to both if both are set.
+    # Setting `watcher` (see watch.py) runs that loop, or the interpreter, under its watchpoints.
+    # write_memory() dumps the [start, end) ranges in `dump`, or all touched memory if it is None.
+    # ECALLs go to `host` (see syscalls.py), by default one on this process's stdin and stdout
+    # that does not let the guest open host files.
+    def __init__(self, trace=None, blocks=False, memory_size=ADDRESS_SPACE, profiler=None, timing=None,
+                 watcher=None, dump=DUMP_RANGES, host=None):
+        self.trace = trace
+        self.host = host if host is not None else Host()
+        self.blocks = blocks
+        self.memory_size = memory_size
+        self.profiler = profiler
+        self.timing = timing
+        self.watcher = watcher
+        self.dump = dump
+        self.engine = None
+        self.program = []
+        self.handlers = []
+        self.entry = 0
+        self.symbols = {}
+        self.reset()
+
+    def reset(self):
+        # Back to the initial architectural state; the loaded program is kept
+        self.memory = Memory(self.memory_size)
+        self.reg = [0] * 32
+        self.reg[2] = STACK_POINTER
+        self.pc = self.entry
+        self.pointer = self.entry // 4
+        self.steps = 0
+        self.halted = False
+        self.reason = None  # why it halted, see limits.py
+        self.exit_code = None  # set by the exit system call
+
+    def load(self, program, entry=0):
+        if isinstance(program, str):
+            program, entry, self.symbols = load_program(program)
+        elif isinstance(program, (bytes, bytearray, memoryview)):
+            program, entry, self.symbols = load_buffer(program)
+        elif program and isinstance(program[0], str):
+            program = decode_program(program)
         else:
-            pointer += 1
-            PC += 4
-
-    elif opcode == 0b1101111:  # J-TYPE
-        rd = int(i[20:25], 2)
-        imm = get_jtype_imm(i)
-        reg[rd] = PC + 4
-        pointer += imm // 4
-        PC += imm
-
-    elif opcode == 0b1100111:  # JALR
-        rd = int(i[20:25], 2)
-        rs1 = int(i[12:17], 2)
-        imm = sign_extend(int(i[0:12], 2), 12)
-        target = (reg[rs1] + imm) & 0xFFFFFFFE
-        reg[rd] = PC + 4
-        pointer = target // 4
-        PC = target
-
-    elif opcode == 0b0110011:  # R-type
-        rd = int(i[20:25], 2)
-        funct3 = int(i[17:20], 2)
-        rs1 = int(i[12:17], 2)
-        rs2 = int(i[7:12], 2)
-        funct7 = int(i[0:7], 2)
-
-        if funct3 == 0b000:
-            if funct7 == 0b0000000:  # ADD
-                reg[rd] = (reg[rs1] + reg[rs2]) & 0xFFFFFFFF
-            elif funct7 == 0b0100000:  # SUB
-                reg[rd] = (reg[rs1] - reg[rs2]) & 0xFFFFFFFF
-        elif funct3 == 0b010:  # SLT
-            reg[rd] = int(reg[rs1] < reg[rs2])
-        elif funct3 == 0b101 and funct7 == 0b0000000:  # SRL
-            reg[rd] = (reg[rs1] >> reg[rs2]) & 0xFFFFFFFF
-        elif funct3 == 0b110:  # OR
-            reg[rd] = (reg[rs1] | reg[rs2]) & 0xFFFFFFFF
-        elif funct3 == 0b111:  # AND
-            reg[rd] = (reg[rs1] & reg[rs2]) & 0xFFFFFFFF
-
-        reg[0] = 0
-        pointer += 1
-        PC += 4
-
-    elif opcode == 0b0010011:  # I-type
-        rd = int(i[20:25], 2)
-        funct3 = int(i[17:20], 2)
-        rs1 = int(i[12:17], 2)
-        imm = sign_extend(int(i[0:12], 2), 12)
-        if funct3 == 0b000:  # ADDI
-            reg[rd] = (reg[rs1] + imm) & 0xFFFFFFFF
-        reg[0] = 0
-        pointer += 1
-        PC += 4
-
-    elif opcode == 0b0000011:  # LW
-        rd = int(i[20:25], 2)
-        rs1 = int(i[12:17], 2)
-        imm = sign_extend(int(i[0:12], 2), 12)
-        addr = (reg[rs1] + imm) & 0xFFFFFFFF
-        reg[rd] = memory.get(addr, 0)
-        pointer += 1
-        PC += 4
-
-    elif opcode == 0b0100011:  # SW
-        rs2 = int(i[7:12], 2)
-        rs1 = int(i[12:17], 2)
-        funct3 = int(i[17:20], 2)
-        imm = i[0:7] + i[20:25]
-        imm = sign_extend(int(imm, 2), 12)
-        if funct3 == 0b010:
-            addr = (reg[rs1] + imm) & 0xFFFFFFFF
-            memory[addr] = reg[rs2]
-        pointer += 1
-        PC += 4
+            program = decode_words(program)
+        self.program = program
+        self.handlers = decode_handlers(program)
+        self.entry = entry
+        self.engine = BlockEngine(self) if self.blocks else None
+        self.reset()
+
+    def state(self):
+        return self.pc, list(self.reg)
+
+    def snapshot(self):
+        # Copy of the architectural state; see checkpoint.py for files and time travel
+        return capture(self)
+
+    def restore(self, snapshot):
+        restore(self, snapshot)
+
+    def step(self):
+        return self.interpret(1)
+
+    def run(self, max_steps=None):
+        # Returns the number of retired instructions
+        if self.watcher is not None:
+            return self.watcher.run(self, max_steps)
+        if self.profiler is not None or self.timing is not None:
+            return self.instrumented(max_steps)
+        if self.engine is not None and (self.trace is None or not self.trace.per_step):
+            return self.engine.run(max_steps)
+        return self.interpret(max_steps)
+
+    def instrumented(self, max_steps=None):
+        # Steps the interpreter one record at a time, passing each retired one to the profiler
+        # and the timing model, whichever are attached
+        hooks = [hook for hook in (self.profiler, self.timing) if hook is not None]
+        retire = hooks[0].retire
+        also = hooks[1].retire if len(hooks) > 1 else None
+        interpret = self.interpret
+        program = self.program
+        reg = self.reg
+        size = len(program)
+        remaining = -1 if max_steps is None else max_steps
+        steps = 0
+        for hook in hooks:
+            hook.begin()
+        try:
+            while remaining and not self.halted:
+                pointer = self.pointer
+                pc = self.pc
+                if not 0 <= pointer < size:
+                    self.interpret(1)
+                    break
+                ins = program[pointer]
+                addr = (reg[ins[2]] + ins[6]) & 0xFFFFFFFF if ins[0] in MEMORY_OPS else None
+                if not interpret(1):
+                    break
+                steps += 1
+                remaining -= 1
+                retire(self, pc, ins, addr)
+                if also is not None:
+                    also(self, pc, ins, addr)
+        finally:
+            for hook in hooks:
+                hook.end()
+        return steps
+
+    def interpret(self, max_steps=None):
+        # Execute predecoded records until halt or max_steps, one handler call each (see isa.py)
+        if self.halted:
+            return 0
+        program = self.program
+        handlers = self.handlers
+        reg = self.reg
+        memory = self.memory
+        pc = self.pc
+        pointer = self.pointer
+        record = self.trace.record if self.trace is not None else None
+        on_store = getattr(self.trace, "store", None)  # traces that log memory writes
+        size = len(program)
+        remaining = -1 if max_steps is None else max_steps
+        steps = 0
+        try:
+            while remaining:
+                if not 0 <= pointer < size:
+                    self.halted = True
+                    self.reason = "end of program"
+                    break
+                ins = program[pointer]
+                target = handlers[pointer](reg, memory, ins, pc, pointer)
+                if target is None:
+                    pointer += 1
+                    pc += 4
+                elif target[0] is None:
+                    if target is ECALL and self.syscall(steps):
+                        pointer += 1
+                        pc += 4
+                    else:
+                        steps += 1
+                        self.halted = True
+                        self.reason = "halted" if target is not ECALL else "exit"
+                        if record is not None:
+                            record(pc, reg)
+                        break  # Virtual halt or exit
+                else:
+                    pointer, pc = target
+                reg[0] = 0
+                if on_store is not None and ins[0] == STORE:
+                    report_store(on_store, memory, reg, ins)
+                steps += 1
+                remaining -= 1
+                if record is not None:
+                    record(pc, reg)  # write register state
+        except IllegalInstruction as e:
+            print(f"[ERROR] {e}")
+            self.halted = True
+            self.reason = "illegal instruction"
+        except MemoryFault:
+            self.halted = True
+            self.reason = "fault"
+            raise
+        finally:
+            self.pc = pc
+            self.pointer = pointer
+            self.steps += steps
+        return steps
+
+    def syscall(self, steps):
+        # ECALL, with `steps` retired so far in the current interpret() call; False on exit
+        return self.host.call(self, self.steps + steps)
 
+    def dump_memory(self, start=DUMP_START, end=DUMP_END):
+        return format_memory(self.memory.words(start, end))
+
+    def write_memory(self):
+        self.trace.write(format_memory(self.memory.dump(self.dump)))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate a RISC-V binary program",
+                                     epilog=f"Exits with status {LIMIT_EXIT} when --max-steps, --timeout or --detect-loops "
+                                            f"stops the program, {FAULT_EXIT} when it faults or runs an illegal "
+                                            "instruction, and with the guest's status when it calls exit (1 in place "
+                                            f"of {LIMIT_EXIT} or {FAULT_EXIT}; --status records the exact one).")
+    parser.add_argument("input", help="assembled program, as text lines or a packed image")
+    parser.add_argument("output", help="trace and memory dump")
+    parser.add_argument("--trace", choices=TRACE_MODES + ("delta",), default="full",
+                        help="which states to write (default: full); delta writes the binary delta format")
+    parser.add_argument("--every", type=int, default=1000, help="sampling interval for --trace sample")
+    parser.add_argument("--ring", type=int, default=1024, help="states kept for --trace ring")
+    parser.add_argument("--compression", choices=tuple(COMPRESSION),
+                        help="framing for --trace delta (default: from the output extension, .gz or .xz)")
+    parser.add_argument("--memory-size", type=lambda v: int(v, 0), default=ADDRESS_SPACE,
+                        help="guest memory size in bytes; accesses beyond it fault (default: 4 GiB)")
+    parser.add_argument("--dump", type=parse_range, action="append", metavar="START:END|START+LENGTH|all",
+                        help="memory to dump after the trace, repeatable; all dumps every non-zero word "
+                             f"(default: 0x{DUMP_START:08X}:0x{DUMP_END:08X})")
+    parser.add_argument("--watch", type=parse_watch, action="append", default=[],
+                        metavar="r|w|rw:START[:END|+LENGTH][=VALUE][@stop|snapshot|log]",
+                        help="watch accesses to memory, repeatable; a hit stops the run (default), writes a "
+                             "snapshot to --checkpoint-dir (default: .) or logs a line to a text trace")
+    parser.add_argument("--profile", metavar="REPORT",
+                        help="count instructions per class and PC and write a hot-spot report here ('-' for stdout)")
+    parser.add_argument("--profile-source", metavar="SOURCE", help="assembly source to annotate the report with")
+    parser.add_argument("--profile-interval", type=int, default=100_000,
+                        help="instructions per host wall-time sample (default: 100000)")
+    parser.add_argument("--timing", metavar="REPORT",
+                        help="estimate cycles with the pipeline and cache model and write a report here ('-' for stdout)")
+    parser.add_argument("--icache", type=parse_cache, default="4096:2:32", metavar="SIZE:WAYS:LINE",
+                        help="instruction cache for --timing (default: 4096:2:32)")
+    parser.add_argument("--dcache", type=parse_cache, default="4096:2:32", metavar="SIZE:WAYS:LINE",
+                        help="data cache for --timing (default: 4096:2:32)")
+    parser.add_argument("--predictor", choices=tuple(PREDICTORS), default="2bit",
+                        help="branch predictor for --timing (default: 2bit)")
+    parser.add_argument("--miss-penalty", type=int, default=20, help="cycles per cache miss for --timing (default: 20)")
+    parser.add_argument("--checkpoint-dir", metavar="DIR",
+                        help="write a snapshot here every --checkpoint-every instructions and at --stop-at")
+    parser.add_argument("--checkpoint-every", type=int, default=1_000_000,
+                        help="instructions between snapshots (default: 1000000)")
+    parser.add_argument("--resume", metavar="SNAPSHOT", help="start from a snapshot of the same program")
+    parser.add_argument("--stop-at", type=int, metavar="STEP",
+                        help="pause once this many instructions have retired, counted from the start of the program")
+    parser.add_argument("--blocks", action="store_true",
+                        help="run hot code as compiled basic blocks (used with --trace final)")
+    parser.add_argument("--stdin", metavar="PATH", help="file the guest reads as fd 0 (default: this stdin)")
+    parser.add_argument("--stdout", metavar="PATH", help="file the guest writes as fd 1 (default: this stdout)")
+    parser.add_argument("--allow-files", action="store_true",
+                        help="let the guest open, create and truncate host files (default: openat fails)")
+    parser.add_argument("--max-steps", type=int, metavar="N", help="stop after this many instructions")
+    parser.add_argument("--timeout", type=float, metavar="SECONDS", help="stop after this many seconds")
+    parser.add_argument("--detect-loops", type=int, nargs="?", const=LOOP_CHECK, metavar="N",
+                        help="stop once the state (PC, registers, memory) repeats, checked every N instructions "
+                             f"(default: {LOOP_CHECK})")
+    parser.add_argument("--status", metavar="PATH",
+                        help="write why the run ended, with its steps and PC, here as JSON ('-' for stdout)")
+    parser.add_argument("--sample-every", type=int, metavar="N",
+                        help="sampled run: fast-forward between detailed windows opening every N instructions")
+    parser.add_argument("--sample-window", type=int, default=10_000,
+                        help="instructions per detailed window, traced and timed (default: 10000)")
+    parser.add_argument("--sample-at", type=parse_points, action="append", default=[], metavar="STEP[:WEIGHT],...",
+                        help="open detailed windows at these steps, repeatable; weights (e.g. from --simpoints) "
+                             "weight the cycle estimate")
+    parser.add_argument("--sample-pc", type=lambda v: int(v, 0), action="append", default=[], metavar="PC",
+                        help="open a detailed window the first time this PC is reached, repeatable")
+    parser.add_argument("--bbv", metavar="PATH", help="write basic-block vectors of the fast-forwarded code here")
+    parser.add_argument("--bbv-interval", type=int, default=1_000_000,
+                        help="instructions per basic-block vector (default: 1000000)")
+    parser.add_argument("--simpoints", type=int, metavar="K", help="pick K representative intervals from the vectors")
+    parser.add_argument("--sample-report", metavar="REPORT", help="write the sampled run's report here (default with --simpoints: stdout)")
+    return parser.parse_args(argv)
+
+
+def sampling(args):
+    # Whether any option asks for a sampled run
+    return bool(args.sample_every or args.sample_at or args.sample_pc or args.bbv or args.simpoints
+                or args.sample_report)
+
+
+def dump_ranges(ranges):
+    # --dump values: the default window if none were given, None if any was "all"
+    if not ranges:
+        return DUMP_RANGES
+    if None in ranges:
+        return None
+    return tuple(ranges)
+
+
+def open_trace(path, mode="full", every=1000, ring=1024, compression=None, dump=DUMP_RANGES):
+    # `dump` (see dump_ranges()) is kept in delta traces, so they convert back to the same text
+    if mode == "delta":
+        return DeltaTraceWriter(path, compression, dump)
+    return TraceWriter(path, mode, every=every, ring_size=ring)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if sampling(args) and args.checkpoint_dir:
+        print("[ERROR] Sampled runs cannot write checkpoints")
+        sys.exit(1)
+    if args.trace == "delta" and any(watchpoint.action == "log" for watchpoint in args.watch):
+        print("[ERROR] Watchpoints with @log need a text trace, not --trace delta")
+        sys.exit(1)
+    dump = dump_ranges(args.dump)
+    trace = open_trace(args.output, args.trace, args.every, args.ring, args.compression, dump)
+    with trace, contextlib.ExitStack() as streams:
+        host = Host(streams.enter_context(open(args.stdin, "rb")) if args.stdin else None,
+                    streams.enter_context(open(args.stdout, "wb")) if args.stdout else None,
+                    files=args.allow_files)
+        streams.callback(host.close_files)
+        profiler = Profiler(args.profile_interval) if args.profile else None
+        timing = None
+        if args.timing:
+            timing = TimingModel(args.icache, args.dcache, PREDICTORS[args.predictor](), args.miss_penalty)
+        watcher = None
+        if args.watch:
+            watcher = Watcher(args.watch, directory=args.checkpoint_dir or ".")
+        sim = Simulator(trace, blocks=args.blocks, memory_size=args.memory_size, profiler=profiler, timing=timing,
+                        watcher=watcher, dump=dump, host=host)
+        sim.load(args.input)
+        if args.resume:
+            try:
+                sim.restore(read_snapshot(args.resume, sim.program))
+            except ValueError as e:
+                print(f"[ERROR] {e}")
+                sys.exit(1)
+        runner = sim
+        if args.checkpoint_dir:
+            runner = TimeMachine(sim, args.checkpoint_every, directory=args.checkpoint_dir, keep=1)
+        elif sampling(args):
+            try:
+                runner = Sampler(sim, args.sample_every, args.sample_window,
+                                 [point for points in args.sample_at for point in points], args.sample_pc,
+                                 args.bbv_interval if args.bbv or args.simpoints else None)
+            except ValueError as e:
+                print(f"[ERROR] {e}")
+                sys.exit(1)
+        try:
+            limits = Limits(sim, args.max_steps, args.timeout, args.detect_loops, runner)
+        except ValueError as e:
+            print(f"[ERROR] {e}")
+            sys.exit(1)
+        try:
+            limits.run(None if args.stop_at is None else max(args.stop_at - sim.steps, 0))
+        except MemoryFault as e:
+            print(f"[ERROR] {e}")
+        if limits.termination.reason in LIMITS:
+            print(f"[STOP] {format_termination(limits.termination)}")
+        if watcher is not None and watcher.stopped is not None:
+            print(f"[WATCH] {format_hit(watcher.stopped)}", end="")
+        trace.flush_pending()
+        sim.write_memory()
+        if args.checkpoint_dir and not sim.halted:
+            # Paused by --stop-at or a limit: keep where it got to
+            write_snapshot(os.path.join(args.checkpoint_dir, f"step-{sim.steps}.snap"), sim.snapshot(),
+                           runner.digest or 0)
+    if profiler is not None:
+        write_profile(args.profile, profiler, sim.symbols, args.profile_source)
+    if timing is not None:
+        write_report(args.timing, timing.report())
+    if args.status:
+        write_report(args.status, json.dumps(limits.termination._asdict()) + "\n")
+    if isinstance(runner, Sampler):
+        if args.bbv:
+            runner.write_vectors(args.bbv)
+        if args.sample_report or args.simpoints:
+            write_report(args.sample_report or "-", runner.report(args.simpoints))
+    status = exit_status(limits.termination.reason, sim.exit_code)
+    if status:
+        sys.exit(status)  # as client.py does
+
+
+def write_profile(path, profiler, symbols, source=None):
+    source_map = {}
+    if source is not None:
+        from assembler.assembler import Assembler
+        assembler = Assembler()
+        with open(source) as f:
+            assembler.lines(f.read())
+        source_map = assembler.source_map
+        symbols = symbols or assembler.labels
+    write_report(path, profiler.report(source_map=source_map, symbols=symbols))
+
+
+def write_report(path, report):
+    if path == "-":
+        sys.stdout.write(report)
     else:
-        print(f"[ERROR] Unsupported opcode: {opcode:07b}")
-        break
-    reg[0] = 0
-    write_state()  # write memory state
-write_memory()
+        with open(path, "w") as f:
+            f.write(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+import errno
+import io
+import os
+import sys
+
+from .memory import PAGE_SIZE, MemoryFault
+
+# ECALL as in the RISC-V Linux ABI: the call number in a7, arguments in a0-a5, the result in a0,
+# a negative errno on failure. Numbers are Linux's where Linux has the call.
+OPENAT = 56
+CLOSE = 57
+READ = 63
+WRITE = 64
+EXIT = 93
+EXIT_GROUP = 94
+# Not in Linux: the 64-bit instructions retired before the ECALL, or the cycles the timing
+# model counted (the same number without one), in a0 (low half) and a1 (high half)
+INSTRET = 500
+CYCLES = 501
+
+A0, A1, A2, A3, A7 = 10, 11, 12, 13, 17
+AT_FDCWD = -100
+MAX_PATH = 4096
+STREAMS = {0: "stdin", 1: "stdout", 2: "stderr"}  # this process's streams behind fds 0-2 by default
+
+# Linux open() flags -> host os.open() flags
+O_ACCMODE = 0o3
+OPEN_FLAGS = {0o100: os.O_CREAT, 0o200: os.O_EXCL, 0o1000: os.O_TRUNC, 0o2000: os.O_APPEND}
+ACCESS = {0: (os.O_RDONLY, "rb"), 1: (os.O_WRONLY, "wb"), 2: (os.O_RDWR, "r+b")}
+
+
+def signed(value):
+    return value - (1 << 32) if value & 0x80000000 else value
+
+
+class Host:
+    # Host side of ECALL (see Simulator.syscall). Guest file descriptors 0, 1 and 2 are `stdin`,
+    # `stdout` and `stderr` (binary file objects, by default this process's own; an output
+    # stream may also be a text one, which gets what the guest writes decoded as UTF-8). Guest
+    # code only opens host files with files=True, since openat can then create or truncate any
+    # path the process can; they take the lowest free numbers above 2. Otherwise openat fails
+    # with EACCES, so the guest only has the streams it was given.
+    #   host = Host(stdin=open("input.bin", "rb"), stdout=open("output.bin", "wb"), files=True)
+    #   sim = Simulator(host=host)
+    # read and write copy between the host buffers and the guest's page buffers directly, one
+    # page at a time (see Memory.read_into() and write_from()).
+    def __init__(self, stdin=None, stdout=None, stderr=None, files=False):
+        self.streams = {0: stdin, 1: stdout, 2: stderr}
+        self.files = files
+        self.opened = {}  # fd -> host file the guest opened
+        self.calls = 0  # ECALLs so far, part of the state limits.Limits compares
+        self.written = []  # (addr, length) of guest memory the last call wrote, for checkpoint.Journal
+        self.handlers = {READ: self.read, WRITE: self.write, OPENAT: self.openat, CLOSE: self.close,
+                         EXIT: self.exit, EXIT_GROUP: self.exit, INSTRET: self.instret, CYCLES: self.cycles}
+
+    def call(self, sim, instret):
+        # Runs the call in a7 for `sim`, with `instret` instructions retired before it; returns
+        # False if the program exited
+        self.calls += 1
+        self.written = []
+        reg = sim.reg
+        handler = self.handlers.get(reg[A7])
+        if handler is None:
+            reg[A0] = -errno.ENOSYS & 0xFFFFFFFF
+            return True
+        try:
+            result = handler(sim, reg, instret)
+        except MemoryFault:
+            result = -errno.EFAULT
+        except OSError as e:
+            result = -(e.errno or errno.EIO)
+        if result is None:
+            return False
+        reg[A0] = result & 0xFFFFFFFF
+        return True
+
+    def stream(self, fd):
+        # (host file object, whether it is this process's own stream) behind a guest fd
+        if fd in self.opened:
+            return self.opened[fd], False
+        if fd not in self.streams:
+            raise OSError(errno.EBADF, "Bad file descriptor")
+        stream = self.streams[fd]
+        if stream is not None:
+            return stream, False
+        # Looked up per call, so redirections of sys.stdout still apply; text already written
+        # to it goes first
+        stream = getattr(sys, STREAMS[fd])
+        stream.flush()
+        return getattr(stream, "buffer", stream), True
+
+    def read(self, sim, reg, instret):
+        stream, _ = self.stream(reg[A0])
+        addr = reg[A1]
+        count = sim.memory.write_from(addr, reg[A2], stream.readinto)
+        if count:
+            self.written.append((addr, count))
+        on_store = getattr(sim.trace, "store", None)  # traces that log memory writes
+        if on_store is not None and count:
+            for word, value in sim.memory.words(addr, addr + count):
+                on_store(word, value)
+        return count
+
+    def write(self, sim, reg, instret):
+        stream, own = self.stream(reg[A0])
+        if isinstance(stream, io.TextIOBase):
+            # A text stream with no binary buffer beneath it, e.g. sys.stdout replaced by a
+            # StringIO: the bytes are decoded as a whole, so no character is split
+            stream.write(sim.memory.read_bytes(reg[A1], reg[A2]).decode(errors="replace"))
+        else:
+            def write_all(view):
+                while view:
+                    written = stream.write(view)
+                    view = view[len(view) if written is None else written:]
+
+            sim.memory.read_into(reg[A1], reg[A2], write_all)
+        if own:
+            stream.flush()  # in order with the simulator's own messages
+        return reg[A2]
+
+    def openat(self, sim, reg, instret):
+        if not self.files:
+            return -errno.EACCES
+        path = self.string(sim.memory, reg[A1])
+        if path is None:
+            return -errno.ENAMETOOLONG
+        if signed(reg[A0]) != AT_FDCWD and not path.startswith(b"/"):
+            return -errno.EBADF  # no directory descriptors
+        flags = reg[A2]
+        access, mode = ACCESS.get(flags & O_ACCMODE, (None, None))
+        if access is None:
+            return -errno.EINVAL
+        for bit, host_flag in OPEN_FLAGS.items():
+            if flags & bit:
+                access |= host_flag
+        fd = os.open(path, access, reg[A3] or 0o666)
+        guest = 3
+        while guest in self.opened or guest in self.streams:
+            guest += 1
+        self.opened[guest] = open(fd, mode, buffering=0)
+        return guest
+
+    def close(self, sim, reg, instret):
+        fd = reg[A0]
+        if fd in self.opened:
+            self.opened.pop(fd).close()
+        elif fd in self.streams:
+            self.streams.pop(fd)  # the guest is done with it; the host stream stays open
+        else:
+            return -errno.EBADF
+        return 0
+
+    def exit(self, sim, reg, instret):
+        sim.exit_code = signed(reg[A0])
+        return None
+
+    def instret(self, sim, reg, instret):
+        reg[A1] = (instret >> 32) & 0xFFFFFFFF
+        return instret
+
+    def cycles(self, sim, reg, instret):
+        cycles = sim.timing.cycles if sim.timing is not None else instret
+        reg[A1] = (cycles >> 32) & 0xFFFFFFFF
+        return cycles
+
+    def string(self, memory, addr):
+        # NUL-terminated bytes at addr, read to the end of a page at a time; None if longer than
+        # MAX_PATH
+        data = b""
+        while len(data) < MAX_PATH:
+            chunk = memory.read_bytes(addr, min(MAX_PATH - len(data), PAGE_SIZE - (addr & (PAGE_SIZE - 1))))
+            end = chunk.find(b"\0")
+            if end >= 0:
+                return data + chunk[:end]
+            data += chunk
+            addr += len(chunk)
+        return None
+
+    def flush(self):
+        for stream in list(self.opened.values()) + list(self.streams.values()):
+            if stream is not None and hasattr(stream, "flush"):
+                stream.flush()
+
+    def close_files(self):
+        for stream in self.opened.values():
+            stream.close()
+        self.opened.clear()
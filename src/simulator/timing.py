@@ -0,0 +1,198 @@
+import time
+
+from .profiler import MEMORY_OPS
+
+# Source registers each opcode reads, for load-use hazards
+READS_RS1_RS2 = (0b0110011, 0b0100011, 0b1100011)  # R-type, stores, B-type
+READS_RS1 = (0b0010011, 0b0000011, 0b1100111)  # I-type, loads, JALR
+LOAD = 0b0000011
+BRANCH = 0b1100011
+JAL = 0b1101111
+JALR = 0b1100111
+
+
+class Cache:
+    # Set-associative cache with LRU replacement; only hits and misses are modelled.
+    # Each set is a list of tags, least recently used first.
+    def __init__(self, size=4096, ways=2, line_size=32):
+        for name, value in (("size", size), ("ways", ways), ("line size", line_size)):
+            if value <= 0 or value & (value - 1):
+                raise ValueError(f"Cache {name} must be a power of two, got {value}")
+        if size < ways * line_size:
+            raise ValueError(f"A {size}-byte cache cannot hold {ways} ways of {line_size}-byte lines")
+        self.size = size
+        self.ways = ways
+        self.line_size = line_size
+        self.line_bits = line_size.bit_length() - 1
+        self.set_mask = size // (ways * line_size) - 1
+        self.sets = [[] for _ in range(self.set_mask + 1)]
+        self.hits = 0
+        self.misses = 0
+
+    def access(self, addr):
+        # True on a hit; a miss fills the line, evicting the least recently used one
+        line = addr >> self.line_bits
+        tags = self.sets[line & self.set_mask]
+        if line in tags:
+            if tags[-1] != line:
+                tags.remove(line)
+                tags.append(line)
+            self.hits += 1
+            return True
+        tags.append(line)
+        if len(tags) > self.ways:
+            del tags[0]
+        self.misses += 1
+        return False
+
+    def describe(self):
+        return f"{self.size} B, {self.ways}-way, {self.line_size} B lines"
+
+
+def parse_cache(spec):
+    # "SIZE:WAYS:LINE", e.g. "4096:2:32"
+    try:
+        size, ways, line_size = (int(part, 0) for part in spec.split(":"))
+    except ValueError:
+        raise ValueError(f"Cache spec must be SIZE:WAYS:LINE, got {spec!r}")
+    return Cache(size, ways, line_size)
+
+
+class StaticPredictor:
+    # Backward taken, forward not taken
+    name = "static"
+
+    def predict(self, pc, imm):
+        return imm < 0
+
+    def update(self, pc, taken):
+        pass
+
+
+class TwoBitPredictor:
+    # Table of 2-bit saturating counters indexed by PC; 2 and 3 predict taken
+    name = "2bit"
+
+    def __init__(self, entries=1024):
+        self.mask = entries - 1
+        self.counters = bytearray([1]) * entries
+
+    def index(self, pc):
+        return (pc >> 2) & self.mask
+
+    def predict(self, pc, imm):
+        return self.counters[self.index(pc)] >= 2
+
+    def update(self, pc, taken):
+        i = self.index(pc)
+        counter = self.counters[i]
+        self.counters[i] = min(counter + 1, 3) if taken else max(counter - 1, 0)
+
+
+class GsharePredictor(TwoBitPredictor):
+    # 2-bit counters indexed by PC xor the global history of branch outcomes
+    name = "gshare"
+
+    def __init__(self, entries=1024, history_bits=10):
+        super().__init__(entries)
+        self.history = 0
+        self.history_mask = (1 << history_bits) - 1
+
+    def index(self, pc):
+        return ((pc >> 2) ^ self.history) & self.mask
+
+    def update(self, pc, taken):
+        super().update(pc, taken)
+        self.history = ((self.history << 1) | taken) & self.history_mask
+
+
+PREDICTORS = {"static": StaticPredictor, "2bit": TwoBitPredictor, "gshare": GsharePredictor}
+
+
+class TimingModel:
+    # Cycle estimate for a classic in-order 5-stage pipeline (IF ID EX MEM WB) with full
+    # forwarding, attached like the profiler:
+    #   sim.timing = TimingModel(predictor=GsharePredictor())
+    #   sim.run()
+    #   print(sim.timing.report())
+    # Every instruction takes one cycle once the pipeline is full, plus:
+    #   a load-use stall when an instruction reads the register the previous load wrote,
+    #   branch_penalty cycles for a mispredicted branch (resolved in EX),
+    #   jump_penalty cycles for JAL (target known in ID) and branch_penalty for JALR,
+    #   miss_penalty cycles per instruction or data cache miss.
+    # Simulator.instrumented() steps the interpreter one record at a time and passes each retired
+    # one to retire(), alongside the profiler if one is attached too.
+    def __init__(self, icache=None, dcache=None, predictor=None, miss_penalty=20, branch_penalty=2,
+                 jump_penalty=1):
+        self.icache = icache or Cache()
+        self.dcache = dcache or Cache()
+        self.predictor = predictor or StaticPredictor()
+        self.miss_penalty = miss_penalty
+        self.branch_penalty = branch_penalty
+        self.jump_penalty = jump_penalty
+        self.instructions = 0
+        self.cycles = 4  # pipeline fill before the first instruction retires
+        self.load_use = 0
+        self.branches = 0
+        self.mispredicts = 0
+        self.jumps = 0
+        self.jump_stalls = 0
+        self.wall = 0.0
+        self.started = 0.0
+        self.loaded = 0  # destination of the previous instruction if it was a load, else 0
+
+    def begin(self):
+        self.started = time.perf_counter()
+
+    def retire(self, sim, pc, ins, addr):
+        # Cycles of one retired record at `pc`; `addr` is the address a load or store accessed.
+        # The count is kept up to date per instruction, so an ECALL reading it sees every cycle
+        # before it.
+        opcode, rd, rs1, rs2, funct3, funct7, imm = ins
+        cycles = 1 if self.icache.access(pc) else 1 + self.miss_penalty
+        loaded = self.loaded
+        if loaded:
+            if (opcode in READS_RS1 and rs1 == loaded) or (opcode in READS_RS1_RS2 and loaded in (rs1, rs2)):
+                cycles += 1
+                self.load_use += 1
+            self.loaded = 0
+        if opcode in MEMORY_OPS:
+            if not self.dcache.access(addr):
+                cycles += self.miss_penalty
+            if opcode == LOAD:
+                self.loaded = rd
+        elif opcode == BRANCH:
+            taken = sim.pc != pc + 4
+            self.branches += 1
+            if self.predictor.predict(pc, imm) != taken:
+                self.mispredicts += 1
+                cycles += self.branch_penalty
+            self.predictor.update(pc, taken)
+        elif opcode == JAL or opcode == JALR:
+            penalty = self.jump_penalty if opcode == JAL else self.branch_penalty
+            self.jumps += 1
+            self.jump_stalls += penalty
+            cycles += penalty
+        self.cycles += cycles
+        self.instructions += 1
+
+    def end(self):
+        self.wall += time.perf_counter() - self.started
+
+    def report(self):
+        instructions = self.instructions or 1
+        lines = [f"instructions {self.instructions}, cycles {self.cycles}, CPI {self.cycles / instructions:.3f}"]
+        for name, cache in (("icache", self.icache), ("dcache", self.dcache)):
+            accesses = cache.hits + cache.misses
+            rate = 100 * cache.hits / accesses if accesses else 0.0
+            lines.append(f"{name} ({cache.describe()}): {cache.hits} hits, {cache.misses} misses, "
+                         f"{rate:.2f}% hit rate")
+        rate = 100 * self.mispredicts / self.branches if self.branches else 0.0
+        lines.append(f"branches ({self.predictor.name}): {self.branches}, {self.mispredicts} mispredicted "
+                     f"({rate:.2f}%)")
+        lines.append(f"stall cycles: load-use {self.load_use}, "
+                     f"branch {self.mispredicts * self.branch_penalty}, "
+                     f"jump {self.jump_stalls}, "
+                     f"cache miss {(self.icache.misses + self.dcache.misses) * self.miss_penalty}")
+        lines.append(f"simulated in {self.wall:.3f} s")
+        return "\n".join(lines) + "\n"
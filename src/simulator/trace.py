@@ -0,0 +1,101 @@
+import io
+from collections import deque
+
+TRACE_MODES = ("full", "sample", "changed", "final", "ring")
+
+# PC followed by the 32 registers, each as 0b + 32 binary digits and a trailing space
+STATE_LINE = "0b{:032b} " * 33 + "\n"
+
+
+def format_state(pc, reg):
+    return STATE_LINE.format(pc, *reg)
+
+
+def format_memory(words):
+    # Memory dump lines from (addr, value) pairs
+    return "".join(f"0x{addr:08X}:0b{value:032b}\n" for addr, value in words)
+
+
+class TraceWriter:
+    # Keeps the trace file open for the whole run and batches writes through one large buffer.
+    #   full    - every retired instruction (the original trace format)
+    #   sample  - every `every`-th retired instruction
+    #   changed - PC plus only the registers that changed, as xN:0b... fields
+    #   final   - only the last state
+    #   ring    - the last `ring_size` states, written only when the writer is closed (halt or error)
+    # `path` may also be an open text stream; with None the trace is kept in memory (see getvalue()).
+    def __init__(self, path=None, mode="full", every=1, ring_size=1024, buffer_size=1 << 20):
+        if mode not in TRACE_MODES:
+            raise ValueError(f"Unknown trace mode: {mode}")
+        if every < 1 or ring_size < 1:
+            raise ValueError("Trace sampling interval and ring size must be positive")
+        self.mode = mode
+        self.every = every
+        if path is None:
+            self.f = io.StringIO()
+        elif hasattr(path, "write"):
+            self.f = path
+        else:
+            self.f = open(path, "w", buffering=buffer_size)
+        self._countdown = every
+        self._prev = None
+        self._last = None
+        self._ring = deque(maxlen=ring_size)
+        self.record = getattr(self, f"_record_{mode}")
+
+    @property
+    def per_step(self):
+        # Every mode but "final" needs to see each retired instruction
+        return self.mode != "final"
+
+    def _record_full(self, pc, reg):
+        self.f.write(STATE_LINE.format(pc, *reg))
+
+    def _record_sample(self, pc, reg):
+        self._countdown -= 1
+        if not self._countdown:
+            self._countdown = self.every
+            self.f.write(STATE_LINE.format(pc, *reg))
+
+    def _record_changed(self, pc, reg):
+        prev = self._prev
+        if prev is None:
+            changed = range(32)
+        else:
+            changed = [n for n in range(32) if reg[n] != prev[n]]
+        self.f.write(f"0b{pc:032b}" + "".join(f" x{n}:0b{reg[n]:032b}" for n in changed) + "\n")
+        self._prev = reg[:]
+
+    def _record_final(self, pc, reg):
+        self._last = (pc, reg)
+
+    def _record_ring(self, pc, reg):
+        self._ring.append((pc, tuple(reg)))
+
+    def write(self, text):
+        # Extra output (e.g. the memory dump) goes through the same buffer
+        self.f.write(text)
+
+    def flush_pending(self):
+        if self._last is not None:
+            self.f.write(format_state(*self._last))
+            self._last = None
+        while self._ring:
+            self.f.write(format_state(*self._ring.popleft()))
+
+    def getvalue(self):
+        self.flush_pending()
+        return self.f.getvalue()
+
+    def close(self):
+        if self.f.closed:
+            return
+        self.flush_pending()
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
@@ -0,0 +1,54 @@
+import argparse
+import os
+import sys
+
+if __package__ in (None, ""):
+    # Running as a script: make the packages under src/ importable
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from simulator.deltatrace import TraceReader, diff
+from simulator.trace import format_state
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect binary delta traces written with --trace delta")
+    commands = parser.add_subparsers(dest="command", required=True)
+    text = commands.add_parser("text", help="convert to the legacy text trace")
+    text.add_argument("trace")
+    text.add_argument("output")
+    state = commands.add_parser("state", help="print the full state after a step (0-based)")
+    state.add_argument("trace")
+    state.add_argument("step", type=int)
+    compare = commands.add_parser("diff", help="report the first divergent step and field")
+    compare.add_argument("a")
+    compare.add_argument("b")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == "text":
+        with open(args.output, "w", buffering=1 << 20) as out:
+            TraceReader(args.trace).to_text(out)
+    elif args.command == "state":
+        try:
+            pc, reg, memory = TraceReader(args.trace).state_at(args.step)
+        except IndexError as e:
+            print(f"[ERROR] {e}")
+            return 1
+        sys.stdout.write(format_state(pc, reg))
+        for addr, value in memory.items():
+            print(f"0x{addr:08X}:0x{value:08X}")
+    else:
+        result = diff(args.a, args.b)
+        if result is None:
+            print("traces are identical")
+            return 0
+        step, field, a, b = result
+        print(f"first divergence at step {step}: {field} {a!r} != {b!r}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,204 @@
+import os
+from collections import Counter, namedtuple
+
+from .checkpoint import capture, program_digest, write_snapshot
+from .isa import LOAD, LOADS, STORE, STORES
+from .memory import ADDRESS_SPACE, PAGE_BITS
+
+READ = 1
+WRITE = 2
+KINDS = {"r": READ, "w": WRITE, "rw": READ | WRITE}
+ACTIONS = ("stop", "snapshot", "log")
+
+# Watches the bytes [start, end) for the accesses in `kind` (READ, WRITE or both). With `value`
+# set, only an access that reads or writes exactly that (unsigned, access-sized) value counts.
+Watchpoint = namedtuple("Watchpoint", "start end kind value action")
+
+# One access that matched a watchpoint. `step` instructions had retired and the access at `pc`
+# had not yet happened, so the state seen by the actions is the one just before it.
+Hit = namedtuple("Hit", "step pc kind addr size value watchpoint")
+
+
+def parse_watch(spec):
+    # "KIND:START[:END|+LENGTH][=VALUE][@ACTION]", e.g. "w:0x10000+4=7@stop"; KIND is r, w or rw,
+    # the default length is one word and the default action is stop
+    text, _, action = spec.partition("@")
+    text, _, value = text.partition("=")
+    kind, _, where = text.partition(":")
+    action = action or "stop"
+    try:
+        if kind not in KINDS or action not in ACTIONS:
+            raise ValueError
+        if "+" in where:
+            start, length = (int(part, 0) for part in where.split("+"))
+            end = start + length
+        elif ":" in where:
+            start, end = (int(part, 0) for part in where.split(":"))
+        else:
+            start = int(where, 0)
+            end = start + 4
+        value = int(value, 0) & 0xFFFFFFFF if value else None
+    except ValueError:
+        raise ValueError(f"Watchpoint must be r|w|rw:START[:END|+LENGTH][=VALUE][@stop|snapshot|log], got {spec!r}")
+    if not 0 <= start < end <= ADDRESS_SPACE:
+        raise ValueError(f"Empty or out-of-range watchpoint: {spec!r}")
+    return Watchpoint(start, end, KINDS[kind], value, action)
+
+
+def format_hit(hit):
+    name = "read" if hit.kind == READ else "write"
+    return (f"watch {name} of {hit.size} byte(s) at 0x{hit.addr:08X} = 0x{hit.value:08X} "
+            f"by pc 0x{hit.pc:08X} after {hit.step} instructions\n")
+
+
+class WatchpointHit(Exception):
+    # Raised by a watched handler before its access; Watcher.run() catches it
+    def __init__(self, pc, matches):
+        super().__init__(f"Watchpoint hit at 0x{pc:08X}")
+        self.pc = pc
+        self.matches = matches  # [(watchpoint, kind, addr, size, value)]
+
+
+class Watcher:
+    # Opt-in read/write watchpoints. A Simulator with a watcher attached runs through
+    # Watcher.run(), which swaps in handlers that wrap each load and store with a check of
+    # `pages`, one byte per guest page holding the READ/WRITE bits of the watchpoints on it.
+    # An access costs a lookup of the pages of its first and last bytes (the same page unless
+    # it crosses a boundary); other instructions cost nothing.
+    # On a hit the run leaves the interpreter just before the access and the watchpoint's
+    # action runs: "stop" returns from run() (the next run() performs the access without
+    # reporting it again), "snapshot" keeps a snapshot (written to `directory` as
+    # watch-<steps>.snap if given, else appended to `snapshots`), "log" writes a line to the trace,
+    # which must be a text one (a DeltaTraceWriter drops text).
+    #   sim.watcher = Watcher([parse_watch("w:0x10000=7")])
+    #   sim.run()
+    #   sim.watcher.stopped    # Hit that stopped the run, or None
+    def __init__(self, watchpoints=(), directory=None):
+        self.watchpoints = []
+        self.pages = bytearray(ADDRESS_SPACE >> PAGE_BITS)
+        self.directory = directory
+        self.snapshots = []  # (steps, Snapshot) without a directory
+        self.counts = Counter()  # watchpoint -> hits
+        self.stopped = None
+        self.resume = None  # steps at which a stop left an access still to perform
+        self.source = None  # handler list the watched one was built from
+        self.watched = None
+        self.digest = None
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+        for watchpoint in watchpoints:
+            self.add(watchpoint)
+
+    def add(self, watchpoint):
+        self.watchpoints.append(watchpoint)
+        for number in range(watchpoint.start >> PAGE_BITS, ((watchpoint.end - 1) >> PAGE_BITS) + 1):
+            self.pages[number] |= watchpoint.kind
+        self.source = None
+
+    def matches(self, kind, addr, size, value):
+        return [(watchpoint, kind, addr, size, value) for watchpoint in self.watchpoints
+                if watchpoint.kind & kind and watchpoint.start < addr + size and addr < watchpoint.end
+                and (watchpoint.value is None or watchpoint.value == value)]
+
+    def wrap_load(self, handler, size):
+        pages = self.pages
+        matches = self.matches
+        last = size - 1
+
+        def watched(reg, memory, ins, pc, pointer):
+            addr = (reg[ins.rs1] + ins.imm) & 0xFFFFFFFF
+            if (pages[addr >> PAGE_BITS] | pages[((addr + last) & 0xFFFFFFFF) >> PAGE_BITS]) & READ:
+                found = matches(READ, addr, size, memory.load(addr, size))
+                if found:
+                    raise WatchpointHit(pc, found)
+            return handler(reg, memory, ins, pc, pointer)
+        return watched
+
+    def wrap_store(self, handler, size):
+        pages = self.pages
+        matches = self.matches
+        mask = (1 << (8 * size)) - 1
+        last = size - 1
+
+        def watched(reg, memory, ins, pc, pointer):
+            addr = (reg[ins.rs1] + ins.imm) & 0xFFFFFFFF
+            if (pages[addr >> PAGE_BITS] | pages[((addr + last) & 0xFFFFFFFF) >> PAGE_BITS]) & WRITE:
+                found = matches(WRITE, addr, size, reg[ins.rs2] & mask)
+                if found:
+                    raise WatchpointHit(pc, found)
+            return handler(reg, memory, ins, pc, pointer)
+        return watched
+
+    def handlers(self, sim):
+        # The simulator's handlers with every supported load and store wrapped, built once per program
+        if self.source is not sim.handlers:
+            watched = list(sim.handlers)
+            for i, ins in enumerate(sim.program):
+                if ins.opcode == LOAD and ins.funct3 in LOADS:
+                    watched[i] = self.wrap_load(watched[i], LOADS[ins.funct3][1])
+                elif ins.opcode == STORE and ins.funct3 in STORES:
+                    watched[i] = self.wrap_store(watched[i], STORES[ins.funct3][1])
+            self.source = sim.handlers
+            self.watched = watched
+        return self.watched
+
+    def run(self, sim, max_steps=None):
+        # Returns the number of retired instructions, as Simulator.run() does. Instructions go
+        # through Simulator.instrumented() when a profiler or timing model is attached, so they
+        # count every instruction, watched or not.
+        start = sim.steps
+        remaining = max_steps
+        self.stopped = None
+        execute = sim.interpret if sim.profiler is None and sim.timing is None else sim.instrumented
+        if self.resume == sim.steps and not sim.halted and remaining != 0:
+            execute(1)  # the access a stop left pending
+            if remaining is not None:
+                remaining -= 1
+        self.resume = None
+        handlers = sim.handlers
+        watched = self.handlers(sim)
+        while not sim.halted and remaining != 0:
+            before = sim.steps
+            sim.handlers = watched
+            try:
+                execute(remaining)
+                hit = None
+            except WatchpointHit as e:
+                hit = e
+            finally:
+                sim.handlers = handlers
+            if remaining is not None:
+                remaining -= sim.steps - before
+            if hit is None:
+                break
+            if self.handle(sim, hit):
+                self.resume = sim.steps
+                break
+            execute(1)  # the access itself, unwatched so it is not reported twice
+            if remaining is not None:
+                remaining -= 1
+        return sim.steps - start
+
+    def handle(self, sim, e):
+        # Runs the actions of the matched watchpoints; True if one of them stops the run
+        stop = False
+        for watchpoint, kind, addr, size, value in e.matches:
+            hit = Hit(sim.steps, e.pc, kind, addr, size, value, watchpoint)
+            self.counts[watchpoint] += 1
+            if watchpoint.action == "stop":
+                self.stopped = self.stopped or hit
+                stop = True
+            elif watchpoint.action == "snapshot":
+                self.snapshot(sim)
+            elif sim.trace is not None:
+                sim.trace.write(format_hit(hit))
+        return stop
+
+    def snapshot(self, sim):
+        snapshot = capture(sim)
+        if self.directory is None:
+            self.snapshots.append((sim.steps, snapshot))
+            return
+        if self.digest is None:
+            self.digest = program_digest(sim.program)
+        write_snapshot(os.path.join(self.directory, f"watch-{sim.steps}.snap"), snapshot, self.digest)
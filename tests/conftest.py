@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Make the packages under src/ importable, as the scripts and benchmarks do
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
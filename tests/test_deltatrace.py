@@ -0,0 +1,44 @@
+import io
+
+import pytest
+
+from assembler.assembler import Assembler
+from simulator.deltatrace import DeltaTraceWriter, TraceReader
+from simulator.simulator import Simulator
+from simulator.trace import TraceWriter
+
+SOURCE = """\
+addi a0, zero, 7
+sw a0, 0(zero)
+lui a1, 16
+sw a0, 64(a1)
+beq zero, zero, 0"""
+
+
+def run(trace, dump):
+    sim = Simulator(trace, dump=dump)
+    sim.load(Assembler().assemble(SOURCE))
+    sim.run()
+    sim.write_memory()
+    return trace
+
+
+@pytest.mark.parametrize("dump", [
+    pytest.param(((0x00010000, 0x00010080),), id="default"),
+    pytest.param(((0, 16), (0x10040, 0x10048)), id="ranges"),
+    pytest.param(None, id="all"),
+])
+def test_to_text_keeps_dump_ranges(tmp_path, dump):
+    expected = run(TraceWriter(), dump).getvalue()
+    path = tmp_path / "trace.rvtd"
+    run(DeltaTraceWriter(path, dump=dump), dump).close()
+    out = io.StringIO()
+    TraceReader(path).to_text(out)
+    assert out.getvalue() == expected
+
+
+def test_state_past_end(tmp_path):
+    path = tmp_path / "trace.rvtd"
+    run(DeltaTraceWriter(path), None).close()
+    with pytest.raises(IndexError, match="Trace has 5 states"):
+        TraceReader(path).state_at(5)
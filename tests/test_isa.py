@@ -0,0 +1,242 @@
+import pytest
+
+from assembler.assembler import Assembler
+from assembler.encoding import REGISTER
+from simulator.memory import MemoryFault
+from simulator.simulator import Simulator
+
+# One case per RV32IM mnemonic and its edge cases: each source is assembled, decoded and run to
+# the virtual halt appended to it, once by the interpreter and once as compiled blocks, and the
+# whole register file and the listed memory words are compared with hand-computed values.
+# Memory is 64 KiB, so FAULT is the first address past its end.
+MEMORY_SIZE = 1 << 16
+FAULT = MEMORY_SIZE
+HALT = "beq zero, zero, 0"
+INT_MIN = 0x80000000
+
+
+def case(name, source, regs=None, expect=None, memory=None, expect_memory=None):
+    # regs and expect map register names to values, memory and expect_memory addresses to words
+    return pytest.param(source, regs or {}, expect or {}, memory or {}, expect_memory or {}, id=name)
+
+
+def fault(name, source, regs=None, addr=FAULT, kind="load"):
+    return pytest.param(source, regs or {}, addr, kind, id=name)
+
+
+ARITHMETIC = [
+    case("add", "add a0, a1, a2", {"a1": 5, "a2": 7}, {"a0": 12}),
+    case("add-wraps", "add a0, a1, a2", {"a1": 0xFFFFFFFF, "a2": 2}, {"a0": 1}),
+    case("sub", "sub a0, a1, a2", {"a1": 3, "a2": 5}, {"a0": 0xFFFFFFFE}),
+    case("sll", "sll a0, a1, a2", {"a1": 1, "a2": 31}, {"a0": INT_MIN}),
+    case("sll-low-five-bits", "sll a0, a1, a2", {"a1": 1, "a2": 33}, {"a0": 2}),
+    case("slt-negative", "slt a0, a1, a2", {"a1": 0xFFFFFFFF, "a2": 1}, {"a0": 1}),
+    case("slt-positive", "slt a0, a1, a2", {"a1": 1, "a2": 0xFFFFFFFF}, {"a0": 0}),
+    case("slt-equal", "slt a0, a1, a2", {"a1": 7, "a2": 7}, {"a0": 0}),
+    case("sltu-large", "sltu a0, a1, a2", {"a1": 0xFFFFFFFF, "a2": 1}, {"a0": 0}),
+    case("sltu-small", "sltu a0, a1, a2", {"a1": 1, "a2": 0xFFFFFFFF}, {"a0": 1}),
+    case("xor", "xor a0, a1, a2", {"a1": 0xF0F0, "a2": 0xFF00}, {"a0": 0x0FF0}),
+    case("srl", "srl a0, a1, a2", {"a1": INT_MIN, "a2": 4}, {"a0": 0x08000000}),
+    case("sra-negative", "sra a0, a1, a2", {"a1": INT_MIN, "a2": 4}, {"a0": 0xF8000000}),
+    case("sra-positive", "sra a0, a1, a2", {"a1": 0x40000000, "a2": 4}, {"a0": 0x04000000}),
+    case("sra-all-ones", "sra a0, a1, a2", {"a1": 0xFFFFFFFF, "a2": 31}, {"a0": 0xFFFFFFFF}),
+    case("or", "or a0, a1, a2", {"a1": 0xF0F0, "a2": 0xFF00}, {"a0": 0xFFF0}),
+    case("and", "and a0, a1, a2", {"a1": 0xF0F0, "a2": 0xFF00}, {"a0": 0xF000}),
+    case("mul", "mul a0, a1, a2", {"a1": 7, "a2": 6}, {"a0": 42}),
+    case("mul-low-half", "mul a0, a1, a2", {"a1": 0xFFFFFFFF, "a2": 0xFFFFFFFF}, {"a0": 1}),
+    case("mulh", "mulh a0, a1, a2", {"a1": INT_MIN, "a2": INT_MIN}, {"a0": 0x40000000}),
+    case("mulh-negative", "mulh a0, a1, a2", {"a1": 0xFFFFFFFE, "a2": 3}, {"a0": 0xFFFFFFFF}),
+    case("mulhsu", "mulhsu a0, a1, a2", {"a1": 0xFFFFFFFF, "a2": 0xFFFFFFFF}, {"a0": 0xFFFFFFFF}),
+    case("mulhsu-positive", "mulhsu a0, a1, a2", {"a1": 2, "a2": INT_MIN}, {"a0": 1}),
+    case("mulhu", "mulhu a0, a1, a2", {"a1": 0xFFFFFFFF, "a2": 0xFFFFFFFF}, {"a0": 0xFFFFFFFE}),
+    case("div", "div a0, a1, a2", {"a1": 0xFFFFFFF9, "a2": 2}, {"a0": 0xFFFFFFFD}),
+    case("div-negative-divisor", "div a0, a1, a2", {"a1": 7, "a2": 0xFFFFFFFE}, {"a0": 0xFFFFFFFD}),
+    case("div-by-zero", "div a0, a1, a2", {"a1": 7, "a2": 0}, {"a0": 0xFFFFFFFF}),
+    case("div-overflow", "div a0, a1, a2", {"a1": INT_MIN, "a2": 0xFFFFFFFF}, {"a0": INT_MIN}),
+    case("divu", "divu a0, a1, a2", {"a1": 0xFFFFFFFE, "a2": 2}, {"a0": 0x7FFFFFFF}),
+    case("divu-by-zero", "divu a0, a1, a2", {"a1": 7, "a2": 0}, {"a0": 0xFFFFFFFF}),
+    case("rem", "rem a0, a1, a2", {"a1": 0xFFFFFFF9, "a2": 2}, {"a0": 0xFFFFFFFF}),
+    case("rem-negative-divisor", "rem a0, a1, a2", {"a1": 7, "a2": 0xFFFFFFFE}, {"a0": 1}),
+    case("rem-by-zero", "rem a0, a1, a2", {"a1": 0xFFFFFFF9, "a2": 0}, {"a0": 0xFFFFFFF9}),
+    case("rem-overflow", "rem a0, a1, a2", {"a1": INT_MIN, "a2": 0xFFFFFFFF}, {"a0": 0}),
+    case("remu", "remu a0, a1, a2", {"a1": 7, "a2": 3}, {"a0": 1}),
+    case("remu-by-zero", "remu a0, a1, a2", {"a1": 0xFFFFFFF9, "a2": 0}, {"a0": 0xFFFFFFF9}),
+    case("rd-same-as-source", "sub a1, a1, a1", {"a1": 9}, {"a1": 0}),
+    case("write-to-zero", "add zero, a1, a2", {"a1": 5, "a2": 7}),
+]
+
+IMMEDIATES = [
+    case("addi", "addi a0, a1, 5", {"a1": 7}, {"a0": 12}),
+    case("addi-negative", "addi a0, a1, -1", {"a1": 0}, {"a0": 0xFFFFFFFF}),
+    case("addi-to-zero", "addi zero, zero, 5"),
+    case("slti", "slti a0, a1, -1", {"a1": 0xFFFFFFFE}, {"a0": 1}),
+    case("slti-false", "slti a0, a1, -1", {"a1": 0}, {"a0": 0}),
+    case("sltiu-sign-extended", "sltiu a0, a1, -1", {"a1": 5}, {"a0": 1}),
+    case("sltiu-false", "sltiu a0, a1, 5", {"a1": 0xFFFFFFFF}, {"a0": 0}),
+    case("xori", "xori a0, a1, -1", {"a1": 0x0F0F0F0F}, {"a0": 0xF0F0F0F0}),
+    case("ori", "ori a0, a1, -2048", {"a1": 1}, {"a0": 0xFFFFF801}),
+    case("andi", "andi a0, a1, 255", {"a1": 0x12345678}, {"a0": 0x78}),
+    case("andi-sign-extended", "andi a0, a1, -16", {"a1": 0x12345678}, {"a0": 0x12345670}),
+    case("slli", "slli a0, a1, 31", {"a1": 3}, {"a0": INT_MIN}),
+    case("srli", "srli a0, a1, 31", {"a1": INT_MIN}, {"a0": 1}),
+    case("srai", "srai a0, a1, 31", {"a1": INT_MIN}, {"a0": 0xFFFFFFFF}),
+    case("srai-positive", "srai a0, a1, 30", {"a1": 0x7FFFFFFF}, {"a0": 1}),
+    case("srai-zero", "srai a0, a1, 0", {"a1": 0x80000001}, {"a0": 0x80000001}),
+    case("lui", "lui a0, 74565", expect={"a0": 0x12345000}),
+    case("lui-negative", "lui a0, -1", expect={"a0": 0xFFFFF000}),
+    case("auipc", "fence\nauipc a0, 1", expect={"a0": 0x1004}),
+    case("auipc-negative", "fence\nauipc a0, -1", expect={"a0": 0xFFFFF004}),
+    case("fence", "fence", {"a0": 3}, {"a0": 3}),
+]
+
+# Bytes 0x100-0x107: 7F FF 80 81 12 00 00 00
+BYTES = {0x100: 0x8180FF7F, 0x104: 0x00000012}
+# Words either side of the page boundary at 0x1000: bytes 0xFFC-0x1003 are DD CC BB AA 44 33 22 11
+BOUNDARY = {0xFFC: 0xAABBCCDD, 0x1000: 0x11223344}
+
+LOADS = [
+    case("lb", "lb a0, 0(a1)", {"a1": 0x100}, {"a0": 0x7F}, BYTES),
+    case("lb-sign-extends", "lb a0, 1(a1)", {"a1": 0x100}, {"a0": 0xFFFFFFFF}, BYTES),
+    case("lb-high-bit", "lb a0, 2(a1)", {"a1": 0x100}, {"a0": 0xFFFFFF80}, BYTES),
+    case("lbu", "lbu a0, 1(a1)", {"a1": 0x100}, {"a0": 0xFF}, BYTES),
+    case("lh-sign-extends", "lh a0, 0(a1)", {"a1": 0x100}, {"a0": 0xFFFFFF7F}, BYTES),
+    case("lh-upper-half", "lh a0, 2(a1)", {"a1": 0x100}, {"a0": 0xFFFF8180}, BYTES),
+    case("lh-positive", "lh a0, 4(a1)", {"a1": 0x100}, {"a0": 0x12}, BYTES),
+    case("lh-misaligned", "lh a0, 3(a1)", {"a1": 0x100}, {"a0": 0x1281}, BYTES),
+    case("lhu", "lhu a0, 2(a1)", {"a1": 0x100}, {"a0": 0x8180}, BYTES),
+    case("lw", "lw a0, 0(a1)", {"a1": 0x100}, {"a0": 0x8180FF7F}, BYTES),
+    case("lw-negative-offset", "lw a0, -4(a1)", {"a1": 0x104}, {"a0": 0x8180FF7F}, BYTES),
+    case("lw-misaligned", "lw a0, 1(a1)", {"a1": 0x100}, {"a0": 0x128180FF}, BYTES),
+    case("lw-across-pages", "lw a0, 0(a1)", {"a1": 0xFFE}, {"a0": 0x3344AABB}, BOUNDARY),
+    case("lw-untouched", "lw a0, 0(a1)", {"a0": 5, "a1": 0x8000}, {"a0": 0}),
+    case("lw-base-wraps", "lw a0, 4(a1)", {"a1": 0xFFFFFFFC}, {"a0": 0xAABBCCDD}, {0: 0xAABBCCDD}),
+    case("lw-to-zero", "lw zero, 0(a1)", {"a1": 0x100}, memory=BYTES),
+]
+
+STORES = [
+    case("sw", "sw a0, 0(a1)", {"a0": 0xDEADBEEF, "a1": 0x200}, expect_memory={0x200: 0xDEADBEEF}),
+    case("sw-negative-offset", "sw a0, -4(a1)", {"a0": 7, "a1": 0x204}, expect_memory={0x200: 7, 0x204: 0}),
+    case("sw-misaligned", "sw a0, 1(a1)", {"a0": 0x44332211, "a1": 0x200},
+         expect_memory={0x200: 0x33221100, 0x204: 0x44}),
+    case("sw-across-pages", "sw a0, 0(a1)", {"a0": 0x44332211, "a1": 0xFFE},
+         expect_memory={0xFFC: 0x22110000, 0x1000: 0x4433}),
+    case("sh", "sh a0, 2(a1)", {"a0": 0x12345678, "a1": 0x200}, memory={0x200: 0x11111111},
+         expect_memory={0x200: 0x56781111}),
+    case("sh-misaligned", "sh a0, 3(a1)", {"a0": 0xBBAA, "a1": 0x200}, memory={0x200: 0x11111111},
+         expect_memory={0x200: 0xAA111111, 0x204: 0xBB}),
+    case("sb", "sb a0, 1(a1)", {"a0": 0xAB, "a1": 0x200}, memory={0x200: 0x11111111},
+         expect_memory={0x200: 0x1111AB11}),
+    case("sb-low-byte-only", "sb a0, 3(a1)", {"a0": 0x123456CD, "a1": 0x200}, memory={0x200: 0x11111111},
+         expect_memory={0x200: 0xCD111111}),
+    case("sw-zero-register", "sw zero, 0(a1)", {"a1": 0x200}, memory={0x200: 5}, expect_memory={0x200: 0}),
+]
+
+# Each branch skips `addi a2` when taken; `addi a3` always runs
+BRANCH = "{} a0, a1, 8\naddi a2, zero, 1\naddi a3, zero, 1"
+
+
+def branch(name, op, a0, a1, taken):
+    return case(name, BRANCH.format(op), {"a0": a0, "a1": a1}, {"a2": 0 if taken else 1, "a3": 1})
+
+
+CONTROL = [
+    branch("beq-taken", "beq", 5, 5, True),
+    branch("beq-not-taken", "beq", 5, 6, False),
+    branch("bne-taken", "bne", 5, 6, True),
+    branch("bne-not-taken", "bne", 5, 5, False),
+    branch("blt-taken", "blt", 0xFFFFFFFF, 1, True),
+    branch("blt-not-taken", "blt", 1, 0xFFFFFFFF, False),
+    branch("blt-equal", "blt", 3, 3, False),
+    branch("bge-taken", "bge", 1, 0xFFFFFFFF, True),
+    branch("bge-equal", "bge", 3, 3, True),
+    branch("bge-not-taken", "bge", 0xFFFFFFFF, 1, False),
+    branch("bltu-taken", "bltu", 1, 0xFFFFFFFF, True),
+    branch("bltu-not-taken", "bltu", 0xFFFFFFFF, 1, False),
+    branch("bgeu-taken", "bgeu", 0xFFFFFFFF, 1, True),
+    branch("bgeu-equal", "bgeu", 3, 3, True),
+    branch("bgeu-not-taken", "bgeu", 1, 0xFFFFFFFF, False),
+    case("branch-backward", "jal zero, 12\naddi a3, zero, 1\njal zero, 12\nbne a0, zero, -8\naddi a2, zero, 1",
+         {"a0": 1}, {"a3": 1}),
+    case("jal", "jal ra, 8\naddi a2, zero, 1\naddi a3, zero, 1", expect={"ra": 4, "a3": 1}),
+    case("jal-to-label", "jal ra, skip\naddi a2, zero, 1\nskip: addi a3, zero, 1", expect={"ra": 4, "a3": 1}),
+    case("jal-no-link", "jal zero, 8\naddi a2, zero, 1\naddi a3, zero, 1", expect={"a3": 1}),
+    case("jalr", "jalr ra, a0, 12\naddi a2, zero, 1\naddi a2, zero, 2\naddi a3, zero, 1",
+         {"a0": 0}, {"ra": 4, "a3": 1}),
+    case("jalr-clears-bit-0", "jalr ra, a0, 12\naddi a2, zero, 1\naddi a2, zero, 2\naddi a3, zero, 1",
+         {"a0": 1}, {"ra": 4, "a3": 1}),
+    case("jalr-negative-offset", "jalr ra, a0, -4\naddi a2, zero, 1\naddi a3, zero, 1",
+         {"a0": 12}, {"a0": 12, "ra": 4, "a3": 1}),
+    case("jalr-rd-is-rs1", "jalr a0, a0, 0\naddi a2, zero, 1\naddi a3, zero, 1", {"a0": 8}, {"a0": 4, "a3": 1}),
+]
+
+FAULTS = [
+    fault("lw-past-end", "lw a0, 0(a1)", {"a1": FAULT}),
+    fault("lw-wraps-past-end", "lw a0, -4(zero)", addr=0xFFFFFFFC),
+    fault("lw-misaligned-past-end", "lw a0, 2(a1)", {"a1": FAULT - 4}, addr=FAULT - 2),
+    fault("lh-straddles-end", "lh a0, 0(a1)", {"a1": FAULT - 1}, addr=FAULT - 1),
+    fault("lhu-past-end", "lhu a0, 0(a1)", {"a1": FAULT}),
+    fault("lb-past-end", "lb a0, 0(a1)", {"a1": FAULT}),
+    fault("lbu-past-end", "lbu a0, 0(a1)", {"a1": 0xFFFFFFFF}, addr=0xFFFFFFFF),
+    fault("lw-to-zero-past-end", "lw zero, 0(a1)", {"a1": FAULT}),
+    fault("sw-past-end", "sw a0, 0(a1)", {"a1": FAULT}, kind="store"),
+    fault("sw-misaligned-past-end", "sw a0, 0(a1)", {"a1": FAULT - 2}, addr=FAULT - 2, kind="store"),
+    fault("sh-past-end", "sh a0, 0(a1)", {"a1": FAULT}, kind="store"),
+    fault("sb-past-end", "sb a0, 0(a1)", {"a1": FAULT}, kind="store"),
+]
+
+ENGINES = [pytest.param(False, id="interpreter"), pytest.param(True, id="blocks")]
+
+
+def load(source, regs, memory, blocks):
+    sim = Simulator(blocks=blocks, memory_size=MEMORY_SIZE)
+    sim.load(Assembler().assemble(f"{source}\n{HALT}"))
+    if blocks:
+        sim.engine.threshold = 1  # compile every block on its first execution
+    for name, value in regs.items():
+        sim.reg[REGISTER[name]] = value
+    for addr, value in memory.items():
+        sim.memory.store_word(addr, value)
+    return sim
+
+
+@pytest.mark.parametrize("blocks", ENGINES)
+@pytest.mark.parametrize("source, regs, expect, memory, expect_memory", ARITHMETIC + IMMEDIATES + LOADS + STORES + CONTROL)
+def test_instruction(source, regs, expect, memory, expect_memory, blocks):
+    sim = load(source, regs, memory, blocks)
+    expected = list(sim.reg)
+    for name, value in expect.items():
+        expected[REGISTER[name]] = value
+    sim.run()
+    assert sim.halted and sim.reason == "halted"
+    assert sim.pc == 4 * source.count("\n") + 4
+    assert sim.reg == expected
+    assert {addr: sim.memory.load_word(addr) for addr in expect_memory} == expect_memory
+    if blocks:
+        assert 0 in sim.engine.cache
+
+
+@pytest.mark.parametrize("blocks", ENGINES)
+@pytest.mark.parametrize("source, regs, addr, kind", FAULTS)
+def test_fault(source, regs, addr, kind, blocks):
+    sim = load(source, regs, {}, blocks)
+    expected = list(sim.reg)
+    with pytest.raises(MemoryFault) as raised:
+        sim.run()
+    assert (raised.value.addr, raised.value.kind) == (addr, kind)
+    assert sim.reg == expected  # the faulting load wrote nothing
+    assert not sim.memory.pages  # nor did the store
+    assert sim.halted and sim.reason == "fault"
+    assert (sim.steps, sim.pc) == (0, 0)
+
+
+@pytest.mark.parametrize("blocks", ENGINES)
+def test_fault_inside_block(blocks):
+    # A store loop walking off the end of memory: the 17th store faults after the addi before
+    # it in the same block has retired
+    sim = load("addi a0, a0, 4\nsw a1, -4(a0)\naddi a2, a2, 1\nbne a0, zero, -12", {"a0": FAULT - 64}, {}, blocks)
+    with pytest.raises(MemoryFault) as raised:
+        sim.run()
+    assert (raised.value.addr, raised.value.kind) == (FAULT, "store")
+    assert sim.halted and sim.reason == "fault"
+    assert (sim.steps, sim.pc, sim.pointer) == (16 * 4 + 1, 4, 1)
+    assert (sim.reg[REGISTER["a0"]], sim.reg[REGISTER["a2"]]) == (FAULT + 4, 16)
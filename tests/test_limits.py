@@ -0,0 +1,24 @@
+import pytest
+
+from simulator.limits import FAULT_EXIT, LIMIT_EXIT, exit_status
+
+
+@pytest.mark.parametrize("reason, exit_code, status", [
+    ("halted", None, 0),
+    ("end of program", None, 0),
+    ("exit", 0, 0),
+    ("exit", 2, 2),
+    ("exit", -1, 255),
+    ("exit", 256 + 3, 3),
+    ("exit", LIMIT_EXIT, 1),
+    ("exit", FAULT_EXIT, 1),
+    ("step limit", None, LIMIT_EXIT),
+    ("time limit", None, LIMIT_EXIT),
+    ("loop", None, LIMIT_EXIT),
+    ("fault", None, FAULT_EXIT),
+    ("illegal instruction", None, FAULT_EXIT),
+    ("paused", None, 0),
+    ("stopped", None, 0),
+])
+def test_exit_status(reason, exit_code, status):
+    assert exit_status(reason, exit_code) == status
@@ -0,0 +1,49 @@
+import contextlib
+import io
+
+from assembler.assembler import Assembler
+from simulator.simulator import Simulator
+from simulator.syscalls import Host
+
+# Writes "hé" (UTF-8, split over two stores) to fd 1, then halts
+WRITE_HELLO = """\
+lui a1, 16
+addi t0, zero, 104
+sb t0, 0(a1)
+addi t0, zero, 195
+sb t0, 1(a1)
+addi t0, zero, 169
+sb t0, 2(a1)
+addi a0, zero, 1
+addi a2, zero, 3
+addi a7, zero, 64
+ecall
+beq zero, zero, 0"""
+
+
+def run(host=None):
+    sim = Simulator(host=host)
+    sim.load(Assembler().assemble(WRITE_HELLO))
+    sim.run()
+    return sim
+
+
+def test_write_to_text_stream():
+    out = io.StringIO()
+    sim = run(Host(stdout=out))
+    assert sim.reason == "halted" and sim.reg[10] == 3
+    assert out.getvalue() == "hé"
+
+
+def test_write_to_redirected_stdout():
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        sim = run()
+    assert sim.reason == "halted" and sim.reg[10] == 3
+    assert out.getvalue() == "hé"
+
+
+def test_write_to_binary_stream():
+    out = io.BytesIO()
+    run(Host(stdout=out))
+    assert out.getvalue() == "hé".encode()
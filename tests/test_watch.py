@@ -0,0 +1,33 @@
+import pytest
+
+from assembler.assembler import Assembler
+from simulator.simulator import Simulator
+from simulator.watch import Watcher, parse_watch
+
+HALT = "beq zero, zero, 0"
+
+
+def run(source, specs):
+    watcher = Watcher([parse_watch(spec) for spec in specs])
+    sim = Simulator(watcher=watcher)
+    sim.load(Assembler().assemble(f"{source}\n{HALT}"))
+    sim.run()
+    return sim, watcher
+
+
+@pytest.mark.parametrize("source, spec", [
+    pytest.param("lui a0, 16\nsw a1, -2(a0)", "w:0x10000", id="sw"),
+    pytest.param("lui a0, 16\nsh a1, -1(a0)", "w:0x10000+1", id="sh"),
+    pytest.param("lui a0, 16\nlw a1, -2(a0)", "r:0x10000", id="lw"),
+    pytest.param("lui a0, 16\nlhu a1, -1(a0)", "r:0x10000+1", id="lhu"),
+])
+def test_access_crossing_into_watched_page(source, spec):
+    # Each access starts on the page before the watched one and ends on it
+    sim, watcher = run(source, [spec])
+    assert watcher.stopped is not None and not sim.halted
+    assert (watcher.stopped.pc, watcher.stopped.step) == (4, 1)
+
+
+def test_access_before_watched_page():
+    sim, watcher = run("lui a0, 16\nsw a1, -4(a0)", ["w:0x10000"])
+    assert watcher.stopped is None and sim.halted